@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Backfill month snapshots for finished months and check them against live data
+
+Usage: python backfill_month_snapshots.py [--check] [--rebuild]
+  --check    only compare snapshots with live computation, don't write anything
+  --rebuild  recompute snapshots of every finished month, not only the missing ones
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db import init_db, get_db
+from migrations import set_meta
+from services.month_close import MonthCloseService, LAST_CLOSED_MONTH_KEY
+
+def backfill_month_snapshots(check_only: bool = False, rebuild: bool = False) -> bool:
+    """Backfill (unless check_only) and verify, return True if snapshots match live data"""
+    init_db()
+    db = next(get_db())
+    
+    try:
+        if not check_only:
+            if rebuild:
+                # Forget closed months so every finished month is recomputed
+                set_meta(db.connection(), LAST_CLOSED_MONTH_KEY, "")
+            print("🔄 Закрываем завершенные месяцы...")
+            closed = MonthCloseService.close_pending_months(db)
+            if closed:
+                print(f"✅ Закрыто месяцев: {len(closed)} ({closed[0]:%Y-%m} — {closed[-1]:%Y-%m})")
+            else:
+                print("✅ Все завершенные месяцы уже закрыты")
+        
+        print("🔍 Сверяем снимки месяцев с расходами...")
+        mismatches = MonthCloseService.verify_snapshots(db)
+        if mismatches:
+            for mismatch in mismatches:
+                print(
+                    f"❌ {mismatch['month']:%Y-%m}, пользователь {mismatch['user_id']}: "
+                    f"снимок {mismatch['snapshot']}, по расходам {mismatch['live']}"
+                )
+            return False
+        
+        print("✅ Снимки месяцев совпадают с расходами")
+        return True
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    ok = backfill_month_snapshots(check_only="--check" in sys.argv[1:], rebuild="--rebuild" in sys.argv[1:])
+    sys.exit(0 if ok else 1)
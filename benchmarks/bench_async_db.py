@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: update throughput with concurrent users, DB work on the event loop vs run_db
+
+Each simulated update runs the report path (expenses by category + group balances)
+and then awaits a fake Telegram API round trip. On the event loop the queries block
+every other update; through run_db they run on the DB executor meanwhile.
+
+Usage: python benchmarks/bench_async_db.py [users] [updates_per_user] [expenses]
+"""
+import asyncio
+import sys
+import time
+
+from common import use_temp_database, seed_expenses
+
+use_temp_database("async")
+
+from db import init_db, SessionLocal
+from services.expense_service import ExpenseService
+from services.group_balance import GroupBalanceService
+from utils.db_executor import db_executor, run_db
+
+TELEGRAM_LATENCY = 0.02  # seconds, simulated edit_message_text round trip
+
+def report(db):
+    ExpenseService.get_expenses_by_category(db)
+    GroupBalanceService.get_detailed_balance_report(db)
+
+async def blocking_update():
+    """Report update with queries on the event loop"""
+    db = SessionLocal()
+    try:
+        report(db)
+    finally:
+        db.close()
+    await asyncio.sleep(TELEGRAM_LATENCY)
+
+async def run_db_update():
+    """Report update as a run_db work unit"""
+    await run_db(report)
+    await asyncio.sleep(TELEGRAM_LATENCY)
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    """Record how late a 5 ms ticker wakes up (event loop responsiveness)"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.005
+        await asyncio.sleep(0.005)
+        lags.append(loop.time() - expected)
+
+async def run(update_func, users: int, updates_per_user: int) -> dict:
+    """Run users concurrently, each sending updates one after another"""
+    async def user_loop():
+        for _ in range(updates_per_user):
+            await update_func()
+
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user_loop() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+
+    total = users * updates_per_user
+    return {
+        "updates": total,
+        "seconds": elapsed,
+        "throughput": total / elapsed,
+        "max_lag_ms": max(lags) * 1000 if lags else 0.0,
+    }
+
+async def main(users: int, updates_per_user: int, expenses: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_expenses(db, expenses)
+    finally:
+        db.close()
+
+    print(f"\n📊 {users} concurrent users × {updates_per_user} updates, {expenses} expenses in DB")
+    for name, func in (("event loop (before)", blocking_update), ("run_db (after)", run_db_update)):
+        result = await run(func, users, updates_per_user)
+        print(
+            f"  {name:20} {result['throughput']:8.1f} updates/s  "
+            f"total {result['seconds']:.2f}s  max loop lag {result['max_lag_ms']:.1f} ms"
+        )
+
+    db_executor.shutdown()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    users = args[0] if len(args) > 0 else 50
+    updates_per_user = args[1] if len(args) > 1 else 3
+    expenses = args[2] if len(args) > 2 else 30
+    asyncio.run(main(users, updates_per_user, expenses))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dispatch cost per callback query, regex handler list vs CallbackRouter
+
+Before: one CallbackQueryHandler per button, regex patterns tested in registration order.
+After: one CallbackRouterHandler, exact dict lookup or prefix dict lookups.
+
+Usage: python benchmarks/bench_callback_dispatch.py [iterations]
+"""
+import re
+import sys
+import time
+
+from common import use_temp_database
+
+use_temp_database("callback_dispatch")
+
+from handlers.registry import build_callback_router
+
+# Patterns registered by setup_handlers before the router (same order)
+REGEX_PATTERNS = [
+    "^main_menu$", "^expenses_menu$", "^add_expense$", "^currency_",
+    r"^(participant_[a-z]+|confirm_participants|no_split)$", "^category_",
+    "^shopping_list$", "^add_shopping_item$", "^list_shopping_items$",
+    "^remove_shopping_item$", "^toggle_shopping_", "^remove_shopping_",
+    "^todo_list$", "^add_todo_item$", "^list_todo_items$", "^remove_todo_item$",
+    "^toggle_todo_", "^remove_todo_",
+    "^report$", "^delete_expenses$", "^delete_expense_",
+    "^duty_schedule$", "^my_duties$", "^monthly_schedule$", "^current_week_schedule$",
+    "^mark_completed$", "^complete_duty_", "^generate_schedule$",
+]
+
+SAMPLES = {
+    "first exact": "main_menu",
+    "last exact": "generate_schedule",
+    "prefix + int": "complete_duty_1234",
+    "mid prefix + int": "toggle_todo_42",
+    "unknown": "no_action",
+}
+
+def regex_dispatch(patterns, data: str):
+    """What python-telegram-bot does: test every handler pattern until one matches"""
+    for pattern in patterns:
+        match = pattern.match(data)
+        if match:
+            return match
+    return None
+
+def per_call_ns(func, data: str, iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func(data)
+    return (time.perf_counter_ns() - start) / iterations
+
+def main(iterations: int):
+    patterns = [re.compile(pattern) for pattern in REGEX_PATTERNS]
+    router = build_callback_router()
+
+    print(f"\n📊 Dispatch cost per callback ({len(patterns)} regex handlers vs router, {iterations} iterations)")
+    print(f"  {'callback_data':36} {'regex list':>12} {'router':>12}")
+    for label, data in SAMPLES.items():
+        regex_ns = per_call_ns(lambda value: regex_dispatch(patterns, value), data, iterations)
+        router_ns = per_call_ns(router.match, data, iterations)
+        print(f"  {label + ' (' + data + ')':36} {regex_ns:9.0f} ns {router_ns:9.0f} ns")
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    main(iterations)
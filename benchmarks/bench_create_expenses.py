@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: importing expenses, create_expense per row vs create_expenses batch
+
+Before: one create_expense call per expense (flush for the id, allocation objects,
+ledger update and commit each time). It is measured on a sample and projected.
+After: ExpenseService.create_expenses with executemany inserts in one transaction.
+The ledger must match a full history scan after both.
+
+Usage: python benchmarks/bench_create_expenses.py [expenses] [sample]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from common import use_temp_database, count_queries
+
+use_temp_database("create_expenses")
+
+from db import init_db, engine, SessionLocal
+from models import User, Currency, ExpenseCategory
+from services.expense_service import ExpenseService
+from services.group_balance import GroupBalanceService
+
+def make_specs(db, count: int, seed: int = 42) -> list:
+    """Mixed currencies, categories and split types, back-dated over the last month"""
+    rng = random.Random(seed)
+    users = db.query(User).order_by(User.id).all()
+    profile = ExpenseService.get_or_create_home_profile(db)
+    telegram_ids = [user.telegram_id for user in users]
+    start = datetime.utcnow() - timedelta(days=30)
+
+    specs = []
+    for i in range(count):
+        spec = {
+            "amount": rng.randint(1_000, 200_000),
+            "currency": rng.choice([Currency.SEK, Currency.SEK, Currency.EUR]),
+            "category": rng.choice(list(ExpenseCategory)),
+            "payer_id": rng.choice(users).id,
+            "profile_id": profile.id,
+            "note": f"import #{i}",
+        }
+        kind = i % 4
+        if kind == 1:
+            spec["split_type"] = "split_families"
+        elif kind == 2:
+            spec["split_type"] = "participants"
+            spec["selected_participants"] = set(rng.sample(telegram_ids, 3))
+        elif kind == 3:
+            spec["created_at"] = start + timedelta(seconds=rng.uniform(0, 29 * 86400))
+        specs.append(spec)
+    return specs
+
+def main(count: int, sample: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        # Rates valid over the back-dated period
+        ExpenseService.set_exchange_rate(db, Currency.EUR, 11.3)
+        from sqlalchemy import update
+        from models import ExchangeRate
+        db.execute(update(ExchangeRate).values(valid_from=datetime.utcnow() - timedelta(days=60)))
+        db.commit()
+
+        loop_specs = make_specs(db, sample, seed=1)
+        with count_queries(engine) as loop_queries:
+            start = time.perf_counter()
+            for spec in loop_specs:
+                ExpenseService.create_expense(db, **spec)
+            loop_time = time.perf_counter() - start
+
+        batch_specs = make_specs(db, count, seed=2)
+        with count_queries(engine) as batch_queries:
+            start = time.perf_counter()
+            ids = ExpenseService.create_expenses(db, batch_specs)
+            batch_time = time.perf_counter() - start
+        assert len(ids) == count and len(set(ids)) == count
+        assert not GroupBalanceService.verify_ledger(db)
+
+        per_expense = loop_time / sample
+        print(f"\n📊 Creating {count} expenses")
+        print(
+            f"  create_expense loop:  {per_expense * 1000:6.2f} ms/expense, "
+            f"{loop_queries['count'] / sample:5.1f} queries/expense "
+            f"(measured on {sample}, ~{per_expense * count:.0f} s projected)"
+        )
+        print(
+            f"  create_expenses:      {batch_time * 1000 / count:6.2f} ms/expense, "
+            f"{batch_queries['count']} queries total ({batch_time:.2f} s)"
+        )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    sample = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    main(count, sample)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: category trends, per-month GROUP BY on expenses vs the category rollup
+
+Before: the previous get_expenses_by_category - a GROUP BY over the month's expenses plus
+a query for OTHER custom names - once per month (reproduced here).
+After: ExpenseRollupService.get_trends, one query over the rollup for the whole range.
+Also checks that creates and deletes through ExpenseService keep the rollup equal to history.
+
+Usage: python benchmarks/bench_expense_trends.py [expenses] [months]
+"""
+import sys
+import time
+
+from common import use_temp_database, count_queries, seed_expenses
+
+use_temp_database("expense_trends")
+
+from datetime import datetime
+from sqlalchemy import func
+from db import init_db, engine, SessionLocal
+from models import User, Profile, Expense, ExpenseCategory, Currency
+from services.expense_rollup import ExpenseRollupService, _month_shift
+from services.expense_service import ExpenseService
+
+def old_expenses_by_category(db, month) -> dict:
+    """Previous get_expenses_by_category: GROUP BY over expenses, OTHER names row by row"""
+    result = {}
+    for category, total_sek, count in db.query(
+        Expense.category, func.sum(Expense.amount_sek), func.count(Expense.id)
+    ).filter(Expense.month == month).group_by(Expense.category).all():
+        result[category.value] = {'total_sek': total_sek, 'count': count}
+        if category == ExpenseCategory.OTHER:
+            db.query(Expense.custom_category_name, Expense.amount_sek).filter(
+                Expense.category == ExpenseCategory.OTHER,
+                Expense.month == month,
+                Expense.custom_category_name.isnot(None)
+            ).all()
+    return result
+
+def main(count: int, month_count: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_expenses(db, count, months=month_count)
+        current_month = datetime.now().replace(day=1).date()
+        months = [_month_shift(current_month, offset) for offset in range(1 - month_count, 1)]
+
+        with count_queries(engine) as before_queries:
+            start = time.perf_counter()
+            before = [old_expenses_by_category(db, month) for month in months]
+            before_time = time.perf_counter() - start
+
+        with count_queries(engine) as after_queries:
+            start = time.perf_counter()
+            trends = ExpenseRollupService.get_trends(db, current_month, month_count)
+            after_time = time.perf_counter() - start
+
+        for index, by_category in enumerate(before):
+            for category, values in by_category.items():
+                data = trends['categories'][category]
+                assert (data['totals'][index], data['counts'][index]) == (values['total_sek'], values['count'])
+
+        print(f"\n📊 {month_count}-month category trends over {count} expenses")
+        print(f"  per-month GROUP BY: {before_time * 1000:8.1f} ms, {before_queries['count']} queries")
+        print(f"  category rollup:    {after_time * 1000:8.1f} ms, {after_queries['count']} queries")
+
+        # Maintenance: creates (single and batch) and deletes keep the rollup exact
+        users = db.query(User).order_by(User.id).all()
+        profile_id = db.query(Profile.id).filter(Profile.is_default == True).scalar()
+        specs = [
+            {
+                "amount": 1_000 + i, "currency": Currency.SEK, "category": ExpenseCategory.OTHER,
+                "custom_category_name": f"name {i % 7}", "payer_id": users[i % len(users)].id,
+                "profile_id": profile_id,
+            }
+            for i in range(1_000)
+        ]
+        start = time.perf_counter()
+        expense_ids = ExpenseService.create_expenses(db, specs)
+        batch_time = time.perf_counter() - start
+        with count_queries(engine) as create_queries:
+            expense = ExpenseService.create_expense(
+                db, 12_345, Currency.SEK, ExpenseCategory.FOOD, users[0].id, profile_id
+            )
+        for expense_id in expense_ids[:100] + [expense.id]:
+            ExpenseService.delete_expense(db, expense_id)
+        assert not ExpenseRollupService.verify(db)
+
+        print(f"\n📊 Rollup maintenance")
+        print(f"  create_expenses, 1000 expenses: {batch_time * 1000:8.1f} ms")
+        print(f"  create_expense:                 {create_queries['count']} queries")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    month_count = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    main(count, month_count)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark: expense import memory, whole file at once vs streaming chunks
+
+Before: read every row into a list, validate it, then one create_expenses call.
+After: ExpenseImporter streams rows and writes them in IMPORT_CHUNK_SIZE chunks.
+Peak Python memory (tracemalloc) is measured for two file sizes: the streaming
+peak must not grow with the file.
+
+Usage: python benchmarks/bench_import.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import use_temp_database
+
+use_temp_database("import")
+
+from db import init_db, SessionLocal
+from services.expense_import import ExpenseImporter
+from services.expense_service import ExpenseService
+from services.group_balance import GroupBalanceService
+from models import Currency
+from seed import HOME_MEMBERS
+
+def write_csv(path: str, rows: int, seed: int = 42) -> None:
+    """Bank-export-like CSV: mixed categories, currencies, splits and dates"""
+    rng = random.Random(seed)
+    names = [alias for _, alias in HOME_MEMBERS.values()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("date;amount;currency;category;description;payer;split\n")
+        for i in range(rows):
+            day = rng.randint(1, 28)
+            category = rng.choice(["продукты", "алкоголь", "другое"])
+            description = f"покупка {i}" if category == "другое" else ""
+            split = rng.choice(["", "", "семьи", "дима,сеня,катя"])
+            f.write(
+                f"2025-01-{day:02d};{rng.randint(10, 2000)},{rng.randint(0, 99):02d};"
+                f"{rng.choice(['SEK', 'SEK', 'EUR'])};{category};{description};{rng.choice(names)};{split}\n"
+            )
+
+def import_all_at_once(db, path: str) -> int:
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        importer = ExpenseImporter(stream, "csv")
+        importer._load_users(db)
+        specs = [importer.parse_row(db, row) for _, row in importer.rows]
+    return len(ExpenseService.create_expenses(db, specs))
+
+def import_streaming(db, path: str) -> int:
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        return ExpenseImporter(stream, "csv").run(db).imported
+
+def measure(func, db, path: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    imported = func(db, path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, imported
+
+def main(rows: int):
+    init_db()
+    db = SessionLocal()
+    directory = tempfile.mkdtemp(prefix="bot_bench_import_")
+    try:
+        # Rates valid for the back-dated rows
+        ExpenseService.set_exchange_rate(db, Currency.EUR, 11.3)
+        from datetime import datetime
+        from sqlalchemy import update
+        from models import ExchangeRate
+        db.execute(update(ExchangeRate).values(valid_from=datetime(2024, 12, 1)))
+        db.commit()
+
+        print("\n📊 Importing CSV exports (timings include tracemalloc overhead)")
+        for size in (rows // 10, rows):
+            path = os.path.join(directory, f"export_{size}.csv")
+            write_csv(path, size)
+            for label, func in (("all at once (before)", import_all_at_once), ("streaming (after)", import_streaming)):
+                elapsed, peak, imported = measure(func, db, path)
+                assert imported == size
+                print(f"  {size:7d} rows, {label:21} {elapsed:6.2f} s, peak {peak / 2**20:7.1f} MB")
+        assert not GroupBalanceService.verify_ledger(db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    main(rows)
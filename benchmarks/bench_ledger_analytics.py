@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: multi-month analytics, per-month service calls vs LedgerAnalytics
+
+Before: one SplitService.calculate_user_balances and ExpenseService.get_expenses_by_category
+call per month, group totals from GroupBalanceService.compute_totals_from_history, running
+balances and range totals summed in Python.
+After: LedgerAnalytics.load streams the range once into NumPy accumulators and every
+report is a reduction. Results are compared field by field; peak Python memory of the
+load is measured for two history sizes (tracemalloc inflates timings).
+
+Usage: python benchmarks/bench_ledger_analytics.py [allocations] [months]
+"""
+import sys
+import time
+import tracemalloc
+
+from common import use_temp_database, seed_expenses
+
+use_temp_database("ledger_analytics")
+
+from datetime import date, datetime
+from db import init_db, SessionLocal
+from models import User, Profile, Expense
+from services.analytics import LedgerAnalytics
+from services.expense_service import ExpenseService
+from services.group_balance import GroupBalanceService
+from services.split import SplitService
+
+def per_month_services(db, months: list, profile_id: int) -> dict:
+    """Reports the way the services build them today"""
+    monthly = {}
+    categories = {}
+    for month in months:
+        balances = SplitService.calculate_user_balances(db, datetime(month.year, month.month, 1))
+        if balances:
+            monthly[month] = balances
+        by_category = ExpenseService.get_expenses_by_category(db, month)
+        if by_category:
+            categories[month] = {
+                name: {'total_sek': values['total_sek'], 'count': values['count']}
+                for name, values in by_category.items()
+            }
+
+    totals = {}
+    running = {}
+    for month in months:
+        for user_id, balance in monthly.get(month, {}).items():
+            total = totals.setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            for key in ('paid', 'owed', 'net'):
+                total[key] += balance[key]
+        for user_id, total in totals.items():
+            running.setdefault(user_id, []).append((month, total['net']))
+
+    return {
+        "monthly": monthly,
+        "categories": categories,
+        "totals": totals,
+        "groups": GroupBalanceService.compute_totals_from_history(db, profile_id, use_checkpoint=False),
+        "plan": SplitService.calculate_settlement_plan(db, totals),
+        "running": running,
+    }
+
+def vectorized(db, months: list, profile_id: int) -> dict:
+    last = months[-1]
+    end = date(last.year + last.month // 12, last.month % 12 + 1, 1)
+    analytics = LedgerAnalytics.load(db, months[0], end, profile_id)
+    return {
+        "monthly": analytics.monthly_balances(),
+        "categories": analytics.monthly_category_report(),
+        "totals": analytics.user_balances(),
+        "groups": analytics.group_totals(),
+        "plan": analytics.settlement_plan(),
+        "running": analytics.running_balances(),
+    }
+
+def check(before: dict, after: dict) -> None:
+    for key in ("monthly", "categories", "totals", "groups", "plan"):
+        assert before[key] == after[key], key
+    # Running balances before list a user from their first month on, after - every month
+    for user_id, points in before["running"].items():
+        running = dict(after["running"][user_id])
+        assert all(running[month] == net for month, net in points), user_id
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main(allocations: int, month_count: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        users = db.query(User).count()
+        profile_id = db.query(Profile.id).filter(Profile.is_default == True).scalar()
+
+        print(f"\n📊 {month_count}-month analytics (timings include tracemalloc overhead)")
+        expenses = 0
+        for target in (allocations // 10, allocations):
+            seed_expenses(db, target // users - expenses, months=month_count, seed=target)
+            expenses = target // users
+            months = sorted(month for (month,) in db.query(Expense.month).distinct())
+
+            before, before_time, before_peak = measure(per_month_services, db, months, profile_id)
+            after, after_time, after_peak = measure(vectorized, db, months, profile_id)
+            check(before, after)
+            print(f"  {expenses * users:9d} allocations")
+            print(f"    per-month services: {before_time:6.2f} s, peak {before_peak / 2**20:7.1f} MB")
+            print(f"    LedgerAnalytics:    {after_time:6.2f} s, peak {after_peak / 2**20:7.1f} MB")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    allocations = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    month_count = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    main(allocations, month_count)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark: group lookups, User queries vs the membership index
+
+Before: every ledger update mapped user IDs to groups with a User query and hardcoded
+telegram ID lists, history totals joined users twice to get telegram IDs (reproduced here).
+After: membership_registry's in-memory index, history totals group by internal IDs.
+
+Usage: python benchmarks/bench_membership.py [expenses] [history]
+"""
+import sys
+import time
+
+from common import use_temp_database, count_queries, seed_expenses
+
+use_temp_database("membership")
+
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from db import init_db, engine, SessionLocal
+from models import User, Expense, ExpenseAllocation, Profile
+from services.group_balance import GroupBalanceService
+from services.membership import membership_registry
+
+# Families as they were hardcoded in GroupBalanceService
+OLD_GROUP_1_IDS = [804085588, 916228993]
+OLD_GROUP_2_IDS = [252901018, 350653235, 6379711500]
+
+def old_group(telegram_id: int) -> int:
+    if telegram_id in OLD_GROUP_1_IDS:
+        return 1
+    if telegram_id in OLD_GROUP_2_IDS:
+        return 2
+    return 0
+
+def old_user_groups(db, user_ids) -> dict:
+    """Previous _user_groups: one User query per call"""
+    rows = db.query(User.id, User.telegram_id).filter(User.id.in_(set(user_ids))).all()
+    return {user_id: old_group(telegram_id) for user_id, telegram_id in rows}
+
+def old_history_totals(db, profile_id: int):
+    """Previous compute_totals_from_history queries (full history, joins on users)"""
+    payer = aliased(User)
+    member = aliased(User)
+    has_allocations = db.query(ExpenseAllocation.id).filter(ExpenseAllocation.expense_id == Expense.id).exists()
+    spent_rows = db.query(payer.telegram_id, func.sum(Expense.amount_sek)).join(
+        payer, Expense.payer_id == payer.id
+    ).filter(Expense.profile_id == profile_id, has_allocations).group_by(payer.telegram_id).all()
+    owes_rows = db.query(payer.telegram_id, member.telegram_id, func.sum(ExpenseAllocation.amount_sek)).join(
+        Expense, ExpenseAllocation.expense_id == Expense.id
+    ).join(payer, Expense.payer_id == payer.id).join(
+        member, ExpenseAllocation.user_id == member.id
+    ).filter(Expense.profile_id == profile_id).group_by(payer.telegram_id, member.telegram_id).all()
+
+    totals = {group: 0 for group in GroupBalanceService.GROUPS}
+    shares = {group: 0 for group in GroupBalanceService.GROUPS}
+    for telegram_id, total in spent_rows:
+        if old_group(telegram_id):
+            totals[old_group(telegram_id)] += total or 0
+    for payer_telegram_id, member_telegram_id, total in owes_rows:
+        if old_group(payer_telegram_id) and old_group(member_telegram_id):
+            shares[old_group(member_telegram_id)] += total or 0
+    return totals, shares
+
+def main(count: int, history: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        user_ids = [user_id for (user_id,) in db.query(User.id).order_by(User.id)]
+        lookups = [user_ids[i % len(user_ids):] + user_ids[:i % len(user_ids)] for i in range(count)]
+
+        with count_queries(engine) as before_queries:
+            start = time.perf_counter()
+            before = [old_user_groups(db, ids) for ids in lookups]
+            before_time = time.perf_counter() - start
+
+        membership_registry.invalidate()
+        with count_queries(engine) as after_queries:
+            start = time.perf_counter()
+            after = [GroupBalanceService._user_groups(db, ids) for ids in lookups]
+            after_time = time.perf_counter() - start
+        assert before == after
+
+        print(f"\n📊 Group lookups for {count} ledger updates")
+        print(f"  User queries:     {before_time * 1000:8.1f} ms, {before_queries['count']} queries")
+        print(f"  membership index: {after_time * 1000:8.1f} ms, {after_queries['count']} queries")
+
+        seed_expenses(db, history, months=6)
+        profile_id = db.query(Profile.id).filter(Profile.is_default == True).scalar()
+
+        start = time.perf_counter()
+        before = old_history_totals(db, profile_id)
+        before_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        after = GroupBalanceService.compute_totals_from_history(db, profile_id, use_checkpoint=False)
+        after_time = time.perf_counter() - start
+        assert before == after
+
+        print(f"\n📊 History totals over {history} expenses")
+        print(f"  joins on users:   {before_time * 1000:8.1f} ms")
+        print(f"  internal IDs:     {after_time * 1000:8.1f} ms")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    history = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    main(count, history)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark: large-ledger sums, REAL kronor vs INTEGER öre
+
+The same allocations are stored twice: as REAL kronor (old schema) and as INTEGER öre.
+Both are summed per user in SQL and accumulated in Python. The float sums depend on
+row order (three orders are tried), the integer sums are identical every time.
+
+Usage: python benchmarks/bench_money_sums.py [expenses]
+"""
+import sys
+
+from common import use_temp_database, seed_expenses, timed
+
+use_temp_database("money_sums")
+
+from sqlalchemy import text
+from db import init_db, SessionLocal
+
+ORDERS = ("id", "id DESC", "amount_sek")
+
+SQL_SUM = "SELECT user_id, SUM(amount_sek) FROM (SELECT user_id, amount_sek FROM {table} ORDER BY {order}) GROUP BY user_id"
+
+def python_sum(db, table: str, order: str) -> dict:
+    """Accumulate per user in Python, like the old balance loops did"""
+    totals = {}
+    for user_id, amount in db.execute(text(f"SELECT user_id, amount_sek FROM {table} ORDER BY {order}")):
+        totals[user_id] = totals.get(user_id, 0) + amount
+    return totals
+
+def main(count: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_expenses(db, count, months=12)
+        db.execute(text("CREATE TABLE float_allocations (id INTEGER PRIMARY KEY, user_id INTEGER, amount_sek REAL)"))
+        db.execute(text(
+            "INSERT INTO float_allocations SELECT id, user_id, amount_sek / 100.0 FROM expense_allocations"
+        ))
+        db.commit()
+        rows = db.execute(text("SELECT COUNT(*) FROM expense_allocations")).scalar()
+
+        print(f"\n📊 Per-user sums over {rows} allocations")
+        print(f"  {'':22} {'SQL SUM':>10} {'Python +=':>10} {'distinct results':>17}")
+        for label, table in (("REAL kronor (before)", "float_allocations"), ("INTEGER öre (after)", "expense_allocations")):
+            sql_time, _ = timed(lambda: db.execute(text(SQL_SUM.format(table=table, order="id"))).all())
+            python_time, _ = timed(python_sum, db, table, "id")
+
+            results = set()
+            for order in ORDERS:
+                results.add(tuple(sorted(db.execute(text(SQL_SUM.format(table=table, order=order))).all())))
+                results.add(tuple(sorted(python_sum(db, table, order).items())))
+            print(f"  {label:22} {sql_time * 1000:7.1f} ms {python_time * 1000:7.1f} ms {len(results):17d}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    main(count)
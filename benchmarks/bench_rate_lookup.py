@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: exchange rate at a past timestamp, one query per lookup vs interval index
+
+Before: an ordered exchange_rates query per back-dated expense.
+After: the pair history is loaded once and searched with bisect.
+
+Usage: python benchmarks/bench_rate_lookup.py [rates] [lookups]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from common import use_temp_database, count_queries, timed
+
+use_temp_database("rate_lookup")
+
+from sqlalchemy import delete, insert
+from db import init_db, engine, SessionLocal
+from models import ExchangeRate, Currency
+from services.expense_service import ExpenseService
+from utils.rate_cache import exchange_rate_cache, bump_rate_version
+
+def query_rate_at(db, from_currency: Currency, to_currency: Currency, at: datetime) -> float:
+    """Per-lookup query: newest rate that started before at and was still valid"""
+    rate = db.query(ExchangeRate).filter(
+        ExchangeRate.from_currency == from_currency,
+        ExchangeRate.to_currency == to_currency,
+        ExchangeRate.valid_from <= at,
+        (ExchangeRate.valid_until.is_(None) | (ExchangeRate.valid_until > at))
+    ).order_by(ExchangeRate.valid_from.desc()).first()
+    return rate.rate
+
+def seed_rates(db, count: int, start: datetime) -> None:
+    """Daily EUR rate history: each rate closes when the next one starts"""
+    rng = random.Random(42)
+    rows = []
+    for day in range(count):
+        valid_from = start + timedelta(days=day)
+        rows.append({
+            "from_currency": Currency.EUR,
+            "to_currency": Currency.SEK,
+            "rate": round(rng.uniform(10.5, 12.0), 4),
+            "valid_from": valid_from,
+            "valid_until": valid_from + timedelta(days=1) if day < count - 1 else None,
+        })
+    db.execute(delete(ExchangeRate).where(ExchangeRate.from_currency == Currency.EUR))
+    db.execute(insert(ExchangeRate), rows)
+    bump_rate_version(db.connection())
+    db.commit()
+
+def main(rates: int, lookups: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        start = datetime(2024, 1, 1)
+        seed_rates(db, rates, start)
+        rng = random.Random(7)
+        timestamps = [start + timedelta(seconds=rng.uniform(0, rates * 86400 - 1)) for _ in range(lookups)]
+
+        def per_query():
+            return [query_rate_at(db, Currency.EUR, Currency.SEK, at) for at in timestamps]
+
+        def indexed():
+            exchange_rate_cache.invalidate()
+            return [ExpenseService.get_exchange_rate_at(db, Currency.EUR, Currency.SEK, at) for at in timestamps]
+
+        with count_queries(engine) as before_queries:
+            before_time, expected = timed(per_query, repeat=1)
+        with count_queries(engine) as after_queries:
+            after_time, result = timed(indexed, repeat=1)
+        assert expected == result
+
+        print(f"\n📊 {lookups} back-dated rate lookups over {rates} rate intervals")
+        print(f"  per-lookup query: {before_time * 1000:8.1f} ms, {before_queries['count']} queries")
+        print(f"  interval index:   {after_time * 1000:8.1f} ms, {after_queries['count']} queries")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rates = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    main(rates, lookups)
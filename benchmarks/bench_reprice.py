@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: re-pricing expenses after a rate correction, ORM objects vs set-based UPDATEs
+
+Before: load every affected expense and its allocations, fix them one object at a time.
+After: RepricingService.correct_rate (one executemany expense UPDATE, per-expense allocation rounding + ledger/checkpoint/snapshot refresh).
+Both must leave the same amounts.
+
+Usage: python benchmarks/bench_reprice.py [expenses]
+"""
+import sys
+import time
+from datetime import datetime
+
+from common import use_temp_database, count_queries, seed_expenses
+
+use_temp_database("reprice")
+
+from sqlalchemy import func, insert
+from db import init_db, engine, SessionLocal
+from models import Expense, ExpenseAllocation, ExchangeRate, Currency
+from services.repricing import RepricingService
+from utils.money import convert_minor, round_allocations
+from services.group_balance import GroupBalanceService
+from services.month_close import MonthCloseService
+
+WRONG_RATE = 1.13
+RIGHT_RATE = 11.3
+
+def orm_reprice(db, rate: ExchangeRate, new_rate: float) -> int:
+    """Object-at-a-time re-pricing (without derived state)"""
+    expenses = db.query(Expense).filter(*RepricingService.window_filter(rate)).all()
+    for expense in expenses:
+        old_amount = expense.amount_sek
+        expense.exchange_rate = new_rate
+        expense.amount_sek = convert_minor(expense.amount, new_rate)
+        allocations = db.query(ExpenseAllocation).filter(ExpenseAllocation.expense_id == expense.id).all()
+        shares = round_allocations({
+            allocation.id: allocation.amount_sek * expense.amount_sek / old_amount for allocation in allocations
+        })
+        for allocation in allocations:
+            allocation.amount_sek = shares[allocation.id]
+    rate.rate = new_rate
+    db.commit()
+    return len(expenses)
+
+def totals(db, currency: Currency):
+    """Sum of amount_sek of expenses and their allocations in one currency"""
+    return (
+        db.query(func.sum(Expense.amount_sek)).filter(Expense.currency == currency).scalar(),
+        db.query(func.sum(ExpenseAllocation.amount_sek)).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).filter(Expense.currency == currency).scalar(),
+    )
+
+def split_mismatches(db) -> int:
+    """Expenses whose allocations don't add up to amount_sek"""
+    allocated = db.query(
+        ExpenseAllocation.expense_id, func.sum(ExpenseAllocation.amount_sek).label("total")
+    ).group_by(ExpenseAllocation.expense_id).subquery()
+    return db.query(func.count()).select_from(Expense).join(
+        allocated, allocated.c.expense_id == Expense.id
+    ).filter(allocated.c.total != Expense.amount_sek).scalar()
+
+def prepare(db, count: int, currency: Currency) -> ExchangeRate:
+    """Wrong rate valid for the whole seeded period, expenses priced with it"""
+    db.query(ExchangeRate).filter(ExchangeRate.from_currency == currency).delete()
+    db.execute(insert(ExchangeRate), [{
+        "from_currency": currency, "to_currency": Currency.SEK,
+        "rate": WRONG_RATE, "valid_from": datetime(2000, 1, 1), "valid_until": None,
+    }])
+    db.commit()
+    seed_expenses(db, count, months=6, currency=currency, exchange_rate=WRONG_RATE)
+    return RepricingService.get_latest_rate(db, currency)
+
+def main(count: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        # Same expenses in two currencies: EUR is re-priced set-based, RUB object by object
+        prepare(db, count, Currency.EUR)
+        rub_rate = prepare(db, count, Currency.RUB)
+        MonthCloseService.close_pending_months(db)
+
+        with count_queries(engine) as after_queries:
+            start = time.perf_counter()
+            result = RepricingService.correct_rate(db, Currency.EUR, RIGHT_RATE)
+            after_time = time.perf_counter() - start
+        assert not GroupBalanceService.verify_ledger(db)
+        assert not MonthCloseService.verify_snapshots(db)
+        assert split_mismatches(db) == 0
+
+        with count_queries(engine) as before_queries:
+            start = time.perf_counter()
+            orm_reprice(db, rub_rate, RIGHT_RATE)
+            before_time = time.perf_counter() - start
+        assert totals(db, Currency.EUR) == totals(db, Currency.RUB), (totals(db, Currency.EUR), totals(db, Currency.RUB))
+
+        print(f"\n📊 Re-pricing {result['expenses']} expenses ({result['allocations']} allocations)")
+        print(f"  ORM objects: {before_time * 1000:9.1f} ms, {before_queries['count']} queries (no derived state)")
+        print(f"  set-based:   {after_time * 1000:9.1f} ms, {after_queries['count']} queries (ledger + snapshots included)")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    main(count)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: database round trips per update, per-session SELECT 1 vs pool-level liveness
+
+Replays the session pattern of typical handlers (several sessions per update) and
+counts SQL statements sent to the database.
+
+Usage: python benchmarks/bench_round_trips.py
+"""
+from sqlalchemy import text
+
+from common import use_temp_database, count_queries
+
+use_temp_database("round_trips")
+
+from db import init_db, engine, SessionLocal, get_db
+from handlers.base import BaseHandler
+from services.expense_service import ExpenseService
+from services.shopping_service import ShoppingService
+from services.todo_service import TodoService
+from models import User, ExpenseCategory
+
+def legacy_get_db():
+    """Old get_db: SELECT 1 on every session"""
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        yield db
+    finally:
+        db.close()
+
+class FakeTelegramUser:
+    """Minimal telegram user for get_or_create_user"""
+    def __init__(self, user: User):
+        self.id = user.telegram_id
+        self.username = user.username
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+
+def flow_add_todo(session_factory, telegram_user):
+    """handle_text_message + handle_todo_input: two sessions"""
+    db = next(session_factory())
+    try:
+        BaseHandler.get_or_create_user(db, telegram_user)
+    finally:
+        db.close()
+    db = next(session_factory())
+    try:
+        user = BaseHandler.get_or_create_user(db, telegram_user)
+        TodoService.add_item(db, "Купить лампочку", user.id)
+    finally:
+        db.close()
+
+def flow_delete_expense(session_factory, telegram_user):
+    """delete_expense_confirmation_callback -> delete_expenses_callback: two sessions"""
+    db = next(session_factory())
+    try:
+        ExpenseService.delete_expense(db, -1)
+    finally:
+        db.close()
+    db = next(session_factory())
+    try:
+        ExpenseService.get_monthly_expenses(db)
+    finally:
+        db.close()
+
+def flow_list_shopping(session_factory, telegram_user):
+    """list_shopping_items_callback: one session"""
+    db = next(session_factory())
+    try:
+        ShoppingService.get_items(db, checked_only=None, limit=20)
+    finally:
+        db.close()
+
+FLOWS = [
+    ("add todo (text message)", flow_add_todo),
+    ("delete expense", flow_delete_expense),
+    ("list shopping items", flow_list_shopping),
+]
+
+def main():
+    init_db()
+    db = SessionLocal()
+    try:
+        telegram_user = FakeTelegramUser(db.query(User).first())
+        ShoppingService.add_item(db, "Молоко", ExpenseCategory.FOOD, 1)
+    finally:
+        db.close()
+
+    print("\n📊 SQL round trips per update")
+    print(f"  {'flow':28} {'before':>7} {'after':>7}")
+    for name, flow in FLOWS:
+        with count_queries(engine) as before:
+            flow(legacy_get_db, telegram_user)
+        with count_queries(engine) as after:
+            flow(get_db, telegram_user)
+        print(f"  {name:28} {before['count']:7d} {after['count']:7d}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark: all-time balances, full history scan vs latest settle-up checkpoint
+
+History grows step by step; after each step the household settles up and adds a few
+new expenses. The full scan grows with history, the checkpointed path only reads the
+checkpoint and the expenses after it. Both paths must return the same balances.
+
+Usage: python benchmarks/bench_settlement_checkpoint.py [steps] [expenses_per_step]
+"""
+import sys
+
+from common import use_temp_database, seed_expenses, timed
+
+use_temp_database("settlement_checkpoint")
+
+from db import init_db, SessionLocal
+from services.split import SplitService
+from services.group_balance import GroupBalanceService
+from services.settlement import SettlementService
+
+NEW_EXPENSES_AFTER_SETTLE = 50
+
+def assert_same(expected: dict, actual: dict) -> None:
+    for user_id, balance in expected.items():
+        for key in ('paid', 'owed', 'net'):
+            assert abs(balance[key] - actual[user_id][key]) < 0.01, (user_id, key)
+
+def main(steps: int, per_step: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        profile_id = SettlementService.get_default_profile_id(db)
+        history = 0
+
+        print(f"\n📊 All-time balances: full scan vs checkpoint (+{NEW_EXPENSES_AFTER_SETTLE} expenses after settle-up)")
+        print(f"  {'history':>8} {'users full':>11} {'users ckpt':>11} {'groups full':>12} {'groups ckpt':>12}")
+        for _ in range(steps):
+            history += seed_expenses(db, per_step, months=12, seed=history)
+            SettlementService.settle_up(db, profile_id)
+            history += seed_expenses(db, NEW_EXPENSES_AFTER_SETTLE, seed=history)
+
+            users_full, expected = timed(SplitService.calculate_total_user_balances, db, profile_id, False)
+            users_ckpt, result = timed(SplitService.calculate_total_user_balances, db, profile_id, True)
+            assert_same(expected, result)
+
+            groups_full, expected_groups = timed(GroupBalanceService.compute_totals_from_history, db, profile_id, False)
+            groups_ckpt, result_groups = timed(GroupBalanceService.compute_totals_from_history, db, profile_id, True)
+            for expected_totals, result_totals in zip(expected_groups, result_groups):
+                for group in GroupBalanceService.GROUPS:
+                    assert abs(expected_totals[group] - result_totals[group]) < 0.01, group
+
+            print(
+                f"  {history:8d} {users_full * 1000:8.1f} ms {users_ckpt * 1000:8.1f} ms"
+                f" {groups_full * 1000:9.1f} ms {groups_ckpt * 1000:9.1f} ms"
+            )
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    per_step = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    main(steps, per_step)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: settlement plan, greedy matching vs minimum-transfer solver
+
+Before: greedy matching of largest debts with largest credits.
+After: zero-sum subset partitioning (bitmask DP), greedy inside each group.
+
+Property check for 2-20 participants on random integer balances with hidden zero-sum
+groups: both plans settle every balance, the exact plan never has more transfers than
+greedy, and up to 8 participants it matches a brute-force minimum.
+
+Usage: python benchmarks/bench_settlement_plan.py [trials] [max_participants]
+"""
+import random
+import sys
+import time
+from functools import lru_cache
+
+from common import use_temp_database
+
+use_temp_database("settlement_plan")
+
+from services.split import SplitService
+
+def random_balances(rng: random.Random, participants: int) -> dict:
+    """Zero-sum öre balances built from random zero-sum groups of 2-4 people"""
+    nets = []
+    while len(nets) < participants:
+        size = min(rng.randint(2, 4), participants - len(nets))
+        if size == 1:
+            # Join the last person to the previous group
+            extra = rng.randint(1, 500_000)
+            nets[-1] -= extra
+            nets.append(extra)
+            continue
+        group = [rng.randint(-500_000, 500_000) for _ in range(size - 1)]
+        group.append(-sum(group))
+        nets.extend(group)
+    rng.shuffle(nets)
+    return {user_id: {'paid': 0, 'owed': 0, 'net': net} for user_id, net in enumerate(nets, 1)}
+
+def check_settles(balances: dict, plan: list) -> None:
+    """Every transfer moves money from a negative net to a positive one until all are zero"""
+    nets = {user_id: balance['net'] for user_id, balance in balances.items()}
+    for transfer in plan:
+        assert transfer['amount_sek'] > 0
+        nets[transfer['from_user_id']] += transfer['amount_sek']
+        nets[transfer['to_user_id']] -= transfer['amount_sek']
+    assert not any(nets.values()), nets
+
+def brute_force_transfers(amounts: list) -> int:
+    """Minimum transfers by trying every way to split off a zero-sum group"""
+    @lru_cache(maxsize=None)
+    def best(remaining: tuple) -> int:
+        if not remaining:
+            return 0
+        first, rest = remaining[0], remaining[1:]
+        result = len(remaining) - 1
+        for mask in range(1, 1 << len(rest)):
+            group = [rest[i] for i in range(len(rest)) if mask >> i & 1]
+            if first + sum(group) == 0:
+                others = tuple(rest[i] for i in range(len(rest)) if not mask >> i & 1)
+                result = min(result, len(group) + best(others))
+        return result
+
+    return best(tuple(amount for amount in amounts if amount))
+
+def main(trials: int, max_participants: int):
+    rng = random.Random(42)
+    print(f"\n📊 Settlement plans ({trials} random cases per size, fewer above 16)")
+    print(f"  {'people':>6} {'greedy transfers':>17} {'exact transfers':>16} {'greedy ms':>10} {'exact ms':>10}")
+    for participants in range(2, max_participants + 1):
+        cases = trials if participants <= 16 else max(1, trials // 20)
+        greedy_total = exact_total = 0
+        greedy_time = exact_time = 0.0
+        for _ in range(cases):
+            balances = random_balances(rng, participants)
+
+            start = time.perf_counter()
+            greedy = SplitService.calculate_settlement_plan(None, balances, max_exact_participants=0)
+            greedy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            exact = SplitService.calculate_settlement_plan(None, balances, max_exact_participants=participants)
+            exact_time += time.perf_counter() - start
+
+            check_settles(balances, greedy)
+            check_settles(balances, exact)
+            assert len(exact) <= len(greedy)
+            if participants <= 8:
+                assert len(exact) == brute_force_transfers([b['net'] for b in balances.values()])
+            greedy_total += len(greedy)
+            exact_total += len(exact)
+        print(
+            f"  {participants:6d} {greedy_total / cases:17.2f} {exact_total / cases:16.2f} "
+            f"{greedy_time * 1000 / cases:10.3f} {exact_time * 1000 / cases:10.3f}"
+        )
+
+if __name__ == "__main__":
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    max_participants = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(trials, max_participants)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: allocations, per-call split queries vs compiled split rules
+
+Before: the old special_split / FlexibleSplitService logic - a User query per category
+split and one query per participant (reproduced here).
+After: SplitEngine rules compiled once from a membership snapshot, allocations are
+in-memory arithmetic. Also times ExpenseService.resplit_expenses over the whole history.
+
+Usage: python benchmarks/bench_split_engine.py [expenses] [history]
+"""
+import random
+import sys
+import time
+
+from common import use_temp_database, count_queries, seed_expenses
+
+use_temp_database("split_engine")
+
+from db import init_db, engine, SessionLocal
+from models import User, Expense, ExpenseCategory
+from services.expense_service import ExpenseService
+from services.group_balance import GroupBalanceService
+from services.split_engine import split_engine_cache
+from utils.money import round_allocations
+
+# Families as they were hardcoded in FlexibleSplitService
+OLD_GROUP_1_IDS = [804085588, 916228993]
+OLD_GROUP_2_IDS = [252901018, 350653235, 6379711500]
+
+def old_allocations(db, amount: int, category: ExpenseCategory, payer_telegram_id: int,
+                    split_type: str = None, selected: set = None) -> dict:
+    """Previous per-call split logic (queries on every call)"""
+    if payer_telegram_id in OLD_GROUP_1_IDS:
+        opposite = OLD_GROUP_2_IDS
+    else:
+        opposite = OLD_GROUP_1_IDS
+    if split_type == "split_families":
+        users = db.query(User).filter(User.telegram_id.in_(opposite)).all()
+        return round_allocations({user.id: amount / len(users) for user in users})
+    if split_type == "participants":
+        db.query(User).filter(User.telegram_id == payer_telegram_id).first()
+        user_ids = []
+        for telegram_id in selected:
+            if telegram_id in opposite:
+                user = db.query(User).filter(User.telegram_id == telegram_id).first()
+                if user:
+                    user_ids.append(user.id)
+        return round_allocations({user_id: amount / len(selected) for user_id in user_ids})
+    if category == ExpenseCategory.ALCOHOL:
+        users = db.query(User).filter(User.telegram_id != 6379711500).all()
+    else:
+        users = db.query(User).all()
+    return round_allocations({user.id: amount / len(users) for user in users})
+
+def make_cases(db, count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    users = db.query(User).order_by(User.id).all()
+    telegram_ids = [user.telegram_id for user in users]
+    cases = []
+    for i in range(count):
+        payer = rng.choice(users)
+        kind = i % 3
+        split_type = (None, "split_families", "participants")[kind]
+        selected = set(rng.sample(telegram_ids, rng.randint(2, 5))) if kind == 2 else None
+        cases.append((rng.randint(100, 500_000), rng.choice(list(ExpenseCategory)), payer, split_type, selected))
+    return cases
+
+def main(count: int, history: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        cases = make_cases(db, count)
+
+        with count_queries(engine) as before_queries:
+            start = time.perf_counter()
+            before = [
+                old_allocations(db, amount, category, payer.telegram_id, split_type, selected)
+                for amount, category, payer, split_type, selected in cases
+            ]
+            before_time = time.perf_counter() - start
+
+        split_engine_cache.invalidate()
+        with count_queries(engine) as after_queries:
+            start = time.perf_counter()
+            split_engine = split_engine_cache.get(db)
+            after = split_engine.allocate_batch(
+                (split_engine.rule_for(category, payer.id, split_type, selected), amount)
+                for amount, category, payer, split_type, selected in cases
+            )
+            after_time = time.perf_counter() - start
+
+        for old, new in zip(before, after):
+            assert sorted(old) == sorted(new) and sorted(old.values()) == sorted(new.values())
+
+        print(f"\n📊 Allocations for {count} expenses")
+        print(f"  per-call queries: {before_time * 1000:8.1f} ms, {before_queries['count']} queries")
+        print(f"  compiled rules:   {after_time * 1000:8.1f} ms, {after_queries['count']} queries")
+
+        seed_expenses(db, history, months=6)
+        expense_ids = [expense_id for (expense_id,) in db.query(Expense.id).order_by(Expense.id)]
+        with count_queries(engine) as resplit_queries:
+            start = time.perf_counter()
+            ExpenseService.resplit_expenses(db, expense_ids)
+            resplit_time = time.perf_counter() - start
+        assert not GroupBalanceService.verify_ledger(db)
+        print(f"\n📊 resplit_expenses over {len(expense_ids)} expenses")
+        print(f"  {resplit_time:.2f} s, {resplit_queries['count']} queries")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    history = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    main(count, history)
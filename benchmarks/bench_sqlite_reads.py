@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SQLite reads per second under concurrent readers, StaticPool vs WAL + pool
+
+Before: one shared connection (StaticPool), so the DB executor runs with one worker.
+After: WAL, pragmas and a connection pool, executor sized to the pool; writers queue
+on the single-writer lock while reads keep running.
+
+Both runs have one writer adding an expense every few milliseconds and keeping its
+transaction open for a simulated Telegram round trip (update transactions span awaits).
+
+Usage: python benchmarks/bench_sqlite_reads.py [readers] [seconds] [expenses]
+"""
+import sys
+import threading
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+
+from common import use_temp_database, seed_expenses
+
+use_temp_database("sqlite_reads")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from db import init_db, engine, SessionLocal, DATABASE_URL
+from models import Expense, Currency, ExpenseCategory
+from services.expense_service import ExpenseService
+
+WRITE_INTERVAL = 0.005  # seconds between writer inserts
+WRITE_HOLD = 0.02  # seconds the write transaction stays open
+
+def read_unit(session_factory) -> None:
+    """Report read: category totals for the current month"""
+    db = session_factory()
+    try:
+        ExpenseService.get_expenses_by_category(db)
+    finally:
+        db.close()
+
+def write_unit(session_factory) -> None:
+    """Small write transaction"""
+    db = session_factory()
+    try:
+        db.add(Expense(
+            amount=1000, currency=Currency.SEK, exchange_rate=1.0, amount_sek=1000,
+            category=ExpenseCategory.FOOD, payer_id=1, profile_id=1,
+            month=date.today().replace(day=1)
+        ))
+        db.flush()
+        time.sleep(WRITE_HOLD)
+        db.commit()
+    finally:
+        db.close()
+
+def run(session_factory, workers: int, readers: int, seconds: float) -> dict:
+    """Readers and one writer submit work units to an executor of the given size"""
+    executor = ThreadPoolExecutor(max_workers=workers)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0}
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            executor.submit(read_unit, session_factory).result()
+            with lock:
+                counts["reads"] += 1
+
+    def writer():
+        while not stop.is_set():
+            executor.submit(write_unit, session_factory).result()
+            counts["writes"] += 1
+            time.sleep(WRITE_INTERVAL)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    executor.shutdown()
+
+    return {"reads_per_sec": counts["reads"] / seconds, "writes_per_sec": counts["writes"] / seconds}
+
+def main(readers: int, seconds: float, expenses: int):
+    init_db()
+    db = SessionLocal()
+    try:
+        seed_expenses(db, expenses)
+    finally:
+        db.close()
+
+    # Previous configuration: one shared connection, default journal
+    engine.dispose()
+    static_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    with static_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=DELETE")
+    static_factory = sessionmaker(autoflush=False, bind=static_engine)
+
+    print(f"\n📊 {readers} concurrent readers + 1 writer, {expenses} expenses, {seconds:.0f}s per run")
+    configs = (
+        ("StaticPool (before)", static_factory, 1),
+        ("WAL + pool (after)", SessionLocal, engine.pool.size()),
+    )
+    for name, factory, workers in configs:
+        result = run(factory, workers, readers, seconds)
+        print(
+            f"  {name:20} {result['reads_per_sec']:8.1f} reads/s  "
+            f"{result['writes_per_sec']:6.1f} writes/s  ({workers} workers)"
+        )
+        # Next run opens connections in WAL mode again
+        static_engine.dispose()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    readers = args[0] if len(args) > 0 else 8
+    seconds = args[1] if len(args) > 1 else 3
+    expenses = args[2] if len(args) > 2 else 2000
+    main(readers, seconds, expenses)
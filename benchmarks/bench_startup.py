@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start to first getUpdates
+
+Starts `python main.py` against a local fake Bot API server and measures the time until
+the bot's first getUpdates request. Three boots on the same database:
+- first boot: migrations + seeding
+- re-seed boot: seed checksum cleared, seeding runs again (previous behaviour on every boot)
+- warm boot: schema version and seed checksum match, no seeding
+
+Whole boots are dominated by imports (python-telegram-bot / httpx, SQLAlchemy, models)
+and HTTP client setup, so re-seed and warm boots end up within noise of each other.
+The seeding work itself is measured separately: init_db queries and time in-process.
+
+Usage: python benchmarks/bench_startup.py [repeat]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import ROOT_DIR, use_temp_database, count_queries
+
+DB_PATH = use_temp_database("startup")
+
+# Point the bot at the fake server without touching bot.py
+BOOTSTRAP = """
+import sys, runpy
+from telegram.ext import ApplicationBuilder
+_base_url = sys.argv[1]
+_token = ApplicationBuilder.token
+def token(self, value):
+    return _token(self, value).base_url(_base_url).base_file_url(_base_url)
+ApplicationBuilder.token = token
+sys.argv = ["main.py"]
+runpy.run_path("main.py", run_name="__main__")
+"""
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+class FakeBotAPI(BaseHTTPRequestHandler):
+    """Answers getMe / deleteWebhook / getUpdates and records the first getUpdates"""
+    first_get_updates = None
+    event = threading.Event()
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if method == "getUpdates" and not FakeBotAPI.event.is_set():
+            FakeBotAPI.first_get_updates = time.perf_counter()
+            FakeBotAPI.event.set()
+
+        result = {"getMe": BOT_USER, "getUpdates": []}.get(method, True)
+        body = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def boot(base_url: str) -> float:
+    """Start the bot, return seconds until its first getUpdates"""
+    FakeBotAPI.event.clear()
+    env = dict(os.environ, BOT_TOKEN="123:bench", DB_HEALTH_CHECK_INTERVAL="0")
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", BOOTSTRAP, base_url],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not FakeBotAPI.event.wait(timeout=60):
+            raise RuntimeError("bot did not call getUpdates within 60s")
+        return FakeBotAPI.first_get_updates - start
+    finally:
+        process.kill()
+        process.wait()
+
+def clear_seed_checksum() -> None:
+    """Force the next boot to seed again"""
+    import sqlite3
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("DELETE FROM db_meta WHERE key = 'seed_checksum'")
+    conn.commit()
+    conn.close()
+
+def main(repeat: int):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBotAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/bot"
+
+    first = boot(base_url)
+    reseed = []
+    warm = []
+    for _ in range(repeat):
+        clear_seed_checksum()
+        reseed.append(boot(base_url))
+        warm.append(boot(base_url))
+
+    server.shutdown()
+
+    # The part the seed checksum changes: init_db on a migrated database
+    from db import init_db, engine
+    init_times = {}
+    init_queries = {}
+    for name, reseed_first in (("re-seed", True), ("warm", False)):
+        times = []
+        for _ in range(repeat):
+            if reseed_first:
+                clear_seed_checksum()
+            with count_queries(engine) as queries:
+                start = time.perf_counter()
+                init_db()
+                times.append(time.perf_counter() - start)
+        init_times[name] = min(times)
+        init_queries[name] = queries["count"]
+
+    print(f"\n📊 Cold start to first getUpdates (best of {repeat})")
+    print(f"  {'first boot (migrate + seed)':30} {first * 1000:8.0f} ms")
+    print(f"  {'re-seed boot':30} {min(reseed) * 1000:8.0f} ms")
+    print(f"  {'warm boot':30} {min(warm) * 1000:8.0f} ms")
+    print("\n📊 init_db on a migrated database")
+    for name in ("re-seed", "warm"):
+        print(f"  {name:30} {init_times[name] * 1000:8.1f} ms, {init_queries[name]} queries")
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    main(repeat)
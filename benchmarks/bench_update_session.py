@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: connection checkouts and transactions per update, ad-hoc sessions vs session-per-update
+
+Runs real handler callbacks against fake Telegram objects, once as-is (each service
+call opens its own session) and once wrapped with with_db_session.
+
+Usage: python benchmarks/bench_update_session.py
+"""
+import asyncio
+
+from common import use_temp_database, count_events, seed_expenses
+
+use_temp_database("update_session")
+
+from db import init_db, engine, SessionLocal
+from models import User, ExpenseCategory
+from services.shopping_service import ShoppingService
+from services.todo_service import TodoService
+from utils.db_session import with_db_session, current_update_session
+from handlers.reports import delete_expense_confirmation_callback
+from handlers.shopping import remove_item_callback
+from handlers.todo import toggle_todo_item_callback
+
+class FakeTelegramUser:
+    """Minimal telegram user"""
+    def __init__(self, user: User):
+        self.id = user.telegram_id
+        self.username = user.username
+        self.first_name = user.first_name
+        self.last_name = user.last_name
+
+class FakeQuery:
+    """Callback query that swallows replies"""
+    def __init__(self, data: str, user: FakeTelegramUser):
+        self.data = data
+        self.from_user = user
+
+    async def answer(self, *args, **kwargs):
+        pass
+
+    async def edit_message_text(self, *args, **kwargs):
+        pass
+
+class FakeUpdate:
+    def __init__(self, data: str, user: FakeTelegramUser):
+        self.effective_user = user
+        self.callback_query = FakeQuery(data, user)
+        self.message = None
+
+class FakeContext:
+    """Context with context.db like BotContext; without a scope each access opens a session"""
+    def __init__(self):
+        self.bot_data = {}
+
+    @property
+    def db(self):
+        scope = current_update_session.get()
+        return scope.session if scope is not None else SessionLocal()
+
+FLOWS = [
+    ("delete expense", delete_expense_confirmation_callback, "delete_expense_1"),
+    ("toggle todo", toggle_todo_item_callback, "toggle_todo_1"),
+    ("remove shopping item", remove_item_callback, "remove_shopping_2"),
+]
+
+async def main():
+    init_db()
+    db = SessionLocal()
+    try:
+        telegram_user = FakeTelegramUser(db.query(User).first())
+        seed_expenses(db, 20)
+        ShoppingService.add_items(db, ["Молоко", "Хлеб", "Сыр"], ExpenseCategory.FOOD, 1)
+        TodoService.add_item(db, "Купить лампочку", 1)
+    finally:
+        db.close()
+
+    print("\n📊 Connection checkouts / transactions per update")
+    print(f"  {'flow':24} {'before':>12} {'after':>12}")
+    for name, callback, data in FLOWS:
+        results = []
+        for func in (callback, with_db_session(callback)):
+            with count_events(engine, "checkout", "begin") as counter:
+                await func(FakeUpdate(data, telegram_user), FakeContext())
+            results.append(f"{counter['checkout']} / {counter['begin']}")
+        print(f"  {name:24} {results[0]:>12} {results[1]:>12}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
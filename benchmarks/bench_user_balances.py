@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SplitService.calculate_user_balances, N+1 queries vs GROUP BY aggregates
+
+Before: load the month's expenses, then one ExpenseAllocation query per expense.
+After: two GROUP BY queries (paid per payer, owed per user).
+
+Usage: python benchmarks/bench_user_balances.py [expenses]
+"""
+import sys
+from datetime import datetime
+
+from common import use_temp_database, count_queries, seed_expenses, timed
+
+use_temp_database("user_balances")
+
+from db import init_db, engine, SessionLocal
+from models import Expense, ExpenseAllocation
+from services.split import SplitService
+
+def legacy_calculate_user_balances(db, month: datetime):
+    """Previous implementation: one allocation query per expense"""
+    expenses = db.query(Expense).filter(Expense.month == month.date()).all()
+    balances = {}
+    for expense in expenses:
+        allocations = db.query(ExpenseAllocation).filter(
+            ExpenseAllocation.expense_id == expense.id
+        ).all()
+        balances.setdefault(expense.payer_id, {'paid': 0.0, 'owed': 0.0, 'net': 0.0})
+        balances[expense.payer_id]['paid'] += expense.amount_sek
+        for allocation in allocations:
+            balances.setdefault(allocation.user_id, {'paid': 0.0, 'owed': 0.0, 'net': 0.0})
+            balances[allocation.user_id]['owed'] += allocation.amount_sek
+    for balance in balances.values():
+        balance['net'] = balance['owed'] - balance['paid']
+    return balances
+
+def main(count: int):
+    init_db()
+    month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    db = SessionLocal()
+    try:
+        seed_expenses(db, count)
+
+        with count_queries(engine) as before:
+            legacy_calculate_user_balances(db, month)
+        with count_queries(engine) as after:
+            SplitService.calculate_user_balances(db, month)
+
+        before_time, expected = timed(legacy_calculate_user_balances, db, month, repeat=1)
+        after_time, result = timed(SplitService.calculate_user_balances, db, month)
+    finally:
+        db.close()
+
+    for user_id, balance in expected.items():
+        for key in ('paid', 'owed', 'net'):
+            assert abs(balance[key] - result[user_id][key]) < 0.01, (user_id, key)
+
+    print(f"\n📊 calculate_user_balances with {count} expenses in the month")
+    print(f"  {'':12} {'queries':>8} {'time':>10}")
+    print(f"  {'before':12} {before['count']:8d} {before_time * 1000:8.0f} ms")
+    print(f"  {'after':12} {after['count']:8d} {after_time * 1000:8.0f} ms")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    main(count)
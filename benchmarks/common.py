@@ -0,0 +1,124 @@
+"""
+Shared helpers for benchmark scripts
+"""
+import os
+import sys
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, date
+
+# Add project root to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+def use_temp_database(name: str = "bench") -> str:
+    """Point DATABASE_URL to a fresh SQLite file (call before importing db)"""
+    path = os.path.join(tempfile.mkdtemp(prefix="bot_bench_"), f"{name}.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+@contextmanager
+def count_queries(engine):
+    """Count SQL statements executed on engine inside the block"""
+    from sqlalchemy import event
+
+    counter = {"count": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def count_events(target, *names):
+    """Count SQLAlchemy engine/pool events (e.g. "checkout", "begin", "commit") inside the block"""
+    from sqlalchemy import event
+
+    counter = {name: 0 for name in names}
+    listeners = []
+    for name in names:
+        def listener(*args, _name=name, **kwargs):
+            counter[_name] += 1
+        event.listen(target, name, listener)
+        listeners.append((name, listener))
+    try:
+        yield counter
+    finally:
+        for name, listener in listeners:
+            event.remove(target, name, listener)
+
+def timed(func, *args, repeat: int = 3, **kwargs):
+    """Run func several times and return (best seconds, last result)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def seed_expenses(db, count: int, months: int = 1, seed: int = 42, currency=None, exchange_rate: float = 1.0) -> int:
+    """Insert synthetic expenses (minor units) with equal-split allocations in bulk (SEK unless currency is given)"""
+    from sqlalchemy import insert, func
+    from models import Expense, ExpenseAllocation, User, Profile, Currency, ExpenseCategory
+    from utils.money import convert_minor, round_allocations
+
+    rng = random.Random(seed)
+    users = db.query(User).order_by(User.id).all()
+    profile = db.query(Profile).filter(Profile.is_default == True).first()
+    categories = list(ExpenseCategory)
+
+    current_month = datetime.now().replace(day=1).date()
+    month_list = []
+    for i in range(months):
+        year = current_month.year + (current_month.month - 1 - i) // 12
+        month = (current_month.month - 1 - i) % 12 + 1
+        month_list.append(date(year, month, 1))
+
+    next_id = (db.query(func.max(Expense.id)).scalar() or 0) + 1
+    expenses = []
+    allocations = []
+    for i in range(count):
+        amount = rng.randint(1_000, 200_000)  # öre / cents
+        payer = rng.choice(users)
+        expense_month = month_list[i % months]
+        amount_sek = convert_minor(amount, exchange_rate)
+        expenses.append({
+            "id": next_id + i,
+            "amount": amount,
+            "currency": currency or Currency.SEK,
+            "exchange_rate": exchange_rate,
+            "amount_sek": amount_sek,
+            "category": rng.choice(categories),
+            "custom_category_name": None,
+            "payer_id": payer.id,
+            "profile_id": profile.id,
+            "month": expense_month,
+            "created_at": datetime(expense_month.year, expense_month.month, 1 + i % 28, 12, 0),
+        })
+        shares = round_allocations({user.id: amount_sek / len(users) for user in users})
+        for user_id, share in shares.items():
+            allocations.append({
+                "expense_id": next_id + i,
+                "user_id": user_id,
+                "amount_sek": share,
+                "weight_used": 1.0,
+            })
+
+    db.execute(insert(Expense), expenses)
+    db.execute(insert(ExpenseAllocation), allocations)
+    db.commit()
+
+    # Bulk inserts bypass ExpenseService, bring the group balance ledger and category rollup up to date
+    from services.expense_rollup import ExpenseRollupService
+    from services.group_balance import GroupBalanceService
+    ExpenseRollupService.rebuild(db, month_list)
+    GroupBalanceService.rebuild_ledger(db)
+    return count
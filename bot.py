@@ -3,42 +3,16 @@ Main bot application
 """
 import os
 import logging
+from datetime import time
 from dotenv import load_dotenv
 from telegram.ext import (
-    Application, CommandHandler, CallbackQueryHandler, 
-    MessageHandler, filters, ConversationHandler
+    Application, CommandHandler,
+    MessageHandler, filters, ConversationHandler, ContextTypes
 )
-from db import init_db
-from handlers.start import (
-    start_command, main_menu_callback, shopping_command, todo_command,
-    expenses_command, report_command, balances_command, help_command,
-    update_commands_command, db_info_command, group_balances_command
-)
-# Убрали обработчик меню
-from handlers.expense import (
-    expenses_menu_callback, add_expense_callback, handle_amount_input, currency_callback, split_choice_callback
-)
-from handlers.messages import handle_text_message, handle_shopping_category_callback
-from handlers.shopping import (
-    shopping_list_callback, add_shopping_item_callback,
-    list_shopping_items_callback, remove_shopping_item_callback, 
-    toggle_item_callback, remove_item_callback
-)
-from handlers.todo import (
-    todo_list_callback, add_todo_item_callback,
-    list_todo_items_callback, remove_todo_item_callback, 
-    toggle_todo_item_callback, remove_todo_item_specific_callback,
-    handle_todo_input
-)
-from handlers.reports import (
-    report_callback, delete_expenses_callback, 
-    delete_expense_confirmation_callback
-)
-from handlers.commands import set_rate_command, addexpence_command, addexpence_advanced_command
-from handlers.duty import (
-    duty_schedule_callback, my_duties_callback, monthly_schedule_callback,
-    current_week_schedule_callback, mark_completed_callback, complete_duty_callback, generate_schedule_callback
+from handlers.registry import (
+    COMMANDS, TEXT_MESSAGE_HANDLER, IMPORT_DOCUMENT_HANDLER, lazy_handler, build_callback_router
 )
+from handlers.router import CallbackRouterHandler
 
 # Load environment variables
 load_dotenv()
@@ -50,6 +24,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Time of day for the monthly month-close job (JobQueue timezone)
+MONTH_CLOSE_TIME = time(0, 5)
+
 # States for conversation handlers
 WAITING_AMOUNT = 1
 
@@ -65,7 +42,11 @@ def setup_commands(application: Application):
         BotCommand("addexpence", "➕ Добавить расход за другого"),
         BotCommand("addexpence_advanced", "➕ Добавить расход с выбором участников"),
         BotCommand("report", "📊 Отчет"),
+        BotCommand("trends", "📈 Динамика трат по категориям"),
         BotCommand("set_rate", "💱 Установить курс валюты"),
+        BotCommand("fix_rate", "🛠 Исправить курс и пересчитать расходы"),
+        BotCommand("settle_up", "🤝 Контрольная точка балансов"),
+        BotCommand("import", "📥 Импорт расходов из CSV/JSONL"),
         BotCommand("help", "❓ Справка"),
         BotCommand("db_info", "🗄️ Информация о БД")
     ]
@@ -79,78 +60,63 @@ def setup_commands(application: Application):
         logger.error(f"❌ Failed to set bot commands: {e}")
 
 def setup_handlers(application: Application):
-    """Setup all bot handlers"""
+    """Setup all bot handlers (handler modules are imported on first use)"""
     
     # Command handlers
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("shopping", shopping_command))
-    application.add_handler(CommandHandler("todo", todo_command))
-    application.add_handler(CommandHandler("expenses", expenses_command))
-    application.add_handler(CommandHandler("report", report_command))
-    application.add_handler(CommandHandler("balances", balances_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(CommandHandler("update_commands", update_commands_command))
-    application.add_handler(CommandHandler("db_info", db_info_command))
-    application.add_handler(CommandHandler("group_balances", group_balances_command))
-    application.add_handler(CommandHandler("set_rate", set_rate_command))
-    application.add_handler(CommandHandler("addexpence", addexpence_command))
-    application.add_handler(CommandHandler("addexpence_advanced", addexpence_advanced_command))
-    
-    # Callback query handlers
-    application.add_handler(CallbackQueryHandler(main_menu_callback, pattern="^main_menu$"))
-    application.add_handler(CallbackQueryHandler(expenses_menu_callback, pattern="^expenses_menu$"))
-    application.add_handler(CallbackQueryHandler(add_expense_callback, pattern="^add_expense$"))
-    application.add_handler(CallbackQueryHandler(currency_callback, pattern="^currency_"))
-    application.add_handler(CallbackQueryHandler(split_choice_callback, pattern=r"^(participant_[a-z]+|confirm_participants|no_split)$"))
-    application.add_handler(CallbackQueryHandler(handle_shopping_category_callback, pattern="^category_"))
-
-    # Shopping handlers
-    application.add_handler(CallbackQueryHandler(shopping_list_callback, pattern="^shopping_list$"))
-    application.add_handler(CallbackQueryHandler(add_shopping_item_callback, pattern="^add_shopping_item$"))
-    application.add_handler(CallbackQueryHandler(list_shopping_items_callback, pattern="^list_shopping_items$"))
-    application.add_handler(CallbackQueryHandler(remove_shopping_item_callback, pattern="^remove_shopping_item$"))
-    application.add_handler(CallbackQueryHandler(toggle_item_callback, pattern="^toggle_shopping_"))
-    application.add_handler(CallbackQueryHandler(remove_item_callback, pattern="^remove_shopping_"))
-    
-    # Todo handlers
-    application.add_handler(CallbackQueryHandler(todo_list_callback, pattern="^todo_list$"))
-    application.add_handler(CallbackQueryHandler(add_todo_item_callback, pattern="^add_todo_item$"))
-    application.add_handler(CallbackQueryHandler(list_todo_items_callback, pattern="^list_todo_items$"))
-    application.add_handler(CallbackQueryHandler(remove_todo_item_callback, pattern="^remove_todo_item$"))
-    application.add_handler(CallbackQueryHandler(toggle_todo_item_callback, pattern="^toggle_todo_"))
-    application.add_handler(CallbackQueryHandler(remove_todo_item_specific_callback, pattern="^remove_todo_"))
-    
-    # Report handlers
-    application.add_handler(CallbackQueryHandler(report_callback, pattern="^report$"))
-    application.add_handler(CallbackQueryHandler(delete_expenses_callback, pattern="^delete_expenses$"))
-    application.add_handler(CallbackQueryHandler(delete_expense_confirmation_callback, pattern="^delete_expense_"))
-    
-    # Duty schedule handlers
-    application.add_handler(CallbackQueryHandler(duty_schedule_callback, pattern="^duty_schedule$"))
-    application.add_handler(CallbackQueryHandler(my_duties_callback, pattern="^my_duties$"))
-    application.add_handler(CallbackQueryHandler(monthly_schedule_callback, pattern="^monthly_schedule$"))
-    application.add_handler(CallbackQueryHandler(current_week_schedule_callback, pattern="^current_week_schedule$"))
-    application.add_handler(CallbackQueryHandler(mark_completed_callback, pattern="^mark_completed$"))
-    application.add_handler(CallbackQueryHandler(complete_duty_callback, pattern="^complete_duty_"))
-    application.add_handler(CallbackQueryHandler(generate_schedule_callback, pattern="^generate_schedule$"))
+    for command, path in COMMANDS:
+        application.add_handler(CommandHandler(command, lazy_handler(path)))
+    
+    # Callback queries: one router instead of a regex handler per button
+    application.add_handler(CallbackRouterHandler(build_callback_router()))
+    
+    # Expense import: file sent with an /import caption
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r"^/import(@\w+)?(\s|$)"),
+        lazy_handler(IMPORT_DOCUMENT_HANDLER)
+    ))
     
     # Message handlers for text input
     application.add_handler(MessageHandler(
         filters.TEXT & ~filters.COMMAND,
-        handle_text_message
+        lazy_handler(TEXT_MESSAGE_HANDLER)
     ))
-    
-    # Убрали обработчик меню
-    
-    # Пока не нужен - убираем сложную логику
+
+async def shutdown_db(application: Application):
+    """Stop DB worker threads and close pooled connections on shutdown"""
+    from db import engine
+    from utils.db_executor import db_executor
+    db_executor.shutdown(wait=True)
+    engine.dispose()
+
+async def db_health_job(context):
+    """Periodic DB liveness probe (replaces per-session SELECT 1)"""
+    from db import check_db_health
+    if not await check_db_health():
+        logger.error("❌ Database is unreachable, will retry on next probe")
+
+async def month_close_job(context):
+    """Close finished months into MonthSnapshot rows"""
+    from services.month_close import MonthCloseService
+    from utils.db_executor import run_db
+    closed = await run_db(MonthCloseService.close_pending_months)
+    if closed:
+        logger.info(f"📅 Закрыты месяцы: {', '.join(month.strftime('%Y-%m') for month in closed)}")
 
 def main():
     """Main function to run the bot"""
+    # DB engine is created on import - keep it out of `import bot`
+    from db import init_db, SessionLocal, DB_HEALTH_CHECK_INTERVAL
+    from utils.db_session import BotContext, install_db_session_middleware
     
     # Initialize database
     init_db()
     logger.info("Database initialized")
     
+    # Access checks on the event loop read the membership index without a session - load it up front
+    from services.membership import membership_registry
+    with SessionLocal() as db:
+        membership_registry.get(db)
+    
     # Get bot token from environment
     token = os.getenv('BOT_TOKEN')
     if not token:
@@ -158,14 +124,37 @@ def main():
         return
     
     # Create application
-    application = Application.builder().token(token).build()
+    # concurrent_updates: DB work runs on the DB executor (run_db), so other households' updates keep flowing
+    application = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(True)
+        .context_types(ContextTypes(context=BotContext))
+        .post_shutdown(shutdown_db)
+        .build()
+    )
     
     # Setup handlers
     setup_handlers(application)
     
+    # One DB connection per update (context.db), a transaction per run_db work unit
+    install_db_session_middleware(application)
+    
     # Setup commands
     setup_commands(application)
     
+    # Background DB health probe
+    if DB_HEALTH_CHECK_INTERVAL > 0:
+        application.job_queue.run_repeating(
+            db_health_job,
+            interval=DB_HEALTH_CHECK_INTERVAL,
+            first=DB_HEALTH_CHECK_INTERVAL
+        )
+    
+    # Month close: catch up at startup, then on the 1st of every month
+    application.job_queue.run_once(month_close_job, when=0)
+    application.job_queue.run_monthly(month_close_job, when=MONTH_CLOSE_TIME, day=1)
+    
     # Start the bot
     logger.info("Starting bot...")
     application.run_polling()
@@ -2,8 +2,11 @@
 Database configuration and session management
 """
 import os
-from sqlalchemy import create_engine, MetaData, text
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+import sqlite3
+import threading
+from sqlalchemy import create_engine, MetaData, text, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
 
@@ -16,17 +19,108 @@ if os.path.exists('env.production'):
 # Database URL
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/expenses.db')
 
+def _env_flag(name: str, default: str) -> bool:
+    """Read boolean flag from environment"""
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Connection pool configuration (read from environment)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds; Railway proxy drops idle connections
+# Pre-ping costs a round trip per checkout - off by default, liveness is handled by recycle + health probe
+DB_POOL_PRE_PING = _env_flag('DB_POOL_PRE_PING', 'false')
+DB_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_HEALTH_CHECK_INTERVAL', '60'))  # seconds, 0 disables the probe
+
+# SQLite production mode (file databases): WAL + pragmas + connection pool + single writer
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # safe with WAL, no fsync per commit
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # negative = KiB (64 MB)
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # ms to wait for the writer lock
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '5'))  # concurrent readers
+
+def is_memory_sqlite(database_url: str) -> bool:
+    """In-memory SQLite lives in one connection and must stay on StaticPool"""
+    return database_url.startswith('sqlite') and (':memory:' in database_url or database_url.rstrip('/').endswith(':'))
+
+IS_SQLITE = DATABASE_URL.startswith('sqlite')
+
+# How many connections the pool can hand out at once
+if is_memory_sqlite(DATABASE_URL):
+    DB_POOL_CAPACITY = 1
+elif IS_SQLITE:
+    DB_POOL_CAPACITY = SQLITE_POOL_SIZE
+else:
+    DB_POOL_CAPACITY = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection (journal mode is persisted in the file)"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+# Single writer: SQLite allows one write transaction at a time, so writers queue on this
+# lock instead of busy-polling the database file. Readers never take it (WAL).
+sqlite_writer_lock = threading.Lock()
+
+READ_STATEMENTS = ('SELECT', 'PRAGMA', 'WITH', 'EXPLAIN')
+
+def _acquire_writer_lock(conn, cursor, statement, parameters, context, executemany):
+    """Take the writer lock before the first write statement of a transaction"""
+    if conn.info.get('writer_lock') or statement.lstrip()[:7].upper().startswith(READ_STATEMENTS):
+        return
+    if not sqlite_writer_lock.acquire(timeout=SQLITE_BUSY_TIMEOUT / 1000):
+        raise sqlite3.OperationalError("database is locked (writer queue timeout)")
+    conn.info['writer_lock'] = True
+
+def _release_writer_lock(conn):
+    """Release the writer lock when the write transaction ends"""
+    if conn.info.pop('writer_lock', False):
+        sqlite_writer_lock.release()
+
+def _release_writer_lock_on_checkin(dbapi_connection, connection_record):
+    """Safety net: connection returned to the pool without commit/rollback events"""
+    if connection_record is not None and connection_record.info.pop('writer_lock', False):
+        sqlite_writer_lock.release()
+
 # Create engine
-if DATABASE_URL.startswith('sqlite'):
-    # For SQLite, use file-based database
+if is_memory_sqlite(DATABASE_URL):
+    # In-memory SQLite (tests/benchmarks): one shared connection
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool
     )
+elif IS_SQLITE:
+    # File SQLite: pool of connections, WAL lets readers run in parallel with the writer
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=DB_POOL_TIMEOUT
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    event.listen(engine, "before_cursor_execute", _acquire_writer_lock)
+    event.listen(engine, "commit", _release_writer_lock)
+    event.listen(engine, "rollback", _release_writer_lock)
+    event.listen(engine, "checkin", _release_writer_lock_on_checkin)
 else:
     # For PostgreSQL (Railway), use connection pooling
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -37,205 +131,56 @@ Base = declarative_base()
 # Metadata for migrations
 metadata = MetaData()
 
+def dialect_insert(bind):
+    """INSERT construct with ON CONFLICT support for the dialect of a connection or session"""
+    dialect = bind.get_bind().dialect if isinstance(bind, Session) else bind.dialect
+    if dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
 def get_db():
-    """Get database session with connection error handling"""
+    """Get database session (connection liveness is handled by the pool)"""
     db = SessionLocal()
     try:
-        # Test connection
-        db.execute(text("SELECT 1"))
         yield db
-    except Exception as e:
-        # Close session on error
-        db.close()
-        # Re-raise the error
-        raise e
     finally:
         db.close()
 
-def init_db():
-    """Initialize database tables"""
-    # Import models to ensure they are registered
-    from models import User, Profile, ProfileMember, ShoppingItem, TodoItem, Expense, ExpenseAllocation, ExchangeRate, MonthSnapshot, DutyTask, DutySchedule
-    
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-    
-    # Force create exchange rates if they don't exist
-    force_create_exchange_rates()
-    
-    # Force create hardcoded users if they don't exist
-    force_create_users()
-    
-    # Initialize duty tasks if they don't exist
-    from services.duty_service import DutyService
-    db = next(get_db())
-    try:
-        DutyService.initialize_default_tasks(db)
-    finally:
-        db.close()
+def _ping_engine() -> None:
+    """Run a single liveness query on the pool"""
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
 
-def force_create_exchange_rates():
-    """Force create exchange rates if they don't exist"""
-    from models import Currency, ExchangeRate
-    from datetime import datetime, timezone
+async def check_db_health() -> bool:
+    """Background health probe: ping the pool, drop stale connections and reconnect on failure"""
+    healthy = True
     
-    db = next(get_db())
     try:
-        # Check if EUR/SEK rate exists
-        eur_rate = db.query(ExchangeRate).filter(
-            ExchangeRate.from_currency == Currency.EUR,
-            ExchangeRate.to_currency == Currency.SEK
-        ).first()
-        
-        # Check if RUB/SEK rate exists
-        rub_rate = db.query(ExchangeRate).filter(
-            ExchangeRate.from_currency == Currency.RUB,
-            ExchangeRate.to_currency == Currency.SEK
-        ).first()
-        
-        if not eur_rate or not rub_rate:
-            print("🔄 Создаем курсы валют...")
-            
-            # Delete all existing rates
-            db.query(ExchangeRate).delete()
-            
-            # Create new rates
-            rates_data = [
-                {
-                    "from_currency": Currency.EUR,
-                    "to_currency": Currency.SEK,
-                    "rate": 11.30
-                },
-                {
-                    "from_currency": Currency.RUB,
-                    "to_currency": Currency.SEK,
-                    "rate": 0.12
-                }
-            ]
-            
-            for rate_data in rates_data:
-                rate = ExchangeRate(
-                    from_currency=rate_data["from_currency"],
-                    to_currency=rate_data["to_currency"],
-                    rate=rate_data["rate"],
-                    valid_from=datetime.now(timezone.utc)
-                )
-                db.add(rate)
-                print(f"✅ Создан курс {rate_data['from_currency'].value} → {rate_data['to_currency'].value}: {rate_data['rate']}")
-            
-            db.commit()
-            print("🎉 Курсы валют созданы!")
-        else:
-            print("✅ Курсы валют уже существуют")
-            
+        await asyncio.to_thread(_ping_engine)
     except Exception as e:
-        print(f"❌ Ошибка при создании курсов валют: {e}")
-        db.rollback()
-    finally:
-        db.close()
+        print(f"⚠️ Проверка БД не прошла: {e}. Пересоздаем пул соединений")
+        engine.dispose()
+        try:
+            await asyncio.to_thread(_ping_engine)
+        except Exception:
+            healthy = False
+    
+    return healthy
 
-def force_create_users():
-    """Force create 5 hardcoded users if they don't exist"""
-    from models import User, Profile, ProfileMember
+def init_db():
+    """Initialize database schema and seed data"""
+    # Import models to ensure they are registered
+    from models import User, Profile, ProfileMember, ShoppingItem, TodoItem, Expense, ExpenseAllocation, ExchangeRate, MonthSnapshot, Settlement, SettlementGroupBalance, GroupBalance, ExpenseRollup, ExpenseImport, DutyTask, DutySchedule, DbMeta
     
-    db = next(get_db())
-    try:
-        print("🔄 Создаем захардкоженных пользователей...")
-        
-        # Захардкоженные данные пользователей
-        HARDCODED_USERS = [
-            {
-                "telegram_id": 804085588,
-                "first_name": "Сеня",
-                "last_name": "Стрельцов",
-                "username": "the_lodka"
-            },
-            {
-                "telegram_id": 252901018, 
-                "first_name": "Катя",
-                "last_name": "Стрельцова",
-                "username": "katrine_streltsova"
-            },
-            {
-                "telegram_id": 350653235,
-                "first_name": "Дима", 
-                "last_name": "Стрельцов",
-                "username": None
-            },
-            {
-                "telegram_id": 916228993,
-                "first_name": "Даша",
-                "last_name": "Ше",
-                "username": "dashok_she"
-            },
-            {
-                "telegram_id": 6379711500,
-                "first_name": "Миша",
-                "last_name": "Брат",
-                "username": "l_tyti"
-            }
-        ]
-        
-        # Создаем или обновляем каждого пользователя
-        for user_data in HARDCODED_USERS:
-            # Проверяем, существует ли пользователь по telegram_id
-            existing_user = db.query(User).filter(
-                User.telegram_id == user_data["telegram_id"]
-            ).first()
-            
-            if existing_user:
-                # Обновляем существующего пользователя
-                existing_user.first_name = user_data["first_name"]
-                existing_user.last_name = user_data["last_name"]
-                existing_user.username = user_data["username"]
-                print(f"✅ Обновлен пользователь: {user_data['first_name']} (ID: {user_data['telegram_id']})")
-            else:
-                # Создаем нового пользователя
-                new_user = User(
-                    telegram_id=user_data["telegram_id"],
-                    first_name=user_data["first_name"],
-                    last_name=user_data["last_name"],
-                    username=user_data["username"]
-                )
-                db.add(new_user)
-                print(f"✅ Создан пользователь: {user_data['first_name']} (ID: {user_data['telegram_id']})")
-        
-        # Создаем профиль "Home" если его нет
-        home_profile = db.query(Profile).filter(Profile.name == "Home").first()
-        if not home_profile:
-            home_profile = Profile(name="Home", is_default=True)
-            db.add(home_profile)
-            print("✅ Создан профиль Home")
-        
-        # Добавляем всех пользователей в профиль Home с весом 1
-        for user_data in HARDCODED_USERS:
-            user = db.query(User).filter(User.telegram_id == user_data["telegram_id"]).first()
-            if user:
-                # Проверяем, есть ли уже связь
-                existing_member = db.query(ProfileMember).filter(
-                    ProfileMember.profile_id == home_profile.id,
-                    ProfileMember.user_id == user.id
-                ).first()
-                
-                if not existing_member:
-                    member = ProfileMember(
-                        profile_id=home_profile.id,
-                        user_id=user.id,
-                        weight=1.0
-                    )
-                    db.add(member)
-                    print(f"✅ Добавлен {user_data['first_name']} в профиль Home")
-                else:
-                    print(f"✅ {user_data['first_name']} уже в профиле Home")
-        
-        db.commit()
-        print("🎉 Все захардкоженные пользователи созданы/обновлены!")
-        
-    except Exception as e:
-        print(f"❌ Ошибка при создании пользователей: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    # Apply pending schema migrations (no-op when the stored version matches)
+    from migrations import run_migrations
+    run_migrations(engine)
+    
+    # Seed users, Home profile, exchange rates and duty tasks (skipped when the checksum matches)
+    from seed import ensure_seed_data
+    ensure_seed_data(engine)
 
 def reset_db():
     """Reset database (drop all tables and recreate)"""
@@ -1,23 +1,63 @@
 """
 Base handler with common functionality
 """
+from dataclasses import replace
 from typing import Optional
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from models import User
 from db import get_db
 from utils.texts import get_welcome_message
-from utils.access_control import AccessControl
+from utils.db_session import after_commit
+from utils.user_cache import CachedUser, user_cache
+from utils.money import parse_minor
 
 class BaseHandler:
     """Base handler with common functionality"""
     
     @staticmethod
-    def get_or_create_user(db: Session, telegram_user) -> User:
+    def get_or_create_user(db: Session, telegram_user) -> CachedUser:
         """Get existing user or create new one (only for allowed users)"""
-        # Check if user is allowed to use the bot
-        if not AccessControl.is_user_allowed(telegram_user.id):
+        # Check if user is allowed to use the bot (revalidated index, not the event loop's copy)
+        from services.membership import membership_registry
+        if telegram_user.id not in membership_registry.get(db).allowed_telegram_ids:
             raise PermissionError(f"User {telegram_user.id} is not allowed to use this bot")
         
+        # Hot path: known user with unchanged name fields - no queries
+        cached = user_cache.get(db, telegram_user.id)
+        if cached:
+            if cached.same_names(telegram_user):
+                return cached
+            
+            # Name changed - update only if nobody else changed the user since we cached it
+            result = db.execute(
+                update(User)
+                .where(User.id == cached.id, User.version == cached.version)
+                .values(
+                    username=telegram_user.username,
+                    first_name=telegram_user.first_name,
+                    last_name=telegram_user.last_name,
+                    version=cached.version + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                user = replace(
+                    cached,
+                    username=telegram_user.username,
+                    first_name=telegram_user.first_name,
+                    last_name=telegram_user.last_name,
+                    version=cached.version + 1
+                )
+                # Inside an update db.commit() only flushes - cache the row once it is visible
+                after_commit(db, lambda: user_cache.put(user))
+                db.commit()
+                print(f"✅ Обновлены данные пользователя: {user.first_name} (ID: {user.telegram_id})")
+                return user
+            
+            # Stale entry - reload from the database
+            user_cache.invalidate(telegram_user.id)
+        
         # Сначала ищем по telegram_id (числовой ID)
         user = db.query(User).filter(User.telegram_id == telegram_user.id).first()
         
@@ -35,22 +75,42 @@ class BaseHandler:
                 updated = True
             
             if updated:
+                # version is bumped by the mapper (version_id_col)
+                db.flush()
+                cached = CachedUser.from_model(user)
+                after_commit(db, lambda: user_cache.put(cached))
                 db.commit()
                 print(f"✅ Обновлены данные пользователя: {user.first_name} (ID: {user.telegram_id})")
-        else:
-            # Пользователь не найден - создаем нового (только для разрешенных)
-            user = User(
-                telegram_id=telegram_user.id,
-                username=telegram_user.username,
-                first_name=telegram_user.first_name,
-                last_name=telegram_user.last_name
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            print(f"✅ Создан новый пользователь: {user.first_name} (ID: {user.telegram_id})")
+                return cached
+            
+            cached = CachedUser.from_model(user)
+            user_cache.put(cached)
+            return cached
+        
+        # Пользователь не найден - создаем нового (только для разрешенных)
+        user = User(
+            telegram_id=telegram_user.id,
+            username=telegram_user.username,
+            first_name=telegram_user.first_name,
+            last_name=telegram_user.last_name
+        )
+        db.add(user)
         
-        return user
+        # Category split rules include every user
+        from services.membership import bump_membership_version, membership_registry
+        bump_membership_version(db.connection())
+        db.flush()
+        cached = CachedUser.from_model(user)
+        after_commit(db, membership_registry.invalidate)
+        after_commit(db, lambda: user_cache.put(cached))
+        db.commit()
+        print(f"✅ Создан новый пользователь: {cached.first_name} (ID: {cached.telegram_id})")
+        return cached
+    
+    @staticmethod
+    def get_or_create_user_name(db: Session, telegram_user) -> str:
+        """Get display name of telegram user (creates user if needed)"""
+        return BaseHandler.get_user_name(BaseHandler.get_or_create_user(db, telegram_user))
     
     @staticmethod
     def get_user_name(user: User) -> str:
@@ -63,15 +123,12 @@ class BaseHandler:
             return f"User {user.telegram_id}"
     
     @staticmethod
-    def validate_amount(amount_str: str) -> Optional[float]:
-        """Validate and parse amount string"""
-        try:
-            amount = float(amount_str.replace(',', '.'))
-            if amount <= 0:
-                return None
-            return amount
-        except ValueError:
+    def validate_amount(amount_str: str) -> Optional[int]:
+        """Validate and parse amount string to minor units (öre, cents, kopecks)"""
+        amount = parse_minor(amount_str)
+        if amount is None or amount <= 0:
             return None
+        return amount
     
     @staticmethod
     def validate_exchange_rate(rate_str: str) -> Optional[float]:
@@ -4,16 +4,68 @@ Command handlers
 from telegram import Update
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
 from handlers.base import BaseHandler
-from models import ExchangeRate, Currency, ExpenseCategory, User, Profile
+from models import ExchangeRate, Currency, ExpenseCategory, Profile
 from services.expense_service import ExpenseService
 from services.flexible_split import FlexibleSplitService
+from services.membership import membership_registry
 from utils.texts import get_category_name, get_currency_name, format_amount
 from utils.access_control import require_access
+from utils.db_executor import run_db
+from typing import Dict, Optional, Set, Tuple
 from datetime import datetime
 import re
 
+def create_expense_for_payer(db: Session, payer_telegram_id: int, amount: int, currency: Currency,
+                             category: ExpenseCategory, custom_name: str = None,
+                             participant_telegram_ids: Set[int] = None) -> Optional[str]:
+    """DB work unit: create expense paid by payer, return payer name (None if payer not found)"""
+    membership = membership_registry.get(db)
+    payer_id = membership.user_ids.get(payer_telegram_id)
+    if payer_id is None:
+        return None
+    
+    profile = ExpenseService.get_or_create_home_profile(db)
+    
+    # Allocations come from the compiled split rule inside create_expense
+    ExpenseService.create_expense(
+        db=db,
+        amount=amount,
+        currency=currency,
+        category=category,
+        payer_id=payer_id,
+        profile_id=profile.id,
+        custom_category_name=custom_name,
+        split_type="participants" if participant_telegram_ids else None,
+        selected_participants=participant_telegram_ids
+    )
+    
+    return membership.name_of_telegram(payer_telegram_id)
+
+def settle_up_for_user(db: Session, telegram_user) -> Optional[str]:
+    """DB work unit: record settle-up checkpoint, return balance report (None if no default profile)"""
+    from services.settlement import SettlementService
+    from services.group_balance import GroupBalanceService
+    
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    settlement = SettlementService.settle_up(db, created_by_id=user.id)
+    if settlement is None:
+        return None
+    
+    return (
+        f"✅ Контрольная точка сохранена (учтены расходы до #{settlement.last_expense_id})\n\n"
+        + GroupBalanceService.get_detailed_balance_report(db, settlement.profile_id)
+    )
+
+def correct_rate_as_admin(db: Session, telegram_user, currency: Currency, rate: float) -> Tuple[bool, Optional[Dict]]:
+    """DB work unit: re-price a rate if the user is an admin, return (allowed, summary)"""
+    from services.repricing import RepricingService
+    
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    if not user.is_admin:
+        return False, None
+    return True, RepricingService.correct_rate(db, currency, rate)
+
 @require_access
 async def set_rate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /set_rate command"""
@@ -46,27 +98,8 @@ async def set_rate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Invalidate previous rates
-        db.query(ExchangeRate).filter(
-            ExchangeRate.from_currency == currency,
-            ExchangeRate.to_currency == Currency.SEK,
-            ExchangeRate.valid_until.is_(None)
-        ).update({"valid_until": datetime.utcnow()})
-        
-        # Create new rate
-        new_rate = ExchangeRate(
-            from_currency=currency,
-            to_currency=Currency.SEK,
-            rate=rate,
-            valid_from=datetime.utcnow()
-        )
-        
-        db.add(new_rate)
-        db.commit()
+        new_rate = await run_db(ExpenseService.set_exchange_rate, currency, rate)
         
         await update.message.reply_text(
             f"✅ Курс обновлен!\n\n"
@@ -76,8 +109,58 @@ async def set_rate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при обновлении курса: {str(e)}")
-    finally:
-        db.close()
+
+@require_access
+async def fix_rate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /fix_rate command: correct the latest rate and re-price its expenses"""
+    if not context.args or len(context.args) != 2:
+        await update.message.reply_text(
+            "❌ Неверный формат команды.\n\n"
+            "Используйте: /fix_rate EUR 11.25\n"
+            "Исправляет последний курс валюты и пересчитывает расходы, созданные по нему"
+        )
+        return
+    
+    currency_str = context.args[0].upper()
+    try:
+        currency = Currency(currency_str)
+    except ValueError:
+        await update.message.reply_text(f"❌ Неподдерживаемая валюта: {currency_str}")
+        return
+    if currency == Currency.SEK:
+        await update.message.reply_text("❌ Курс SEK всегда равен 1")
+        return
+    
+    rate = BaseHandler.validate_exchange_rate(context.args[1])
+    if rate is None:
+        await update.message.reply_text(
+            "❌ Неверный формат курса.\n\n"
+            "Используйте положительное число, например: 11.25"
+        )
+        return
+    
+    try:
+        allowed, result = await run_db(correct_rate_as_admin, update.effective_user, currency, rate)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка при исправлении курса: {str(e)}")
+        return
+    
+    # Re-pricing rewrites every expense of the rate's period
+    if not allowed:
+        await update.message.reply_text("🚫 Исправлять курсы может только администратор")
+        return
+    
+    if result is None:
+        await update.message.reply_text(f"❌ Курс {currency.value} не найден")
+        return
+    
+    valid_until = result["valid_until"].strftime('%d.%m.%Y %H:%M') if result["valid_until"] else "сейчас"
+    await update.message.reply_text(
+        f"✅ Курс исправлен!\n\n"
+        f"1 {currency.value}: {result['old_rate']:.2f} → {rate:.2f} SEK\n"
+        f"Период: {result['valid_from'].strftime('%d.%m.%Y %H:%M')} — {valid_until}\n"
+        f"Пересчитано расходов: {result['expenses']} (долей: {result['allocations']})"
+    )
 
 @require_access
 async def addexpence_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -146,63 +229,28 @@ async def addexpence_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Map payer names to telegram IDs
-    payer_map = {
-        "дима": 350653235,
-        "катя": 252901018,
-        "сеня": 804085588,
-        "даша": 916228993,
-        "миша": 6379711500
-    }
+    membership = await run_db(membership_registry.get)
     
-    if payer_name not in payer_map:
+    if payer_name not in membership.names:
         await update.message.reply_text(
             f"❌ Неверное имя плательщика: {payer_name}\n\n"
-            f"Доступные имена: {', '.join(payer_map.keys())}"
+            f"Доступные имена: {', '.join(membership.aliases)}"
         )
         return
     
-    payer_telegram_id = payer_map[payer_name]
-    
-    # Get database session
-    db = next(get_db())
+    payer_telegram_id = membership.names[payer_name]
     
     try:
-        # Get or create payer user
-        payer_user = db.query(User).filter(User.telegram_id == payer_telegram_id).first()
-        if not payer_user:
+        payer_display_name = await run_db(
+            create_expense_for_payer, payer_telegram_id, amount, currency, category, custom_name
+        )
+        if not payer_display_name:
             await update.message.reply_text(
                 f"❌ Пользователь {payer_name} не найден в системе.\n"
                 "Попросите его присоединиться к боту с помощью /start"
             )
             return
         
-        # Get default profile (Home)
-        profile = db.query(Profile).filter(Profile.name == "Home").first()
-        if not profile:
-            # Create default profile if it doesn't exist
-            profile = Profile(name="Home", is_default=True)
-            db.add(profile)
-            db.commit()
-            db.refresh(profile)
-        
-        # Create expense with special splitting logic
-        from services.special_split import calculate_special_split
-        
-        # Calculate allocations based on category
-        allocations = calculate_special_split(db, amount, category, profile.id)
-        
-        # Create expense
-        expense = ExpenseService.create_expense(
-            db=db,
-            amount=amount,
-            currency=currency,
-            category=category,
-            payer_id=payer_user.id,
-            profile_id=profile.id,
-            allocations=allocations,
-            custom_category_name=custom_name
-        )
-        
         # Show success message
         text = f"✅ Расход добавлен!\n\n"
         if custom_name:
@@ -211,14 +259,12 @@ async def addexpence_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             text += f"📂 Категория: {get_category_name(category)}\n"
         text += f"💱 Валюта: {get_currency_name(currency)}\n"
         text += f"💰 Сумма: {format_amount(amount, currency)}\n"
-        text += f"💳 Оплатил: {BaseHandler.get_user_name(payer_user)}"
+        text += f"💳 Оплатил: {payer_display_name}"
         
         await update.message.reply_text(text)
         
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при создании расхода: {str(e)}")
-    finally:
-        db.close()
 
 @require_access
 async def addexpence_advanced_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -289,19 +335,14 @@ async def addexpence_advanced_command(update: Update, context: ContextTypes.DEFA
         return
     
     # Map names to telegram IDs
-    name_map = {
-        "дима": 350653235,
-        "катя": 252901018,
-        "сеня": 804085588,
-        "даша": 916228993,
-        "миша": 6379711500
-    }
+    membership = await run_db(membership_registry.get)
+    name_map = membership.names
     
     # Validate payer
     if payer_name not in name_map:
         await update.message.reply_text(
             f"❌ Неверное имя плательщика: {payer_name}\n\n"
-            f"Доступные имена: {', '.join(name_map.keys())}"
+            f"Доступные имена: {', '.join(membership.aliases)}"
         )
         return
     
@@ -320,7 +361,7 @@ async def addexpence_advanced_command(update: Update, context: ContextTypes.DEFA
     if invalid_names:
         await update.message.reply_text(
             f"❌ Неверные имена участников: {', '.join(invalid_names)}\n\n"
-            f"Доступные имена: {', '.join(name_map.keys())}"
+            f"Доступные имена: {', '.join(membership.aliases)}"
         )
         return
     
@@ -328,64 +369,23 @@ async def addexpence_advanced_command(update: Update, context: ContextTypes.DEFA
     participant_telegram_ids = set(name_map[name] for name in participant_names)
     
     # Check that participants are from different groups (same logic as in expense.py)
-    group_1_selected = any(telegram_id in FlexibleSplitService.GROUP_1_IDS for telegram_id in participant_telegram_ids)
-    group_2_selected = any(telegram_id in FlexibleSplitService.GROUP_2_IDS for telegram_id in participant_telegram_ids)
-    
-    only_group_1 = group_1_selected and not group_2_selected
-    only_group_2 = group_2_selected and not group_1_selected
-    
-    if only_group_1 or only_group_2:
-        if only_group_1:
-            group_name = "Даша + Сеня"
-        else:
-            group_name = "Дима + Катя + Миша"
-        
-        await update.message.reply_text(
-            f"❌ Нельзя выбрать только участников из группы '{group_name}'. Выберите участников из РАЗНЫХ групп!"
-        )
+    error_text = FlexibleSplitService.single_group_error(membership, participant_telegram_ids)
+    if error_text:
+        await update.message.reply_text(error_text)
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get or create payer user
-        payer_user = db.query(User).filter(User.telegram_id == payer_telegram_id).first()
-        if not payer_user:
+        payer_display_name = await run_db(
+            create_expense_for_payer, payer_telegram_id, amount, currency, category, custom_name,
+            participant_telegram_ids
+        )
+        if not payer_display_name:
             await update.message.reply_text(
                 f"❌ Пользователь {payer_name} не найден в системе.\n"
                 "Попросите его присоединиться к боту с помощью /start"
             )
             return
         
-        # Get default profile (Home)
-        profile = db.query(Profile).filter(Profile.name == "Home").first()
-        if not profile:
-            # Create default profile if it doesn't exist
-            profile = Profile(name="Home", is_default=True)
-            db.add(profile)
-            db.commit()
-            db.refresh(profile)
-        
-        # Create expense with participant split logic
-        allocations = FlexibleSplitService.calculate_participant_split(
-            db, amount, participant_telegram_ids, payer_telegram_id
-        )
-        
-        # Create expense
-        expense = ExpenseService.create_expense(
-            db=db,
-            amount=amount,
-            currency=currency,
-            category=category,
-            payer_id=payer_user.id,
-            profile_id=profile.id,
-            allocations=allocations,
-            custom_category_name=custom_name,
-            split_type="participants",
-            selected_participants=participant_telegram_ids
-        )
-        
         # Show success message
         text = f"✅ Расход добавлен!\n\n"
         if custom_name:
@@ -394,12 +394,22 @@ async def addexpence_advanced_command(update: Update, context: ContextTypes.DEFA
             text += f"📂 Категория: {get_category_name(category)}\n"
         text += f"💱 Валюта: {get_currency_name(currency)}\n"
         text += f"💰 Сумма: {format_amount(amount, currency)}\n"
-        text += f"💳 Оплатил: {BaseHandler.get_user_name(payer_user)}\n"
+        text += f"💳 Оплатил: {payer_display_name}\n"
         text += f"👥 Участники: {', '.join(participant_names)}"
         
         await update.message.reply_text(text)
         
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при создании расхода: {str(e)}")
-    finally:
-        db.close()
+
+@require_access
+async def settle_up_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /settle_up command - record balances checkpoint"""
+    try:
+        text = await run_db(settle_up_for_user, update.effective_user)
+        if text is None:
+            await update.message.reply_text("❌ Профиль по умолчанию не найден")
+            return
+        await update.message.reply_text(text)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка при сохранении контрольной точки: {str(e)}")
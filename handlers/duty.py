@@ -2,14 +2,14 @@
 Duty schedule handlers
 """
 from datetime import datetime, date, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
 
 from services.duty_service import DutyService
 from utils.keyboards import back_keyboard
-from db import get_db
+from utils.db_executor import run_db
 from models import DutySchedule
 
 
@@ -74,45 +74,51 @@ async def duty_schedule_callback(update: Update, context: ContextTypes.DEFAULT_T
     )
 
 
+def build_my_duties_text(db: Session, telegram_id: int) -> Optional[str]:
+    """DB work unit: user's duties for current week (None if user not found)"""
+    # Get user from database
+    from models import User
+    user = db.query(User).filter(User.telegram_id == telegram_id).first()
+    if not user:
+        return None
+    
+    # Get current week
+    today = date.today()
+    start_of_week = today - timedelta(days=today.weekday())
+    
+    # Get duties for the week
+    duties = DutyService.get_user_duties_for_week(db, user.id, start_of_week)
+    
+    text = f"📋 **Мои дежурства на неделю**\n"
+    text += f"📅 {start_of_week.strftime('%d.%m')} - {(start_of_week + timedelta(days=6)).strftime('%d.%m.%Y')}\n\n"
+    
+    if not duties:
+        text += "🎉 На этой неделе у вас нет дежурств!"
+    else:
+        for date_str, day_duties in duties.items():
+            duty_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+            day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][duty_date.weekday()]
+            
+            text += f"**{day_name} {duty_date.strftime('%d.%m')}:**\n"
+            for duty in day_duties:
+                status = "✅" if duty.is_completed else "⏳"
+                text += f"  {status} {duty.task.name}\n"
+            text += "\n"
+    
+    return text
+
+
 async def my_duties_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show user's duties for current week"""
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
-        user_id = query.from_user.id
-        
-        # Get user from database
-        from models import User
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
+        text = await run_db(build_my_duties_text, query.from_user.id)
+        if text is None:
             await query.edit_message_text("❌ Пользователь не найден")
             return
         
-        # Get current week
-        today = date.today()
-        start_of_week = today - timedelta(days=today.weekday())
-        
-        # Get duties for the week
-        duties = DutyService.get_user_duties_for_week(db, user.id, start_of_week)
-        
-        text = f"📋 **Мои дежурства на неделю**\n"
-        text += f"📅 {start_of_week.strftime('%d.%m')} - {(start_of_week + timedelta(days=6)).strftime('%d.%m.%Y')}\n\n"
-        
-        if not duties:
-            text += "🎉 На этой неделе у вас нет дежурств!"
-        else:
-            for date_str, day_duties in duties.items():
-                duty_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][duty_date.weekday()]
-                
-                text += f"**{day_name} {duty_date.strftime('%d.%m')}:**\n"
-                for duty in day_duties:
-                    status = "✅" if duty.is_completed else "⏳"
-                    text += f"  {status} {duty.task.name}\n"
-                text += "\n"
-        
         keyboard = back_keyboard("duty_schedule")
         await query.edit_message_text(
             text, 
@@ -122,8 +128,68 @@ async def my_duties_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
+
+
+def build_monthly_schedule_text(db: Session) -> str:
+    """DB work unit: duty schedule text for current month"""
+    # Get current month
+    today = date.today()
+    year = today.year
+    month = today.month
+    
+    # Check if schedule exists for this month
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    
+    schedules = DutyService.get_schedule_for_date_range(db, start_date, end_date)
+    
+    if not schedules:
+        text = f"📅 **График на {today.strftime('%B %Y')}**\n\n"
+        text += "❌ График не сгенерирован для этого месяца.\n"
+        text += "Нажмите 'Сгенерировать график' для создания."
+    else:
+        text = f"📅 **График на {today.strftime('%B %Y')}**\n\n"
+        
+        # Show only current and future weeks to avoid message being too long
+        current_date = start_date
+        week_num = 1
+        
+        while current_date <= end_date:
+            week_end = min(current_date + timedelta(days=6), end_date)
+            
+            # Skip past weeks (only show current week and future weeks)
+            if week_end < today:
+                current_date += timedelta(days=7)
+                week_num += 1
+                continue
+            
+            text += f"**Неделя {week_num}** ({current_date.strftime('%d.%m')} - {week_end.strftime('%d.%m')}):\n"
+            
+            for i in range(7):
+                check_date = current_date + timedelta(days=i)
+                if check_date > end_date:
+                    break
+                
+                date_str = check_date.strftime("%Y-%m-%d")
+                day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][check_date.weekday()]
+                
+                if date_str in schedules:
+                    text += f"  {day_name} {check_date.strftime('%d.%m')}:\n"
+                    # Sort duties in logical meal order
+                    sorted_duties = sort_duties_by_meal_order(schedules[date_str])
+                    for duty in sorted_duties:
+                        status = "✅" if duty.is_completed else "⏳"
+                        user_name = duty.assigned_user.first_name or duty.assigned_user.username or "Неизвестно"
+                        text += f"    {status} {duty.task.name} - {user_name}\n"
+            
+            text += "\n"
+            current_date += timedelta(days=7)
+            week_num += 1
+    
+    return text
 
 
 async def monthly_schedule_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -131,64 +197,8 @@ async def monthly_schedule_callback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
-        # Get current month
-        today = date.today()
-        year = today.year
-        month = today.month
-        
-        # Check if schedule exists for this month
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(year, month + 1, 1) - timedelta(days=1)
-        
-        schedules = DutyService.get_schedule_for_date_range(db, start_date, end_date)
-        
-        if not schedules:
-            text = f"📅 **График на {today.strftime('%B %Y')}**\n\n"
-            text += "❌ График не сгенерирован для этого месяца.\n"
-            text += "Нажмите 'Сгенерировать график' для создания."
-        else:
-            text = f"📅 **График на {today.strftime('%B %Y')}**\n\n"
-            
-            # Show only current and future weeks to avoid message being too long
-            current_date = start_date
-            week_num = 1
-            
-            while current_date <= end_date:
-                week_end = min(current_date + timedelta(days=6), end_date)
-                
-                # Skip past weeks (only show current week and future weeks)
-                if week_end < today:
-                    current_date += timedelta(days=7)
-                    week_num += 1
-                    continue
-                
-                text += f"**Неделя {week_num}** ({current_date.strftime('%d.%m')} - {week_end.strftime('%d.%m')}):\n"
-                
-                for i in range(7):
-                    check_date = current_date + timedelta(days=i)
-                    if check_date > end_date:
-                        break
-                    
-                    date_str = check_date.strftime("%Y-%m-%d")
-                    day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][check_date.weekday()]
-                    
-                    if date_str in schedules:
-                        text += f"  {day_name} {check_date.strftime('%d.%m')}:\n"
-                        # Sort duties in logical meal order
-                        sorted_duties = sort_duties_by_meal_order(schedules[date_str])
-                        for duty in sorted_duties:
-                            status = "✅" if duty.is_completed else "⏳"
-                            user_name = duty.assigned_user.first_name or duty.assigned_user.username or "Неизвестно"
-                            text += f"    {status} {duty.task.name} - {user_name}\n"
-                
-                text += "\n"
-                current_date += timedelta(days=7)
-                week_num += 1
+        text = await run_db(build_monthly_schedule_text)
         
         keyboard = back_keyboard("duty_schedule")
         
@@ -205,8 +215,42 @@ async def monthly_schedule_callback(update: Update, context: ContextTypes.DEFAUL
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
+
+
+def build_current_week_text(db: Session) -> str:
+    """DB work unit: duty schedule text for current week"""
+    # Get current week
+    today = date.today()
+    start_of_week = today - timedelta(days=today.weekday())
+    end_of_week = start_of_week + timedelta(days=6)
+    
+    # Get schedules for current week
+    schedules = DutyService.get_schedule_for_date_range(db, start_of_week, end_of_week)
+    
+    text = f"📅 **График на текущую неделю**\n"
+    text += f"📅 {start_of_week.strftime('%d.%m')} - {end_of_week.strftime('%d.%m.%Y')}\n\n"
+    
+    if not schedules:
+        text += "🎉 На этой неделе нет дежурств!"
+    else:
+        current_date = start_of_week
+        while current_date <= end_of_week:
+            date_str = current_date.strftime("%Y-%m-%d")
+            day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][current_date.weekday()]
+            
+            if date_str in schedules:
+                text += f"**{day_name} {current_date.strftime('%d.%m')}:**\n"
+                # Sort duties in logical meal order
+                sorted_duties = sort_duties_by_meal_order(schedules[date_str])
+                for duty in sorted_duties:
+                    status = "✅" if duty.is_completed else "⏳"
+                    user_name = duty.assigned_user.first_name or duty.assigned_user.username or "Неизвестно"
+                    text += f"  {status} {duty.task.name} - {user_name}\n"
+                text += "\n"
+            
+            current_date += timedelta(days=1)
+    
+    return text
 
 
 async def current_week_schedule_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -214,38 +258,8 @@ async def current_week_schedule_callback(update: Update, context: ContextTypes.D
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
-        # Get current week
-        today = date.today()
-        start_of_week = today - timedelta(days=today.weekday())
-        end_of_week = start_of_week + timedelta(days=6)
-        
-        # Get schedules for current week
-        schedules = DutyService.get_schedule_for_date_range(db, start_of_week, end_of_week)
-        
-        text = f"📅 **График на текущую неделю**\n"
-        text += f"📅 {start_of_week.strftime('%d.%m')} - {end_of_week.strftime('%d.%m.%Y')}\n\n"
-        
-        if not schedules:
-            text += "🎉 На этой неделе нет дежурств!"
-        else:
-            current_date = start_of_week
-            while current_date <= end_of_week:
-                date_str = current_date.strftime("%Y-%m-%d")
-                day_name = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][current_date.weekday()]
-                
-                if date_str in schedules:
-                    text += f"**{day_name} {current_date.strftime('%d.%m')}:**\n"
-                    # Sort duties in logical meal order
-                    sorted_duties = sort_duties_by_meal_order(schedules[date_str])
-                    for duty in sorted_duties:
-                        status = "✅" if duty.is_completed else "⏳"
-                        user_name = duty.assigned_user.first_name or duty.assigned_user.username or "Неизвестно"
-                        text += f"  {status} {duty.task.name} - {user_name}\n"
-                    text += "\n"
-                
-                current_date += timedelta(days=1)
+        text = await run_db(build_current_week_text)
         
         keyboard = back_keyboard("duty_schedule")
         await query.edit_message_text(
@@ -256,8 +270,46 @@ async def current_week_schedule_callback(update: Update, context: ContextTypes.D
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
+
+
+def build_mark_completed_menu(db: Session, telegram_id: int) -> Optional[Tuple[str, Optional[list]]]:
+    """DB work unit: text and duty buttons for today (None if user not found)"""
+    # Get user from database
+    from models import User
+    user = db.query(User).filter(User.telegram_id == telegram_id).first()
+    if not user:
+        return None
+    
+    # Get today's duties for this user
+    today = date.today()
+    today_duties = DutyService.get_user_duties_for_date(db, user.id, today)
+    
+    if not today_duties:
+        text = f"📅 **Отметить выполнение**\n\n"
+        text += f"🎉 У вас нет дежурств на сегодня ({today.strftime('%d.%m.%Y')})!"
+        return text, None
+    
+    text = f"📅 **Отметить выполнение**\n"
+    text += f"📅 {today.strftime('%d.%m.%Y')}\n\n"
+    text += "Выберите выполненное дежурство:"
+    
+    keyboard = []
+    for duty in today_duties:
+        if not duty.is_completed:
+            button_text = f"✅ {duty.task.name}"
+            keyboard.append([InlineKeyboardButton(
+                button_text, 
+                callback_data=f"complete_duty_{duty.id}"
+            )])
+    
+    if not keyboard:
+        text = f"📅 **Отметить выполнение**\n\n"
+        text += f"🎉 Все дежурства на сегодня ({today.strftime('%d.%m.%Y')}) уже выполнены!"
+        keyboard = [back_keyboard("duty_schedule").inline_keyboard[0]]
+    else:
+        keyboard.append(back_keyboard("duty_schedule").inline_keyboard[0])
+    
+    return text, keyboard
 
 
 async def mark_completed_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -265,48 +317,17 @@ async def mark_completed_callback(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
-        user_id = query.from_user.id
-        
-        # Get user from database
-        from models import User
-        user = db.query(User).filter(User.telegram_id == user_id).first()
-        if not user:
+        menu = await run_db(build_mark_completed_menu, query.from_user.id)
+        if menu is None:
             await query.edit_message_text("❌ Пользователь не найден")
             return
         
-        # Get today's duties for this user
-        today = date.today()
-        today_duties = DutyService.get_user_duties_for_date(db, user.id, today)
-        
-        if not today_duties:
-            text = f"📅 **Отметить выполнение**\n\n"
-            text += f"🎉 У вас нет дежурств на сегодня ({today.strftime('%d.%m.%Y')})!"
-        else:
-            text = f"📅 **Отметить выполнение**\n"
-            text += f"📅 {today.strftime('%d.%m.%Y')}\n\n"
-            text += "Выберите выполненное дежурство:"
-            
-            keyboard = []
-            for duty in today_duties:
-                if not duty.is_completed:
-                    button_text = f"✅ {duty.task.name}"
-                    keyboard.append([InlineKeyboardButton(
-                        button_text, 
-                        callback_data=f"complete_duty_{duty.id}"
-                    )])
-            
-            if not keyboard:
-                text = f"📅 **Отметить выполнение**\n\n"
-                text += f"🎉 Все дежурства на сегодня ({today.strftime('%d.%m.%Y')}) уже выполнены!"
-                keyboard = [back_keyboard("duty_schedule").inline_keyboard[0]]
-            else:
-                keyboard.append(back_keyboard("duty_schedule").inline_keyboard[0])
-            
+        text, buttons = menu
+        if buttons:
             await query.edit_message_text(
                 text, 
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=InlineKeyboardMarkup(buttons),
                 parse_mode='Markdown'
             )
             return
@@ -320,8 +341,6 @@ async def mark_completed_callback(update: Update, context: ContextTypes.DEFAULT_
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
 
 
 async def complete_duty_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -329,13 +348,12 @@ async def complete_duty_callback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
         # Extract duty ID from callback data
         duty_id = int(query.data.split("_")[-1])
         
         # Mark as completed
-        success = DutyService.mark_task_completed(db, duty_id, query.from_user.id)
+        success = await run_db(DutyService.mark_task_completed, duty_id, query.from_user.id)
         
         if success:
             await query.edit_message_text(
@@ -350,8 +368,6 @@ async def complete_duty_callback(update: Update, context: ContextTypes.DEFAULT_T
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
 
 
 async def generate_schedule_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -359,7 +375,6 @@ async def generate_schedule_callback(update: Update, context: ContextTypes.DEFAU
     query = update.callback_query
     await query.answer()
     
-    db = next(get_db())
     try:
         # Get current month
         today = date.today()
@@ -367,7 +382,7 @@ async def generate_schedule_callback(update: Update, context: ContextTypes.DEFAU
         month = today.month
         
         # Generate schedule
-        schedules = DutyService.generate_schedule_for_month(db, year, month)
+        schedules = await run_db(DutyService.generate_schedule_for_month, year, month)
         
         if schedules:
             await query.edit_message_text(
@@ -383,5 +398,3 @@ async def generate_schedule_callback(update: Update, context: ContextTypes.DEFAU
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
@@ -4,18 +4,20 @@ Expense handlers
 from telegram import Update, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
 from handlers.base import BaseHandler
 from utils.keyboards import category_keyboard, back_keyboard, currency_selection_keyboard, expenses_menu_keyboard, split_choice_keyboard
 from utils.texts import get_category_name, get_currency_name, format_amount
 from services.expense_service import ExpenseService
-from models import ExpenseCategory, Currency, Profile, User
+from services.flexible_split import FlexibleSplitService
+from services.membership import MembershipIndex, membership_registry
+from models import ExpenseCategory, Currency, Profile
 from typing import Set
 from telegram.error import BadRequest
 import re
 
-def get_participant_selection_display(selected_participants: Set[int], db, amount: float, currency, category_name: str) -> str:
-    """Get display text for participant selection"""
+def get_participant_selection_display(membership: MembershipIndex, selected_participants: Set[int], amount: int, currency, category_name: str) -> str:
+    """Display text for participant selection"""
     text = f"💰 Сумма: {format_amount(amount, currency)}\n"
     text += f"📂 Категория: {category_name}\n\n"
     text += "👥 Выберите людей, которые участвовали в этом расходе. Долг будет рассчитан только с участников противоположной группы\n\n"
@@ -23,12 +25,10 @@ def get_participant_selection_display(selected_participants: Set[int], db, amoun
     if not selected_participants:
         text += "Никто не выбран"
     else:
-        participant_names = []
-        for telegram_id in selected_participants:
-            user = db.query(User).filter(User.telegram_id == telegram_id).first()
-            if user:
-                name = user.first_name or user.username or f"User {user.telegram_id}"
-                participant_names.append(f"✅ {name}")
+        participant_names = [
+            f"✅ {membership.name_of_telegram(telegram_id)}"
+            for telegram_id in selected_participants if telegram_id in membership.user_ids
+        ]
         
         text += "Выбранные участники:\n"
         text += "\n".join(participant_names)
@@ -49,6 +49,39 @@ def handle_db_error(e: Exception, action: str) -> tuple[str, InlineKeyboardMarku
     keyboard = back_keyboard("main_menu")
     return error_text, keyboard
 
+def create_user_expense(db: Session, telegram_user, amount: int, currency: Currency,
+                        category: ExpenseCategory, custom_category_name: str = None,
+                        split_type: str = None, selected_participants: Set[int] = None) -> dict:
+    """DB work unit: create expense paid by telegram user, return names for the reply"""
+    profile = ExpenseService.get_or_create_home_profile(db)
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    
+    # Allocations come from the compiled split rule inside create_expense
+    ExpenseService.create_expense(
+        db=db,
+        amount=amount,
+        currency=currency,
+        category=category,
+        payer_id=user.id,
+        profile_id=profile.id,
+        custom_category_name=custom_category_name,
+        split_type=split_type,
+        selected_participants=selected_participants
+    )
+    
+    participant_names = []
+    if split_type == "participants" and selected_participants:
+        membership = membership_registry.get(db)
+        participant_names = [
+            membership.name_of_telegram(telegram_id)
+            for telegram_id in selected_participants if telegram_id in membership.user_ids
+        ]
+    
+    return {
+        'payer_name': BaseHandler.get_user_name(user),
+        'participant_names': participant_names
+    }
+
 # User state storage moved to context.bot_data
 
 async def expenses_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -66,12 +99,9 @@ async def add_expense_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get or create user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
+        # Get or create user (off the event loop)
+        await run_db(BaseHandler.get_or_create_user, update.effective_user)
         
         # Set user state to ask for currency first
         user_id = update.effective_user.id
@@ -92,8 +122,6 @@ async def add_expense_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "добавлении расхода")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle category selection"""
@@ -137,43 +165,16 @@ async def category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text(text, reply_markup=keyboard)
     else:
         # Create expense directly without profile selection
-        # Get database session
-        db = next(get_db())
-        
         try:
-            # Get default profile (Home) or create one if doesn't exist
-            profile = db.query(Profile).filter(Profile.name == "Home").first()
-            if not profile:
-                # Create default profile if it doesn't exist
-                profile = Profile(name="Home", is_default=True)
-                db.add(profile)
-                db.commit()
-                db.refresh(profile)
-            
-            # Get user
-            user = BaseHandler.get_or_create_user(db, update.effective_user)
-            
             # Store values before clearing state
             amount = user_states[user_id]['amount']
             currency = user_states[user_id]['currency']
             custom_category_name = user_states[user_id].get('custom_category_name')
             
             # Create expense with special splitting logic
-            from services.special_split import calculate_special_split
-            
-            # Calculate allocations based on category
-            allocations = calculate_special_split(db, amount, category, profile.id)
-            
-            # Create expense
-            expense = ExpenseService.create_expense(
-                db=db,
-                amount=amount,
-                currency=currency,
-                category=category,
-                payer_id=user.id,
-                profile_id=profile.id,
-                allocations=allocations,
-                custom_category_name=custom_category_name
+            result = await run_db(
+                create_user_expense, update.effective_user, amount, currency, category,
+                custom_category_name
             )
             
             # Clear user state
@@ -187,7 +188,7 @@ async def category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 text += f"📂 Категория: {get_category_name(category)}\n"
             text += f"💱 Валюта: {get_currency_name(currency)}\n"
             text += f"💰 Сумма: {format_amount(amount, currency)}\n"
-            text += f"💳 Оплатил: {BaseHandler.get_user_name(user)}"
+            text += f"💳 Оплатил: {result['payer_name']}"
             
             from utils.keyboards import back_keyboard
             keyboard = back_keyboard("main_menu")
@@ -197,8 +198,6 @@ async def category_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             error_text, keyboard = handle_db_error(e, "создании расхода")
             await query.edit_message_text(error_text, reply_markup=keyboard)
-        finally:
-            db.close()
 
 
 
@@ -301,27 +300,10 @@ async def split_choice_callback(update: Update, context: ContextTypes.DEFAULT_TY
             return
         
         # Проверяем, что выбраны участники из РАЗНЫХ групп
-        from services.flexible_split import FlexibleSplitService
-        
-        # Проверяем, что есть участники из группы 1
-        group_1_selected = any(telegram_id in FlexibleSplitService.GROUP_1_IDS for telegram_id in selected_participants)
-        # Проверяем, что есть участники из группы 2  
-        group_2_selected = any(telegram_id in FlexibleSplitService.GROUP_2_IDS for telegram_id in selected_participants)
-        
-        # Проверяем, что НЕ выбраны участники только из одной группы
-        only_group_1 = group_1_selected and not group_2_selected
-        only_group_2 = group_2_selected and not group_1_selected
-        
-        if only_group_1 or only_group_2:
-            if only_group_1:
-                group_name = "Даша + Сеня"
-            else:
-                group_name = "Дима + Катя + Миша"
-            
-            await query.edit_message_text(
-                f"❌ Нельзя выбрать только участников из группы '{group_name}'. Выберите участников из РАЗНЫХ групп!",
-                reply_markup=back_keyboard("add_expense")
-            )
+        membership = await run_db(membership_registry.get)
+        error_text = FlexibleSplitService.single_group_error(membership, selected_participants)
+        if error_text:
+            await query.edit_message_text(error_text, reply_markup=back_keyboard("add_expense"))
             return
         
         await create_expense_with_split(update, context, "participants", selected_participants)
@@ -333,62 +315,46 @@ async def split_choice_callback(update: Update, context: ContextTypes.DEFAULT_TY
         return
     
     elif callback_data.startswith("participant_"):
-        # Toggle participant selection
-        participant_name = callback_data.replace("participant_", "")
+        # Toggle participant selection (callback data carries the telegram ID)
+        participant = callback_data.replace("participant_", "")
+        membership = await run_db(membership_registry.get)
+        telegram_id = int(participant) if participant.isdigit() else None
         
-        # Map participant names to user IDs
-        participant_map = {
-            "senya": 804085588,  # Арсентий
-            "dasha": 916228993,  # Даша
-            "dima": 350653235,   # Дима
-            "katya": 252901018,  # Катя
-            "misha": 6379711500  # Миша
-        }
-        
-        if participant_name in participant_map:
-            telegram_id = participant_map[participant_name]
-            db = next(get_db())
+        if membership.group_of_telegram(telegram_id):
+            # Convert list to set for manipulation
+            selected_participants = set(user_states[user_id].get('selected_participants', []))
+            
+            if telegram_id in selected_participants:
+                selected_participants.remove(telegram_id)
+                print(f"DEBUG: Removed {membership.name_of_telegram(telegram_id)} from selection")
+            else:
+                selected_participants.add(telegram_id)
+                print(f"DEBUG: Added {membership.name_of_telegram(telegram_id)} to selection")
+            
+            # Store back as list
+            user_states[user_id]['selected_participants'] = list(selected_participants)
+            print(f"DEBUG: Current selection: {selected_participants}")
+            
+            # Update display with current selection
+            amount = user_states[user_id]['amount']
+            currency = user_states[user_id]['currency']
+            category = user_states[user_id]['category']
+            base_name = get_category_name(category)
+            custom = user_states[user_id].get('custom_category_name')
+            category_name = f"{base_name}: {custom}" if custom else base_name
+            
+            text = get_participant_selection_display(membership, selected_participants, amount, currency, category_name)
+            keyboard = split_choice_keyboard(membership, selected_participants)
+            
             try:
-                user = db.query(User).filter(User.telegram_id == telegram_id).first()
-                if user:
-                    # Convert list to set for manipulation
-                    selected_participants = set(user_states[user_id].get('selected_participants', []))
-                    
-                    if telegram_id in selected_participants:
-                        selected_participants.remove(telegram_id)
-                        print(f"DEBUG: Removed {user.first_name} from selection")
-                    else:
-                        selected_participants.add(telegram_id)
-                        print(f"DEBUG: Added {user.first_name} to selection")
-                    
-                    # Store back as list
-                    user_states[user_id]['selected_participants'] = list(selected_participants)
-                    print(f"DEBUG: Current selection: {selected_participants}")
-                    
-                    # Update display with current selection
-                    amount = user_states[user_id]['amount']
-                    currency = user_states[user_id]['currency']
-                    category = user_states[user_id]['category']
-                    base_name = get_category_name(category)
-                    custom = user_states[user_id].get('custom_category_name')
-                    category_name = f"{base_name}: {custom}" if custom else base_name
-                    
-                    text = get_participant_selection_display(selected_participants, db, amount, currency, category_name)
-                    keyboard = split_choice_keyboard(selected_participants)
-                    
-                    try:
-                        await query.edit_message_text(text, reply_markup=keyboard)
-                    except BadRequest as e:
-                        if "Message is not modified" in str(e):
-                            await query.answer("Без изменений", show_alert=False)
-                        else:
-                            raise
+                await query.edit_message_text(text, reply_markup=keyboard)
+            except BadRequest as e:
+                if "Message is not modified" in str(e):
+                    await query.answer("Без изменений", show_alert=False)
                 else:
-                    print(f"DEBUG: User not found for telegram_id {telegram_id}")
-            finally:
-                db.close()
+                    raise
         else:
-            print(f"DEBUG: Unknown participant name: {participant_name}")
+            print(f"DEBUG: Unknown participant: {participant}")
         return
     
     else:
@@ -401,21 +367,7 @@ async def create_expense_with_split(update: Update, context: ContextTypes.DEFAUL
     user_id = update.effective_user.id
     user_states = context.bot_data.get('user_states', {})
     
-    db = next(get_db())
-    
     try:
-        # Get default profile (Home)
-        profile = db.query(Profile).filter(Profile.name == "Home").first()
-        if not profile:
-            # Create default profile if it doesn't exist
-            profile = Profile(name="Home", is_default=True)
-            db.add(profile)
-            db.commit()
-            db.refresh(profile)
-        
-        # Get user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        
         # Get values from state
         amount = user_states[user_id]['amount']
         currency = user_states[user_id]['currency']
@@ -423,32 +375,9 @@ async def create_expense_with_split(update: Update, context: ContextTypes.DEFAUL
         custom_category_name = user_states[user_id]['custom_category_name']
         
         # Create expense with flexible splitting logic
-        from services.flexible_split import FlexibleSplitService
-        
-        if split_type == "split_families":
-            # Calculate family split allocations
-            allocations = FlexibleSplitService.calculate_family_split(
-                db, amount, user.telegram_id
-            )
-        elif split_type == "participants" and selected_participants:
-            # Calculate participant split allocations
-            allocations = FlexibleSplitService.calculate_participant_split(
-                db, amount, selected_participants, user.telegram_id
-            )
-        else:
-            allocations = {}
-        
-        # Create expense
-        expense = ExpenseService.create_expense(
-            db=db,
-            amount=amount,
-            currency=currency,
-            category=category,
-            payer_id=user.id,
-            profile_id=profile.id,
-            custom_category_name=custom_category_name,
-            split_type=split_type,
-            selected_participants=selected_participants
+        result = await run_db(
+            create_user_expense, update.effective_user, amount, currency, category,
+            custom_category_name, split_type, selected_participants
         )
         
         # Clear user state
@@ -461,13 +390,7 @@ async def create_expense_with_split(update: Update, context: ContextTypes.DEFAUL
         if split_type == "split_families":
             split_description = "За другую семью"
         elif split_type == "participants" and selected_participants:
-            participant_names = []
-            for participant_telegram_id in selected_participants:
-                participant_user = db.query(User).filter(User.telegram_id == participant_telegram_id).first()
-                if participant_user:
-                    name = participant_user.first_name or participant_user.username or f"User {participant_user.telegram_id}"
-                    participant_names.append(name)
-            split_description = f"Участники: {', '.join(participant_names)}"
+            split_description = f"Участники: {', '.join(result['participant_names'])}"
         else:
             split_description = "Стандартное разделение"
         
@@ -483,7 +406,3 @@ async def create_expense_with_split(update: Update, context: ContextTypes.DEFAUL
         
     except Exception as e:
         await update.callback_query.edit_message_text(f"❌ Ошибка при создании расхода: {str(e)}")
-    finally:
-        db.close()
-
-
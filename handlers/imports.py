@@ -0,0 +1,106 @@
+"""
+Expense import handler (/import with a CSV or JSONL file)
+"""
+import os
+import time
+import tempfile
+from telegram import Message, Update
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+from services.expense_import import ExpenseImporter, ImportProgress, detect_format
+from utils.access_control import require_access
+from utils.db_executor import run_db_detached
+
+IMPORT_PROGRESS_EVERY = int(os.getenv('IMPORT_PROGRESS_EVERY', '1000'))  # rows between status updates
+IMPORT_PROGRESS_MIN_INTERVAL = 2.0  # seconds between status edits (Telegram flood limits)
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024  # Bot API download limit
+
+IMPORT_USAGE = (
+    "📥 Импорт расходов из файла\n\n"
+    "Отправьте CSV или JSONL файл с подписью /import "
+    "(или ответьте /import на сообщение с файлом).\n\n"
+    "Колонки: date, amount, currency, category, description, payer, split, note\n"
+    "Обязательные: amount, payer (и description для категории 'другое')\n\n"
+    "Пример CSV:\n"
+    "date;amount;currency;category;description;payer;split\n"
+    "2025-09-14;412,50;SEK;продукты;;дима;\n"
+    "2025-09-15;35;EUR;другое;такси;катя;семьи\n"
+    "2025-09-16;120;SEK;другое;ужин;сеня;сеня,дима,катя"
+)
+
+def format_import_result(progress: ImportProgress) -> str:
+    """Final import report"""
+    text = (
+        f"✅ Импорт завершен\n\n"
+        f"Строк: {progress.rows}\n"
+        f"Добавлено расходов: {progress.imported}\n"
+        f"Пропущено строк: {progress.error_count}"
+    )
+    if progress.errors:
+        text += "\n\n⚠️ Ошибки:\n" + "\n".join(f"• строка {line}: {message}" for line, message in progress.errors)
+        if progress.error_count > len(progress.errors):
+            text += f"\n… и еще {progress.error_count - len(progress.errors)}"
+    return text
+
+async def edit_status(status: Message, text: str) -> None:
+    """Best-effort status message update"""
+    try:
+        await status.edit_text(text)
+    except TelegramError:
+        pass
+
+@require_access
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /import: file caption or reply to a message with a file"""
+    message = update.message
+    document = message.document
+    if document is None and message.reply_to_message:
+        document = message.reply_to_message.document
+    if document is None:
+        await message.reply_text(IMPORT_USAGE)
+        return
+
+    file_format = detect_format(document.file_name)
+    if file_format is None:
+        await message.reply_text("❌ Поддерживаются только файлы .csv и .jsonl")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.reply_text("❌ Файл больше 20 МБ, разделите его на части")
+        return
+
+    status = await message.reply_text(f"⏳ Импорт {document.file_name}: загружаю файл...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "import")
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+
+        # One committed chunk per work unit, outside the update transaction: no DB locks are
+        # held across status edits. On failure the batch is undone by its import_id.
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            importer = ExpenseImporter(stream, file_format)
+            progress = importer.progress
+            reported_rows, reported_at = 0, time.monotonic()
+            try:
+                await run_db_detached(importer.begin, document.file_name, update.effective_user.id)
+                while await run_db_detached(importer.import_next_chunk):
+                    if (progress.rows - reported_rows >= IMPORT_PROGRESS_EVERY
+                            and time.monotonic() - reported_at >= IMPORT_PROGRESS_MIN_INTERVAL):
+                        reported_rows, reported_at = progress.rows, time.monotonic()
+                        await edit_status(
+                            status,
+                            f"⏳ Импорт {document.file_name}: обработано строк {progress.rows}, "
+                            f"добавлено {progress.imported}"
+                        )
+                await run_db_detached(importer.finish)
+            except Exception as e:
+                if importer.import_id is not None:
+                    await run_db_detached(ExpenseImporter.undo, importer.import_id)
+                await edit_status(
+                    status,
+                    f"❌ Ошибка импорта после строки {progress.rows}: {str(e)}\n\n"
+                    "Ничего не сохранено"
+                )
+                return
+
+    await edit_status(status, format_import_result(progress))
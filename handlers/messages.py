@@ -4,7 +4,7 @@ Universal message handler for text input
 from telegram import Update
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
 from handlers.base import BaseHandler
 from utils.keyboards import back_keyboard, category_keyboard
 from utils.access_control import AccessControl
@@ -27,22 +27,19 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
     user_states = context.bot_data.get('user_states', {})
     user_state = user_states.get(user_id, {})
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get or create user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
+        user = await run_db(BaseHandler.get_or_create_user, update.effective_user)
         
         if user_state.get('action') == 'add_shopping_item':
-            await handle_shopping_item_input(update, context, db, user, text, user_state)
+            await handle_shopping_item_input(update, context, user, text, user_state)
         elif user_state.get('action') == 'add_todo_item':
             await handle_todo_input(update, context)
         elif user_state.get('action') == 'add_expense':
             if user_state.get('step') == 'custom_category':
-                await handle_custom_category_input(update, context, db, user, text, user_state)
+                await handle_custom_category_input(update, context, user, text, user_state)
             else:
-                await handle_expense_amount_input(update, context, db, user, text, user_state)
+                await handle_expense_amount_input(update, context, user, text, user_state)
         else:
             # Unknown state, send back to main menu
             await update.message.reply_text(
@@ -51,10 +48,8 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
 
-async def handle_shopping_item_input(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Session, user, text: str, user_state: dict):
+async def handle_shopping_item_input(update: Update, context: ContextTypes.DEFAULT_TYPE, user, text: str, user_state: dict):
     """Handle shopping item input"""
     user_id = update.effective_user.id
     
@@ -69,32 +64,25 @@ async def handle_shopping_item_input(update: Update, context: ContextTypes.DEFAU
             return
         
         # Add items directly without asking for category (shopping items don't need categories)
-        added_items = []
-        for title in items:
-            item = ShoppingService.add_item(
-                db=db,
-                title=title,
-                category=ExpenseCategory.FOOD,  # Default category for shopping items
-                created_by=user.id
-            )
-            added_items.append(item)
+        # Default category for shopping items is FOOD
+        added_titles = await run_db(ShoppingService.add_items, items, ExpenseCategory.FOOD, user.id)
         
         # Clear user state
         del context.bot_data['user_states'][user_id]
         
         # Show success message
-        success_text = f"✅ Добавлено {len(added_items)} товаров в список покупок!\n\n"
+        success_text = f"✅ Добавлено {len(added_titles)} товаров в список покупок!\n\n"
         success_text += f"👤 Добавил: {BaseHandler.get_user_name(user)}\n\n"
         success_text += "📝 Товары:\n"
-        for item in added_items:
-            success_text += f"• {item.title}\n"
+        for title in added_titles:
+            success_text += f"• {title}\n"
         
         from utils.keyboards import back_keyboard
         keyboard = back_keyboard("shopping_list")
         
         await update.message.reply_text(success_text, reply_markup=keyboard)
 
-async def handle_custom_category_input(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Session, user, text: str, user_state: dict):
+async def handle_custom_category_input(update: Update, context: ContextTypes.DEFAULT_TYPE, user, text: str, user_state: dict):
     """Handle custom category name input for OTHER category"""
     user_id = update.effective_user.id
     
@@ -113,13 +101,15 @@ async def handle_custom_category_input(update: Update, context: ContextTypes.DEF
     user_state['selected_participants'] = []
     
     from handlers.expense import get_participant_selection_display
-    text = get_participant_selection_display(set(), db, user_state['amount'], user_state['currency'], user_state['custom_category_name'])
+    from services.membership import membership_registry
+    membership = await run_db(membership_registry.get)
+    text = get_participant_selection_display(membership, set(), user_state['amount'], user_state['currency'], user_state['custom_category_name'])
     
-    keyboard = split_choice_keyboard(set())
+    keyboard = split_choice_keyboard(membership, set())
     
     await update.message.reply_text(text, reply_markup=keyboard)
 
-async def handle_expense_amount_input(update: Update, context: ContextTypes.DEFAULT_TYPE, db: Session, user, text: str, user_state: dict):
+async def handle_expense_amount_input(update: Update, context: ContextTypes.DEFAULT_TYPE, user, text: str, user_state: dict):
     """Handle expense amount input (existing functionality)"""
     from handlers.expense import handle_amount_input
     await handle_amount_input(update, context)
@@ -0,0 +1,114 @@
+"""
+Lazy handler registry
+
+Maps command names and callback_data values/prefixes to "module:function" paths. Handler modules
+(and the services, models and DB engine they pull in) are imported on first use,
+so importing bot.py stays cheap.
+"""
+import importlib
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from handlers.router import CallbackRouter
+
+# Command name -> handler path
+COMMANDS: List[Tuple[str, str]] = [
+    ("start", "handlers.start:start_command"),
+    ("shopping", "handlers.start:shopping_command"),
+    ("todo", "handlers.start:todo_command"),
+    ("expenses", "handlers.start:expenses_command"),
+    ("report", "handlers.start:report_command"),
+    ("balances", "handlers.start:balances_command"),
+    ("help", "handlers.start:help_command"),
+    ("update_commands", "handlers.start:update_commands_command"),
+    ("db_info", "handlers.start:db_info_command"),
+    ("group_balances", "handlers.start:group_balances_command"),
+    ("set_rate", "handlers.commands:set_rate_command"),
+    ("fix_rate", "handlers.commands:fix_rate_command"),
+    ("addexpence", "handlers.commands:addexpence_command"),
+    ("addexpence_advanced", "handlers.commands:addexpence_advanced_command"),
+    ("settle_up", "handlers.commands:settle_up_command"),
+    ("import", "handlers.imports:import_command"),
+    ("trends", "handlers.reports:trends_command"),
+]
+
+# Exact callback_data -> handler path
+CALLBACKS: List[Tuple[str, str]] = [
+    ("main_menu", "handlers.start:main_menu_callback"),
+    ("expenses_menu", "handlers.expense:expenses_menu_callback"),
+    ("add_expense", "handlers.expense:add_expense_callback"),
+    ("confirm_participants", "handlers.expense:split_choice_callback"),
+    ("no_split", "handlers.expense:split_choice_callback"),
+
+    # Shopping
+    ("shopping_list", "handlers.shopping:shopping_list_callback"),
+    ("add_shopping_item", "handlers.shopping:add_shopping_item_callback"),
+    ("list_shopping_items", "handlers.shopping:list_shopping_items_callback"),
+    ("remove_shopping_item", "handlers.shopping:remove_shopping_item_callback"),
+
+    # Todo
+    ("todo_list", "handlers.todo:todo_list_callback"),
+    ("add_todo_item", "handlers.todo:add_todo_item_callback"),
+    ("list_todo_items", "handlers.todo:list_todo_items_callback"),
+    ("remove_todo_item", "handlers.todo:remove_todo_item_callback"),
+
+    # Reports
+    ("report", "handlers.reports:report_callback"),
+    ("delete_expenses", "handlers.reports:delete_expenses_callback"),
+
+    # Duty schedule
+    ("duty_schedule", "handlers.duty:duty_schedule_callback"),
+    ("my_duties", "handlers.duty:my_duties_callback"),
+    ("monthly_schedule", "handlers.duty:monthly_schedule_callback"),
+    ("current_week_schedule", "handlers.duty:current_week_schedule_callback"),
+    ("mark_completed", "handlers.duty:mark_completed_callback"),
+    ("generate_schedule", "handlers.duty:generate_schedule_callback"),
+]
+
+# callback_data prefix -> handler path and argument type (exact values take precedence)
+CALLBACK_PREFIXES: List[Tuple[str, str, Callable[[str], Any]]] = [
+    ("currency_", "handlers.expense:currency_callback", str),
+    ("participant_", "handlers.expense:split_choice_callback", str),
+    ("category_", "handlers.messages:handle_shopping_category_callback", str),
+    ("toggle_shopping_", "handlers.shopping:toggle_item_callback", int),
+    ("remove_shopping_", "handlers.shopping:remove_item_callback", int),
+    ("toggle_todo_", "handlers.todo:toggle_todo_item_callback", int),
+    ("remove_todo_", "handlers.todo:remove_todo_item_specific_callback", int),
+    ("delete_expense_", "handlers.reports:delete_expense_confirmation_callback", int),
+    ("complete_duty_", "handlers.duty:complete_duty_callback", int),
+]
+
+# Free text input (non-command messages)
+TEXT_MESSAGE_HANDLER = "handlers.messages:handle_text_message"
+
+# Uploaded file with an /import caption (commands don't match captions)
+IMPORT_DOCUMENT_HANDLER = "handlers.imports:import_command"
+
+_resolved: Dict[str, Callable[..., Awaitable]] = {}
+
+def resolve(path: str) -> Callable[..., Awaitable]:
+    """Import handler module and return the handler function for "module:function" """
+    func = _resolved.get(path)
+    if func is None:
+        module_name, _, attr = path.partition(":")
+        func = getattr(importlib.import_module(module_name), attr)
+        _resolved[path] = func
+    return func
+
+def lazy_handler(path: str) -> Callable[..., Awaitable]:
+    """Handler callback that imports its module on the first call"""
+    module_name, _, attr = path.partition(":")
+
+    async def callback(update, context):
+        return await resolve(path)(update, context)
+
+    callback.__name__ = callback.__qualname__ = attr
+    callback.__module__ = module_name
+    return callback
+
+def build_callback_router() -> CallbackRouter:
+    """Router with every registered callback (handlers stay lazy)"""
+    router = CallbackRouter()
+    for data, path in CALLBACKS:
+        router.add_exact(data, lazy_handler(path))
+    for prefix, path, arg_type in CALLBACK_PREFIXES:
+        router.add_prefix(prefix, lazy_handler(path), arg_type)
+    return router
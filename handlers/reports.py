@@ -4,81 +4,169 @@ Reports and balances handlers
 from telegram import Update
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
+from utils.access_control import require_access
 from handlers.base import BaseHandler
 from utils.keyboards import back_keyboard, confirmation_keyboard
-from utils.texts import format_expense_report, format_balance_report
+from utils.texts import format_amount, format_expense_report, format_balance_report, format_trends_report
 from services.expense_service import ExpenseService
 from services.split import SplitService
-from models import User, Expense
-from datetime import datetime
+from models import User, Expense, Currency
+from datetime import datetime, date
+
+def build_report_text(db: Session) -> str:
+    """DB work unit: current month expenses by category and group balances"""
+    from services.group_balance import GroupBalanceService
+    
+    text = ""
+    
+    # 1. Expenses by category for current month
+    expenses_by_category = ExpenseService.get_expenses_by_category(db)
+    current_month = datetime.now()
+    
+    if not expenses_by_category:
+        text += "📊 Нет расходов в этом месяце\n\n"
+    else:
+        text += format_expense_report(expenses_by_category, current_month)
+    
+    # 2. Group balances
+    text += "\n👥 Отчет по балансам групп:\n"
+    
+    group_balance_text = GroupBalanceService.get_detailed_balance_report(db)
+    
+    # Extract only the group balances part (remove the header)
+    lines = group_balance_text.split('\n')
+    balance_lines = []
+    in_balance_section = False
+    
+    for line in lines:
+        if "📊 Отчет по балансам групп" in line:
+            in_balance_section = True
+            continue
+        if in_balance_section:
+            balance_lines.append(line)
+    
+    if balance_lines:
+        text += '\n'.join(balance_lines)
+    else:
+        text += "Ошибка при загрузке балансов групп\n"
+    return text
 
 async def report_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle report button - combined expenses and balances report"""
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        text = ""
-        
-        # 1. Expenses by category for current month
-        expenses_by_category = ExpenseService.get_expenses_by_category(db)
-        current_month = datetime.now()
-        
-        if not expenses_by_category:
-            text += "📊 Нет расходов в этом месяце\n\n"
-        else:
-            text += format_expense_report(expenses_by_category, current_month)
-        
-        # 2. Group balances
-        text += "\n👥 Отчет по балансам групп:\n"
-        
-        from services.group_balance import GroupBalanceService
-        group_balance_text = GroupBalanceService.get_detailed_balance_report(db)
-        
-        # Extract only the group balances part (remove the header)
-        lines = group_balance_text.split('\n')
-        balance_lines = []
-        in_balance_section = False
-        
-        for line in lines:
-            if "📊 Отчет по балансам групп" in line:
-                in_balance_section = True
-                continue
-            if in_balance_section:
-                balance_lines.append(line)
-        
-        if balance_lines:
-            text += '\n'.join(balance_lines)
-        else:
-            text += "Ошибка при загрузке балансов групп\n"
-        
+        text = await run_db(build_report_text)
         keyboard = back_keyboard("main_menu")
         
         await query.edit_message_text(text, reply_markup=keyboard)
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
 
 
 
+def build_month_balance_report(db: Session, month: date) -> str:
+    """DB work unit: user balances of a month (closed months come from snapshots)"""
+    from services.month_close import MonthCloseService
+    
+    balances = MonthCloseService.get_user_balances(db, month)
+    if not balances:
+        return f"📊 Нет расходов за {month.strftime('%m.%Y')}"
+    
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(list(balances))).all()}
+    settlements = SplitService.calculate_settlement_plan(db, balances)
+    return f"📅 Месяц {month.strftime('%m.%Y')}\n\n" + format_balance_report(balances, users, settlements)
+
+def build_period_balance_report(db: Session, start: date, end: date) -> str:
+    """DB work unit: monthly totals, balances and settlement plan of months [start, end]"""
+    from services.analytics import LedgerAnalytics
+    
+    period = f"{start.strftime('%m.%Y')} – {end.strftime('%m.%Y')}"
+    # One pass over the range; every report below is a reduction of its arrays
+    analytics = LedgerAnalytics.load(db, start, date(end.year + end.month // 12, end.month % 12 + 1, 1))
+    balances = analytics.user_balances()
+    if not balances:
+        return f"📊 Нет расходов за {period}"
+    
+    text = f"📅 Период {period}\n\n💰 Траты по месяцам:\n"
+    for month, categories in analytics.monthly_category_report().items():
+        total = sum(category['total_sek'] for category in categories.values())
+        text += f"  {month.strftime('%m.%Y')}: {format_amount(total, Currency.SEK)}\n"
+    
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(list(balances))).all()}
+    return text + "\n" + format_balance_report(balances, users, analytics.settlement_plan())
+
+TRENDS_DEFAULT_MONTHS = 6
+TRENDS_MAX_MONTHS = 24
+
+def build_trends_report(db: Session, months: int) -> str:
+    """DB work unit: category trends of the last months (reads only the category rollup)"""
+    from services.expense_rollup import ExpenseRollupService
+    
+    current_month = datetime.now().replace(day=1).date()
+    return format_trends_report(ExpenseRollupService.get_trends(db, current_month, months))
+
+@require_access
+async def trends_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /trends command (/trends 12 - last 12 months)"""
+    months = TRENDS_DEFAULT_MONTHS
+    if context.args:
+        try:
+            months = int(context.args[0])
+        except ValueError:
+            months = 0
+        if not 1 <= months <= TRENDS_MAX_MONTHS:
+            await update.message.reply_text(
+                f"❌ Укажите число месяцев от 1 до {TRENDS_MAX_MONTHS}.\n\nИспользуйте: /trends 6"
+            )
+            return
+    
+    try:
+        text = await run_db(build_trends_report, months)
+        await update.message.reply_text(text)
+    except Exception as e:
+        await update.message.reply_text(f"❌ Ошибка при получении динамики: {str(e)}")
+
+def load_month_expenses_for_deletion(db: Session) -> list:
+    """DB work unit: current month expenses with display fields for the delete menu"""
+    from utils.texts import format_amount, get_category_name
+    
+    current_month = datetime.now().replace(day=1).date()
+    expenses = db.query(Expense).filter(Expense.month == current_month).all()
+    
+    rows = []
+    for expense in expenses:
+        # Get payer name
+        payer = db.query(User).filter(User.id == expense.payer_id).first()
+        payer_name = payer.first_name or payer.username or f"User {expense.payer_id}" if payer else "Unknown"
+        
+        # Format category
+        category_name = get_category_name(expense.category)
+        if expense.custom_category_name:
+            category_name = expense.custom_category_name
+        
+        rows.append({
+            'id': expense.id,
+            'amount': expense.amount,
+            'currency': expense.currency,
+            'amount_text': format_amount(expense.amount, expense.currency),
+            'category_name': category_name,
+            'payer_name': payer_name
+        })
+    
+    return rows
+
 async def delete_expenses_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle delete expenses button"""
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get current month expenses
-        current_month = datetime.now().replace(day=1).date()
-        expenses = db.query(Expense).filter(Expense.month == current_month).all()
+        expenses = await run_db(load_month_expenses_for_deletion)
         
         if not expenses:
             text = "🗑 Удаление расходов\n\nНет расходов в текущем месяце для удаления"
@@ -86,29 +174,15 @@ async def delete_expenses_callback(update: Update, context: ContextTypes.DEFAULT
         else:
             text = "🗑 Выберите расход для удаления:\n\n"
             for i, expense in enumerate(expenses, 1):
-                # Get payer name
-                payer = db.query(User).filter(User.id == expense.payer_id).first()
-                payer_name = payer.first_name or payer.username or f"User {expense.payer_id}" if payer else "Unknown"
-                
-                # Format amount
-                from utils.texts import format_amount, get_currency_name
-                amount_text = f"{format_amount(expense.amount, expense.currency)}"
-                
-                # Format category
-                from utils.texts import get_category_name
-                category_name = get_category_name(expense.category)
-                if expense.custom_category_name:
-                    category_name = expense.custom_category_name
-                
-                text += f"{i}. {category_name} - {amount_text} ({payer_name})\n"
+                text += f"{i}. {expense['category_name']} - {expense['amount_text']} ({expense['payer_name']})\n"
             
             # Create keyboard with expense selection
             from telegram import InlineKeyboardButton, InlineKeyboardMarkup
             keyboard = []
             for i, expense in enumerate(expenses, 1):
                 keyboard.append([InlineKeyboardButton(
-                    f"{i}. {expense.amount} {expense.currency.value}", 
-                    callback_data=f"delete_expense_{expense.id}"
+                    f"{i}. {expense['amount_text']}", 
+                    callback_data=f"delete_expense_{expense['id']}"
                 )])
             
             keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="main_menu")])
@@ -120,8 +194,6 @@ async def delete_expenses_callback(update: Update, context: ContextTypes.DEFAULT
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка: {str(e)}")
-    finally:
-        db.close()
 
 async def delete_expense_confirmation_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle delete specific expense - delete immediately without confirmation"""
@@ -139,12 +211,9 @@ async def delete_expense_confirmation_callback(update: Update, context: ContextT
         await query.edit_message_text("❌ Неверный ID расхода")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Delete expense immediately
-        success = ExpenseService.delete_expense(db, expense_id)
+        success = await run_db(ExpenseService.delete_expense, expense_id)
         
         if not success:
             await query.edit_message_text("❌ Ошибка при удалении расхода")
@@ -155,8 +224,6 @@ async def delete_expense_confirmation_callback(update: Update, context: ContextT
         
     except Exception as e:
         await query.edit_message_text(f"❌ Ошибка при удалении: {str(e)}")
-    finally:
-        db.close()
 
 # Эти функции больше не нужны - удаляем
 
@@ -0,0 +1,84 @@
+"""
+Callback query router
+
+One CallbackQueryHandler for all inline buttons instead of a regex handler per button.
+callback_data is parsed once: exact values are a dict lookup, prefixed values
+("toggle_shopping_12") are looked up by their "_"-terminated prefixes, longest first,
+and the rest is converted to a typed argument. Unknown data costs a few dict misses.
+"""
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+from telegram import Update
+from telegram.ext import CallbackQueryHandler
+
+HandlerCallback = Callable[..., Awaitable]
+
+PREFIX_SEPARATOR = "_"
+
+class RouteMatch(NamedTuple):
+    """Handler for a callback_data value and its parsed arguments"""
+    callback: HandlerCallback
+    args: Tuple[Any, ...]
+
+class CallbackRouter:
+    """Maps callback_data to handlers by exact value or by longest registered prefix"""
+
+    def __init__(self):
+        self._exact: Dict[str, RouteMatch] = {}
+        self._prefixes: Dict[str, Tuple[HandlerCallback, Callable[[str], Any]]] = {}
+
+    def add_exact(self, data: str, callback: HandlerCallback) -> None:
+        """Route callback_data equal to data"""
+        self._exact[data] = RouteMatch(callback, ())
+
+    def add_prefix(self, prefix: str, callback: HandlerCallback, arg_type: Callable[[str], Any] = str) -> None:
+        """Route callback_data starting with prefix (must end with "_"), the rest is passed as arg_type(rest)"""
+        if not prefix.endswith(PREFIX_SEPARATOR):
+            raise ValueError(f"Callback prefix must end with '{PREFIX_SEPARATOR}': {prefix}")
+        self._prefixes[prefix] = (callback, arg_type)
+
+    def match(self, data: str) -> Optional[RouteMatch]:
+        """Find handler for callback_data (None if no route or the argument doesn't parse)"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route
+
+        # Longest prefix wins: try every "_" position from the right
+        end = data.rfind(PREFIX_SEPARATOR)
+        while end > 0:
+            route = self._prefixes.get(data[:end + 1])
+            if route is not None:
+                rest = data[end + 1:]
+                if not rest:
+                    return None
+                callback, arg_type = route
+                try:
+                    return RouteMatch(callback, (arg_type(rest),))
+                except ValueError:
+                    return None
+            end = data.rfind(PREFIX_SEPARATOR, 0, end)
+        return None
+
+    async def dispatch(self, update: Update, context) -> Any:
+        """Run the handler matched by CallbackRouterHandler.check_update"""
+        return await context.callback_route(update, context)
+
+class CallbackRouterHandler(CallbackQueryHandler):
+    """CallbackQueryHandler that routes through a CallbackRouter (typed args in context.args)"""
+
+    __slots__ = ("router",)
+
+    def __init__(self, router: CallbackRouter, block: bool = True):
+        super().__init__(router.dispatch, block=block)
+        self.router = router
+
+    def check_update(self, update: object) -> Optional[RouteMatch]:
+        if not isinstance(update, Update) or not update.callback_query:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        return self.router.match(data)
+
+    def collect_additional_context(self, context, update, application, check_result: RouteMatch) -> None:
+        context.callback_route = check_result.callback
+        context.args = list(check_result.args)
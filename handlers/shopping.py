@@ -4,7 +4,7 @@ Shopping list handlers
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
 from handlers.base import BaseHandler
 from utils.keyboards import shopping_actions_keyboard, back_keyboard
 from utils.texts import format_shopping_list, get_category_name
@@ -59,12 +59,9 @@ async def list_shopping_items_callback(update: Update, context: ContextTypes.DEF
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get shopping items - get ALL items (both checked and unchecked)
-        items = ShoppingService.get_items(db, checked_only=None, limit=20)
+        items = await run_db(ShoppingService.get_items, checked_only=None, limit=20)
         
         if not items:
             text = "🛒 Список покупок пуст"
@@ -78,8 +75,6 @@ async def list_shopping_items_callback(update: Update, context: ContextTypes.DEF
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "загрузке списка покупок")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 
 
@@ -88,12 +83,9 @@ async def remove_shopping_item_callback(update: Update, context: ContextTypes.DE
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get shopping items - get ALL items (both checked and unchecked)
-        items = ShoppingService.get_items(db, checked_only=None, limit=20)
+        items = await run_db(ShoppingService.get_items, checked_only=None, limit=20)
         
         if not items:
             text = "🛒 Список покупок пуст"
@@ -110,8 +102,14 @@ async def remove_shopping_item_callback(update: Update, context: ContextTypes.DE
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "загрузке списка покупок")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
+
+def toggle_item_and_list(db: Session, item_id: int, telegram_user) -> tuple:
+    """DB work unit: toggle an item, then get ALL items (both checked and unchecked)"""
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    item = ShoppingService.toggle_item(db, item_id, user.id)
+    if not item:
+        return None, []
+    return item, ShoppingService.get_items(db, checked_only=None, limit=20)
 
 async def toggle_item_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle toggle item (check/uncheck)"""
@@ -129,38 +127,13 @@ async def toggle_item_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.edit_message_text("❌ Неверный ID товара")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get item
-        item = ShoppingService.get_item_by_id(db, item_id)
+        # Toggle checked status and reload the list in one work unit, off the event loop
+        item, items = await run_db(toggle_item_and_list, item_id, update.effective_user)
         if not item:
             await query.edit_message_text("❌ Товар не найден")
             return
         
-        # Toggle checked status
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        
-        if item.is_checked:
-            # Uncheck item
-            item.is_checked = False
-            item.checked_at = None
-            item.checked_by = None
-            status_text = "⭕ Отмечено как не купленное"
-        else:
-            # Check item
-            item.is_checked = True
-            from datetime import datetime
-            item.checked_at = datetime.utcnow()
-            item.checked_by = user.id
-            status_text = "✅ Отмечено как купленное"
-        
-        db.commit()
-        
-        # Show updated list - get ALL items (both checked and unchecked)
-        items = ShoppingService.get_items(db, checked_only=None, limit=20)
-        
         if not items:
             text = "🛒 Список покупок пуст"
             keyboard = back_keyboard("shopping_list")
@@ -173,8 +146,6 @@ async def toggle_item_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "обновлении списка покупок")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def remove_item_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle remove specific item"""
@@ -192,19 +163,16 @@ async def remove_item_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.edit_message_text("❌ Неверный ID товара")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Remove item
-        success = ShoppingService.remove_item(db, item_id)
+        success = await run_db(ShoppingService.remove_item, item_id)
         
         if not success:
             await query.edit_message_text("❌ Товар не найден")
             return
         
         # Show updated list - get ALL items (both checked and unchecked)
-        items = ShoppingService.get_items(db, checked_only=None, limit=20)
+        items = await run_db(ShoppingService.get_items, checked_only=None, limit=20)
         
         if not items:
             text = "🛒 Список покупок пуст"
@@ -221,8 +189,6 @@ async def remove_item_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "удалении товара")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 def create_shopping_items_keyboard(items):
     """Create keyboard with toggle buttons for shopping items"""
@@ -4,12 +4,13 @@ Start command handler
 from telegram import Update
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
 from handlers.base import BaseHandler
 from utils.keyboards import main_menu_keyboard
 from utils.texts import get_welcome_message
 from utils.access_control import AccessControl, require_access, require_access_for_callback
 from models import User, Profile, ProfileMember
+from datetime import datetime
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
@@ -19,13 +20,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await AccessControl.deny_access_message(update, context)
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get or create user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        user_name = BaseHandler.get_user_name(user)
+        user_name = await run_db(BaseHandler.get_or_create_user_name, update.effective_user)
         
         # Send welcome message with main menu
         welcome_text = get_welcome_message(user_name)
@@ -40,8 +37,6 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             f"❌ Произошла ошибка: {str(e)}"
         )
-    finally:
-        db.close()
 
 @require_access_for_callback
 async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -49,13 +44,9 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
         # Get or create user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        user_name = BaseHandler.get_user_name(user)
+        user_name = await run_db(BaseHandler.get_or_create_user_name, update.effective_user)
         
         # Send main menu
         welcome_text = get_welcome_message(user_name)
@@ -70,8 +61,6 @@ async def main_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.edit_message_text(
             f"❌ Произошла ошибка: {str(e)}"
         )
-    finally:
-        db.close()
 
 @require_access
 async def shopping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -105,8 +94,29 @@ async def expenses_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @require_access
 async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle /report command"""
-    from handlers.reports import report_callback
+    """Handle /report command (/report 2025-09 - balances of a month, /report 2025-01 2025-06 - of a period)"""
+    from handlers.reports import report_callback, build_month_balance_report, build_period_balance_report
+    
+    if context.args:
+        try:
+            months = [datetime.strptime(arg, "%Y-%m").date() for arg in context.args[:2]]
+        except ValueError:
+            await update.message.reply_text(
+                "❌ Неверный формат месяца.\n\nИспользуйте: /report 2025-09 или /report 2025-01 2025-06"
+            )
+            return
+        if len(months) == 2 and months[0] > months[1]:
+            await update.message.reply_text("❌ Начало периода позже его конца")
+            return
+        try:
+            if len(months) == 2:
+                text = await run_db(build_period_balance_report, *months)
+            else:
+                text = await run_db(build_month_balance_report, months[0])
+            await update.message.reply_text(text)
+        except Exception as e:
+            await update.message.reply_text(f"❌ Ошибка при получении отчета: {str(e)}")
+        return
     
     # Create a mock callback query for compatibility
     class MockCallbackQuery:
@@ -133,14 +143,11 @@ async def balances_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /balances command - show group balances"""
     from services.group_balance import GroupBalanceService
     
-    db = next(get_db())
     try:
-        report = GroupBalanceService.get_detailed_balance_report(db)
+        report = await run_db(GroupBalanceService.get_detailed_balance_report)
         await update.message.reply_text(report)
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при получении балансов групп: {str(e)}")
-    finally:
-        db.close()
 
 @require_access
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -187,59 +194,70 @@ async def group_balances_command(update: Update, context: ContextTypes.DEFAULT_T
     """Handle /group_balances command - show group balances"""
     from services.group_balance import GroupBalanceService
     
-    db = next(get_db())
     try:
-        report = GroupBalanceService.get_detailed_balance_report(db)
+        report = await run_db(GroupBalanceService.get_detailed_balance_report)
         await update.message.reply_text(report)
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при получении балансов групп: {str(e)}")
-    finally:
-        db.close()
+
+def build_db_info_texts(db: Session) -> tuple:
+    """DB work unit: users, profiles and expenses info for /db_info"""
+    # Get users info
+    users = db.query(User).all()
+    users_text = "👥 **Пользователи в базе:**\n\n"
+    
+    for user in users:
+        users_text += f"• ID: {user.id}\n"
+        users_text += f"  Telegram ID: {user.telegram_id}\n"
+        users_text += f"  Username: @{user.username or 'нет'}\n"
+        users_text += f"  Имя: {user.first_name or 'нет'}\n"
+        users_text += f"  Фамилия: {user.last_name or 'нет'}\n"
+        users_text += f"  Дата регистрации: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+        users_text += f"  Админ: {'Да' if user.is_admin else 'Нет'}\n\n"
+    
+    # Get profiles info
+    profiles = db.query(Profile).all()
+    profiles_text = "🏠 **Профили:**\n\n"
+    
+    for profile in profiles:
+        profiles_text += f"• ID: {profile.id}\n"
+        profiles_text += f"  Название: {profile.name}\n"
+        profiles_text += f"  Описание: {profile.description or 'нет'}\n"
+        profiles_text += f"  По умолчанию: {'Да' if profile.is_default else 'Нет'}\n"
+        profiles_text += f"  Дата создания: {profile.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        
+        # Get profile members
+        members = db.query(ProfileMember).filter(ProfileMember.profile_id == profile.id).all()
+        if members:
+            profiles_text += "  👥 Участники:\n"
+            for member in members:
+                member_user = db.query(User).filter(User.id == member.user_id).first()
+                if member_user:
+                    profiles_text += f"    - {member_user.first_name or member_user.username} (вес: {member.weight})\n"
+            profiles_text += "\n"
+    
+    # Get expenses count
+    from models import Expense
+    expenses_count = db.query(Expense).count()
+    expenses_text = f"💰 **Расходы:** {expenses_count} записей\n\n"
+    
+    return users_text, profiles_text, expenses_text
 
 @require_access
 async def db_info_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /db_info command - show database information"""
-    db = next(get_db())
-    
     try:
-        # Get users info
-        users = db.query(User).all()
-        users_text = "👥 **Пользователи в базе:**\n\n"
-        
-        for user in users:
-            users_text += f"• ID: {user.id}\n"
-            users_text += f"  Telegram ID: {user.telegram_id}\n"
-            users_text += f"  Username: @{user.username or 'нет'}\n"
-            users_text += f"  Имя: {user.first_name or 'нет'}\n"
-            users_text += f"  Фамилия: {user.last_name or 'нет'}\n"
-            users_text += f"  Дата регистрации: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-            users_text += f"  Админ: {'Да' if user.is_admin else 'Нет'}\n\n"
-        
-        # Get profiles info
-        profiles = db.query(Profile).all()
-        profiles_text = "🏠 **Профили:**\n\n"
-        
-        for profile in profiles:
-            profiles_text += f"• ID: {profile.id}\n"
-            profiles_text += f"  Название: {profile.name}\n"
-            profiles_text += f"  Описание: {profile.description or 'нет'}\n"
-            profiles_text += f"  По умолчанию: {'Да' if profile.is_default else 'Нет'}\n"
-            profiles_text += f"  Дата создания: {profile.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            
-            # Get profile members
-            members = db.query(ProfileMember).filter(ProfileMember.profile_id == profile.id).all()
-            if members:
-                profiles_text += "  👥 Участники:\n"
-                for member in members:
-                    member_user = db.query(User).filter(User.id == member.user_id).first()
-                    if member_user:
-                        profiles_text += f"    - {member_user.first_name or member_user.username} (вес: {member.weight})\n"
-                profiles_text += "\n"
+        users_text, profiles_text, expenses_text = await run_db(build_db_info_texts)
         
-        # Get expenses count
-        from models import Expense
-        expenses_count = db.query(Expense).count()
-        expenses_text = f"💰 **Расходы:** {expenses_count} записей\n\n"
+        # DB executor metrics
+        from utils.db_executor import db_executor
+        metrics = db_executor.metrics()
+        expenses_text += "⚙️ **DB executor:**\n"
+        expenses_text += f"  Потоков: {metrics['workers']}, политика: {metrics['policy']}\n"
+        expenses_text += f"  В очереди: {metrics['queue_depth']}, выполняется: {metrics['running']}\n"
+        expenses_text += f"  Выполнено: {metrics['completed']}, отклонено: {metrics['rejected']}\n"
+        expenses_text += f"  Ожидание: {metrics['avg_wait_ms']:.1f} мс (макс {metrics['max_wait_ms']:.1f})\n"
+        expenses_text += f"  Выполнение: {metrics['avg_run_ms']:.1f} мс (макс {metrics['max_run_ms']:.1f})\n"
         
         # Combine all info
         full_text = users_text + profiles_text + expenses_text
@@ -254,5 +272,3 @@ async def db_info_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
     except Exception as e:
         await update.message.reply_text(f"❌ Ошибка при получении информации: {str(e)}")
-    finally:
-        db.close()
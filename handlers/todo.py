@@ -4,8 +4,9 @@ Todo list handlers
 """
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+from typing import List, Optional
 from sqlalchemy.orm import Session
-from db import get_db
+from utils.db_executor import run_db
 from handlers.base import BaseHandler
 from utils.keyboards import back_keyboard
 from services.todo_service import TodoService
@@ -54,63 +55,77 @@ async def add_todo_item_callback(update: Update, context: ContextTypes.DEFAULT_T
     
     await query.edit_message_text(text, reply_markup=keyboard)
 
+def build_todo_list(db: Session) -> tuple:
+    """DB work unit: todo list text and keyboard"""
+    # Get todo items - get ALL items (both completed and uncompleted)
+    items = TodoService.get_items(db, completed_only=None, limit=20)
+    
+    if not items:
+        return "📝 Список дел пуст", back_keyboard("todo_list")
+    return format_todo_list(items, db), create_todo_items_keyboard(items)
+
+def build_remove_todo_menu(db: Session) -> tuple:
+    """DB work unit: remove menu text and keyboard"""
+    # Get todo items - get ALL items (both completed and uncompleted)
+    items = TodoService.get_items(db, completed_only=None, limit=20)
+    
+    if not items:
+        return "📝 Список дел пуст", back_keyboard("todo_list")
+    
+    text = "🗑 Выберите дело для удаления:\n\n"
+    for i, item in enumerate(items, 1):
+        status = "✅" if item.is_completed else "⭕"
+        text += f"{i}. {status} {item.title}\n"
+    
+    return text, create_remove_todo_items_keyboard(items)
+
+def toggle_todo_item(db: Session, item_id: int, telegram_user) -> Optional[tuple]:
+    """DB work unit: toggle item and return updated list, None if item not found"""
+    if not TodoService.get_item_by_id(db, item_id):
+        return None
+    
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    TodoService.toggle_item(db, item_id, user.id)
+    return build_todo_list(db)
+
+def remove_todo_item(db: Session, item_id: int) -> Optional[tuple]:
+    """DB work unit: remove item and return updated remove menu, None if item not found"""
+    if not TodoService.remove_item(db, item_id):
+        return None
+    return build_remove_todo_menu(db)
+
+def add_todo_items(db: Session, telegram_user, titles: List[str]) -> int:
+    """DB work unit: add todo items for telegram user"""
+    user = BaseHandler.get_or_create_user(db, telegram_user)
+    for item_title in titles:
+        TodoService.add_item(db, item_title, user.id)
+    return len(titles)
+
 async def list_todo_items_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle list todo items button"""
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get todo items - get ALL items (both completed and uncompleted)
-        items = TodoService.get_items(db, completed_only=None, limit=20)
-        
-        if not items:
-            text = "📝 Список дел пуст"
-            keyboard = back_keyboard("todo_list")
-        else:
-            text = format_todo_list(items, db)
-            keyboard = create_todo_items_keyboard(items)
-        
+        text, keyboard = await run_db(build_todo_list)
         await query.edit_message_text(text, reply_markup=keyboard)
         
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "загрузке списка дел")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def remove_todo_item_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle remove todo item button"""
     query = update.callback_query
     await query.answer()
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get todo items - get ALL items (both completed and uncompleted)
-        items = TodoService.get_items(db, completed_only=None, limit=20)
-        
-        if not items:
-            text = "📝 Список дел пуст"
-            keyboard = back_keyboard("todo_list")
-        else:
-            text = "🗑 Выберите дело для удаления:\n\n"
-            for i, item in enumerate(items, 1):
-                status = "✅" if item.is_completed else "⭕"
-                text += f"{i}. {status} {item.title}\n"
-            
-            keyboard = create_remove_todo_items_keyboard(items)
-        
+        text, keyboard = await run_db(build_remove_todo_menu)
         await query.edit_message_text(text, reply_markup=keyboard)
         
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "загрузке списка дел")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def toggle_todo_item_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle toggle todo item (complete/uncomplete)"""
@@ -128,52 +143,19 @@ async def toggle_todo_item_callback(update: Update, context: ContextTypes.DEFAUL
         await query.edit_message_text("❌ Неверный ID дела")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get item
-        item = TodoService.get_item_by_id(db, item_id)
-        if not item:
+        # Toggle completed status and show updated list
+        result = await run_db(toggle_todo_item, item_id, update.effective_user)
+        if result is None:
             await query.edit_message_text("❌ Дело не найдено")
             return
         
-        # Toggle completed status
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        
-        if item.is_completed:
-            # Mark as not completed
-            item.is_completed = False
-            item.completed_at = None
-            item.completed_by = None
-            status_text = "⭕ Отмечено как не выполненное"
-        else:
-            # Mark as completed
-            item.is_completed = True
-            from datetime import datetime
-            item.completed_at = datetime.utcnow()
-            item.completed_by = user.id
-            status_text = "✅ Отмечено как выполненное"
-        
-        db.commit()
-        
-        # Show updated list - get ALL items (both completed and uncompleted)
-        items = TodoService.get_items(db, completed_only=None, limit=20)
-        
-        if not items:
-            text = "📝 Список дел пуст"
-            keyboard = back_keyboard("todo_list")
-        else:
-            text = format_todo_list(items, db)
-            keyboard = create_todo_items_keyboard(items)
-        
+        text, keyboard = result
         await query.edit_message_text(text, reply_markup=keyboard)
         
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "обновлении списка дел")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def remove_todo_item_specific_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle remove specific todo item"""
@@ -191,38 +173,19 @@ async def remove_todo_item_specific_callback(update: Update, context: ContextTyp
         await query.edit_message_text("❌ Неверный ID дела")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Remove item
-        success = TodoService.remove_item(db, item_id)
-        
-        if not success:
+        # Remove item and show updated list
+        result = await run_db(remove_todo_item, item_id)
+        if result is None:
             await query.edit_message_text("❌ Дело не найдено")
             return
         
-        # Show updated list - get ALL items (both completed and uncompleted)
-        items = TodoService.get_items(db, completed_only=None, limit=20)
-        
-        if not items:
-            text = "📝 Список дел пуст"
-            keyboard = back_keyboard("todo_list")
-        else:
-            text = "🗑 Выберите дело для удаления:\n\n"
-            for i, item in enumerate(items, 1):
-                status = "✅" if item.is_completed else "⭕"
-                text += f"{i}. {status} {item.title}\n"
-            
-            keyboard = create_remove_todo_items_keyboard(items)
-        
+        text, keyboard = result
         await query.edit_message_text(text, reply_markup=keyboard)
         
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "удалении дела")
         await query.edit_message_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 async def handle_todo_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle todo item input"""
@@ -237,20 +200,10 @@ async def handle_todo_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Введите название дела")
         return
     
-    # Get database session
-    db = next(get_db())
-    
     try:
-        # Get or create user
-        user = BaseHandler.get_or_create_user(db, update.effective_user)
-        
         # Split by comma and add each item
         items = [item.strip() for item in text.split(',') if item.strip()]
-        added_count = 0
-        
-        for item_title in items:
-            TodoService.add_item(db, item_title, user.id)
-            added_count += 1
+        added_count = await run_db(add_todo_items, update.effective_user, items)
         
         # Clear user state
         del context.bot_data['user_states'][user_id]
@@ -269,8 +222,6 @@ async def handle_todo_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         error_text, keyboard = handle_db_error(e, "добавлении дела")
         await update.message.reply_text(error_text, reply_markup=keyboard)
-    finally:
-        db.close()
 
 def create_todo_items_keyboard(items):
     """Create keyboard with toggle buttons for todo items"""
@@ -0,0 +1,274 @@
+"""
+Versioned schema migrations
+
+Migrations are applied in order at startup, each in its own transaction, and must be
+idempotent. The applied version is stored in db_meta, so booting an up-to-date database
+costs a single query and no schema introspection.
+"""
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import inspect, select, update, insert, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+SCHEMA_VERSION_KEY = "schema_version"
+
+# Tables that existed before versioned migrations
+BASELINE_TABLES = (
+    "users", "profiles", "profile_members", "shopping_items", "todo_items",
+    "exchange_rates", "expenses", "expense_allocations", "month_snapshots",
+    "duty_tasks", "duty_schedules", "db_meta",
+    # Referenced by month_snapshots.settlement_id, so fresh databases create it up front
+    "settlements",
+    # Referenced by expenses.import_id
+    "expense_imports",
+)
+
+def get_meta(conn: Connection, key: str) -> Optional[str]:
+    """Read value from db_meta"""
+    from models import DbMeta
+    return conn.execute(select(DbMeta.value).where(DbMeta.key == key)).scalar()
+
+def set_meta(conn: Connection, key: str, value: str) -> None:
+    """Write value to db_meta (insert or update)"""
+    from models import DbMeta
+    now = datetime.utcnow()
+    result = conn.execute(
+        update(DbMeta).where(DbMeta.key == key).values(value=value, updated_at=now)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(DbMeta).values(key=key, value=value, updated_at=now))
+
+def get_schema_version(engine: Engine) -> int:
+    """Get applied schema version (0 for databases created before versioning)"""
+    try:
+        with engine.connect() as conn:
+            value = get_meta(conn, SCHEMA_VERSION_KEY)
+    except (OperationalError, ProgrammingError):
+        # db_meta doesn't exist yet
+        return 0
+    return int(value) if value else 0
+
+def _has_columns(conn: Connection, table) -> bool:
+    """Check that an existing table has every column of its model"""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    return {column.name for column in table.columns} <= existing
+
+# Migrations
+
+def migration_0001_baseline(conn: Connection) -> None:
+    """Create baseline tables (skips tables that already exist)"""
+    from db import Base
+    tables = [Base.metadata.tables[name] for name in BASELINE_TABLES]
+    Base.metadata.create_all(bind=conn, tables=tables, checkfirst=True)
+
+def migration_0002_duty_tables(conn: Connection) -> None:
+    """Recreate duty tables left with an old schema (replaces reset_duty_tables.py)"""
+    from models import DutyTask, DutySchedule
+
+    if _has_columns(conn, DutyTask.__table__) and _has_columns(conn, DutySchedule.__table__):
+        return
+
+    # Duty data is regenerated from default tasks, so rebuilding is safe
+    print("🔄 Пересоздаем таблицы дежурств со старой схемой...")
+    DutySchedule.__table__.drop(conn, checkfirst=True)
+    DutyTask.__table__.drop(conn, checkfirst=True)
+    DutyTask.__table__.create(conn)
+    DutySchedule.__table__.create(conn)
+
+def migration_0003_user_version(conn: Connection) -> None:
+    """Add users.version for cross-worker user cache invalidation"""
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "version" in columns:
+        return
+    conn.execute(text("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+def migration_0004_group_balances(conn: Connection) -> None:
+    """Create group balance ledger"""
+    from models import GroupBalance
+
+    # Filled by the seed when Home members are assigned their groups
+    GroupBalance.__table__.create(conn, checkfirst=True)
+
+def migration_0005_settlements(conn: Connection) -> None:
+    """Settle-up checkpoints (month_snapshots rows get settlement_id)"""
+    from models import Settlement, SettlementGroupBalance
+
+    Settlement.__table__.create(conn, checkfirst=True)
+    SettlementGroupBalance.__table__.create(conn, checkfirst=True)
+
+    columns = {column["name"] for column in inspect(conn).get_columns("month_snapshots")}
+    if "settlement_id" not in columns:
+        conn.execute(text("ALTER TABLE month_snapshots ADD COLUMN settlement_id INTEGER REFERENCES settlements(id)"))
+    indexes = {index["name"] for index in inspect(conn).get_indexes("month_snapshots")}
+    if "ix_month_snapshots_settlement" not in indexes:
+        conn.execute(text("CREATE INDEX ix_month_snapshots_settlement ON month_snapshots (settlement_id)"))
+
+def migration_0006_expense_indexes(conn: Connection) -> None:
+    """Indexes for checkpoint and month scans over expenses and allocations"""
+    from models import Expense, ExpenseAllocation
+
+    for table in (Expense.__table__, ExpenseAllocation.__table__):
+        existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+        columns = {column["name"] for column in inspect(conn).get_columns(table.name)}
+        for index in table.indexes:
+            # Indexes on columns added by later migrations are created there
+            if index.name not in existing and all(column.name in columns for column in index.columns):
+                index.create(conn)
+
+def migration_0007_exchange_rate_index(conn: Connection) -> None:
+    """Index for active rate lookups by currency pair"""
+    from models import ExchangeRate
+
+    existing = {index["name"] for index in inspect(conn).get_indexes(ExchangeRate.__tablename__)}
+    for index in ExchangeRate.__table__.indexes:
+        if index.name not in existing:
+            index.create(conn)
+
+# Money columns converted from Float to integer minor units
+MONEY_COLUMNS = (
+    ("expenses", ("amount", "amount_sek")),
+    ("expense_allocations", ("amount_sek",)),
+    ("month_snapshots", ("total_paid_sek", "total_owed_sek", "net_balance_sek")),
+    ("settlement_group_balances", ("spent_sek", "owes_sek")),
+    ("group_balances", ("spent_sek", "owes_sek")),
+)
+
+# Money columns already converted (SQLite keeps the REAL column type, so the type can't tell)
+MONEY_CONVERTED_KEY = "money_minor_units_converted"
+
+def _round_allocations_to_expenses(conn: Connection) -> None:
+    """Write allocations in minor units that add up to their expense's (converted) amount_sek
+
+    Rounding every share on its own would leave expenses with allocations off by a few öre,
+    so each expense's shares are rounded together (largest remainder method). Shares that
+    covered the whole expense are scaled to its converted total; partial splits (only the
+    other family owes) keep their rounded sum.
+    """
+    from utils.money import round_allocations
+
+    def flush(expense_amount, shares, updates):
+        scale = 100
+        total = sum(shares.values()) * 100
+        if total and abs(total - expense_amount) < 1:
+            scale = expense_amount / sum(shares.values())
+        for allocation_id, share in round_allocations({
+            allocation_id: share * scale for allocation_id, share in shares.items()
+        }).items():
+            updates.append({"allocation_id": allocation_id, "minor": share})
+
+    rows = conn.execute(text(
+        "SELECT a.id, a.expense_id, a.amount_sek, e.amount_sek FROM expense_allocations a "
+        "JOIN expenses e ON e.id = a.expense_id ORDER BY a.expense_id, a.id"
+    ))
+    updates = []
+    current_expense, expense_amount, shares = None, 0, {}
+    for allocation_id, expense_id, share, amount_sek in rows:
+        if expense_id != current_expense:
+            if shares:
+                flush(expense_amount, shares, updates)
+            current_expense, expense_amount, shares = expense_id, amount_sek, {}
+        shares[allocation_id] = share
+    if shares:
+        flush(expense_amount, shares, updates)
+    rows.close()
+
+    if updates:
+        conn.execute(text("UPDATE expense_allocations SET amount_sek = :minor WHERE id = :allocation_id"), updates)
+
+def migration_0008_money_minor_units(conn: Connection) -> None:
+    """Store money as integer minor units (öre, cents, kopecks)"""
+    from sqlalchemy import Integer
+
+    converted = set(filter(None, (get_meta(conn, MONEY_CONVERTED_KEY) or "").split(",")))
+    for table, money_columns in MONEY_COLUMNS:
+        columns = {column["name"]: column["type"] for column in inspect(conn).get_columns(table)}
+        for name in money_columns:
+            key = f"{table}.{name}"
+            # Tables created from current models already hold minor units
+            if key in converted or isinstance(columns[name], Integer):
+                continue
+            if key == "expense_allocations.amount_sek":
+                # Expenses are converted first; values are already scaled to minor units
+                _round_allocations_to_expenses(conn)
+                scaled = name
+            else:
+                scaled = f"ROUND({name} * 100)"
+            if conn.dialect.name == "sqlite":
+                # SQLite can't change column types; REAL affinity keeps integral values exact
+                conn.execute(text(f"UPDATE {table} SET {name} = CAST({scaled} AS INTEGER)"))
+            else:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ALTER COLUMN {name} TYPE BIGINT USING ({scaled})::BIGINT"
+                ))
+            converted.add(key)
+            set_meta(conn, MONEY_CONVERTED_KEY, ",".join(sorted(converted)))
+    # Ledger rows are rebuilt by the seed when Home members are assigned their groups
+
+def migration_0009_expense_imports(conn: Connection) -> None:
+    """Import batches: expenses.import_id links /import rows to their run"""
+    from models import Expense, ExpenseImport
+
+    ExpenseImport.__table__.create(conn, checkfirst=True)
+    columns = {column["name"] for column in inspect(conn).get_columns("expenses")}
+    if "import_id" not in columns:
+        conn.execute(text("ALTER TABLE expenses ADD COLUMN import_id INTEGER REFERENCES expense_imports(id)"))
+    indexes = {index["name"] for index in inspect(conn).get_indexes("expenses")}
+    if "ix_expenses_import" not in indexes:
+        conn.execute(text("CREATE INDEX ix_expenses_import ON expenses (import_id)"))
+
+def migration_0010_profile_member_aliases(conn: Connection) -> None:
+    """Add profile_members.alias (names in commands and imports)"""
+    columns = {column["name"] for column in inspect(conn).get_columns("profile_members")}
+    if "alias" in columns:
+        return
+    conn.execute(text("ALTER TABLE profile_members ADD COLUMN alias VARCHAR(50)"))
+
+def migration_0011_expense_rollups(conn: Connection) -> None:
+    """Category x month expense rollup, filled from history"""
+    from sqlalchemy.orm import Session
+    from models import ExpenseRollup
+    from services.expense_rollup import ExpenseRollupService
+
+    ExpenseRollup.__table__.create(conn, checkfirst=True)
+    with Session(bind=conn) as session:
+        ExpenseRollupService.rebuild(session)
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline schema", migration_0001_baseline),
+    (2, "rebuild outdated duty tables", migration_0002_duty_tables),
+    (3, "add users.version", migration_0003_user_version),
+    (4, "group balance ledger", migration_0004_group_balances),
+    (5, "settlement checkpoints", migration_0005_settlements),
+    (6, "expense indexes", migration_0006_expense_indexes),
+    (7, "exchange rate index", migration_0007_exchange_rate_index),
+    (8, "money in minor units", migration_0008_money_minor_units),
+    (9, "expense import batches", migration_0009_expense_imports),
+    (10, "profile member aliases", migration_0010_profile_member_aliases),
+    (11, "expense rollups", migration_0011_expense_rollups),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations, return the resulting schema version"""
+    current = get_schema_version(engine)
+
+    # Fast path: schema is up to date
+    if current >= LATEST_VERSION:
+        if current > LATEST_VERSION:
+            print(f"⚠️ Версия схемы БД ({current}) новее кода ({LATEST_VERSION})")
+        return current
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+
+        print(f"🔄 Миграция {version}: {description}")
+        with engine.begin() as conn:
+            migrate(conn)
+            set_meta(conn, SCHEMA_VERSION_KEY, str(version))
+        current = version
+
+    print(f"✅ Схема БД обновлена до версии {current}")
+    return current
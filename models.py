@@ -8,9 +8,19 @@ from sqlalchemy import (
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.types import TypeDecorator
 from db import Base
 import enum
 
+class Money(TypeDecorator):
+    """Amount in integer minor units (öre, cents, kopecks), see utils/money.py"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_result_value(self, value, dialect):
+        # SUM() comes back as Decimal on PostgreSQL, legacy SQLite columns keep REAL affinity
+        return int(value) if value is not None else None
+
 class Currency(enum.Enum):
     """Supported currencies"""
     SEK = "SEK"
@@ -40,6 +50,10 @@ class User(Base):
     last_name = Column(String(100), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_admin = Column(Boolean, default=False)
+    # Bumped on every change; identity caches in other workers compare it to drop stale entries
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    
+    __mapper_args__ = {"version_id_col": version}
     
     # Relationships
     profile_memberships = relationship("ProfileMember", back_populates="user")
@@ -68,6 +82,7 @@ class ProfileMember(Base):
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     group_name = Column(String(50), nullable=False, default="default")
+    alias = Column(String(50), nullable=True)  # Name in commands and imports
     weight = Column(Float, nullable=False, default=1.0)
     
     # Relationships
@@ -111,16 +126,20 @@ class ExchangeRate(Base):
     rate = Column(Float, nullable=False)
     valid_from = Column(DateTime, nullable=False, default=datetime.utcnow)
     valid_until = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_exchange_rates_pair_valid_from", "from_currency", "to_currency", "valid_from"),
+    )
 
 class Expense(Base):
     """Expense record"""
     __tablename__ = "expenses"
     
     id = Column(Integer, primary_key=True)
-    amount = Column(Float, nullable=False)
+    amount = Column(Money, nullable=False)  # In minor units of currency
     currency = Column(Enum(Currency), nullable=False)
     exchange_rate = Column(Float, nullable=False)  # Rate used for this expense
-    amount_sek = Column(Float, nullable=False)  # Amount in SEK
+    amount_sek = Column(Money, nullable=False)  # Amount in SEK öre
     category = Column(Enum(ExpenseCategory), nullable=False)
     custom_category_name = Column(String(200), nullable=True)  # For "OTHER" category
     note = Column(Text, nullable=True)
@@ -128,11 +147,28 @@ class Expense(Base):
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
     month = Column(Date, nullable=False)  # YYYY-MM-01 for grouping
     created_at = Column(DateTime, default=datetime.utcnow)
+    import_id = Column(Integer, ForeignKey("expense_imports.id"), nullable=True)  # Set for /import rows
     
     # Relationships
     payer = relationship("User", back_populates="expenses")
     profile = relationship("Profile", back_populates="expenses")
     allocations = relationship("ExpenseAllocation", back_populates="expense")
+    
+    __table_args__ = (
+        Index("ix_expenses_profile_id", "profile_id", "id"),
+        Index("ix_expenses_month", "month"),
+        Index("ix_expenses_import", "import_id"),
+    )
+
+class ExpenseImport(Base):
+    """One /import run; its expenses are committed chunk by chunk and can be undone together"""
+    __tablename__ = "expense_imports"
+    
+    id = Column(Integer, primary_key=True)
+    file_name = Column(String(255), nullable=True)
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    status = Column(String(20), nullable=False, default="running")  # running / done / undone
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 class ExpenseAllocation(Base):
     """How expense is split among users"""
@@ -141,27 +177,107 @@ class ExpenseAllocation(Base):
     id = Column(Integer, primary_key=True)
     expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    amount_sek = Column(Float, nullable=False)  # User's share in SEK
+    amount_sek = Column(Money, nullable=False)  # User's share in SEK öre
     weight_used = Column(Float, nullable=False)  # Weight used for calculation
     
     # Relationships
     expense = relationship("Expense", back_populates="allocations")
     user = relationship("User", back_populates="allocations")
+    
+    __table_args__ = (
+        Index("ix_expense_allocations_expense", "expense_id"),
+    )
 
 class MonthSnapshot(Base):
-    """Monthly balance snapshot"""
+    """Monthly balance snapshot (or cumulative user balance of a settlement checkpoint)"""
     __tablename__ = "month_snapshots"
     
     id = Column(Integer, primary_key=True)
     month = Column(Date, nullable=False)  # YYYY-MM-01
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    total_paid_sek = Column(Float, nullable=False, default=0.0)
-    total_owed_sek = Column(Float, nullable=False, default=0.0)
-    net_balance_sek = Column(Float, nullable=False, default=0.0)
+    total_paid_sek = Column(Money, nullable=False, default=0)
+    total_owed_sek = Column(Money, nullable=False, default=0)
+    net_balance_sek = Column(Money, nullable=False, default=0)
+    settlement_id = Column(Integer, ForeignKey("settlements.id"), nullable=True)  # Set for checkpoint rows
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User")
+    settlement = relationship("Settlement", back_populates="user_snapshots")
+    
+    __table_args__ = (
+        Index("ix_month_snapshots_settlement", "settlement_id"),
+    )
+
+class Settlement(Base):
+    """Settle-up checkpoint: balances of a profile including every expense up to last_expense_id"""
+    __tablename__ = "settlements"
+    
+    id = Column(Integer, primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
+    last_expense_id = Column(Integer, nullable=False, default=0)
+    created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    user_snapshots = relationship("MonthSnapshot", back_populates="settlement")
+    group_snapshots = relationship("SettlementGroupBalance", back_populates="settlement")
+    
+    __table_args__ = (
+        Index("ix_settlements_profile", "profile_id", "last_expense_id"),
+    )
+
+class SettlementGroupBalance(Base):
+    """Group totals of a settlement checkpoint"""
+    __tablename__ = "settlement_group_balances"
+    
+    id = Column(Integer, primary_key=True)
+    settlement_id = Column(Integer, ForeignKey("settlements.id"), nullable=False)
+    group_number = Column(Integer, nullable=False)
+    spent_sek = Column(Money, nullable=False, default=0)
+    owes_sek = Column(Money, nullable=False, default=0)
+    
+    # Relationships
+    settlement = relationship("Settlement", back_populates="group_snapshots")
+    
+    __table_args__ = (
+        UniqueConstraint("settlement_id", "group_number", name="uq_settlement_group"),
+    )
+
+class GroupBalance(Base):
+    """Running balance of a user group in a profile (updated with every expense change)"""
+    __tablename__ = "group_balances"
+    
+    id = Column(Integer, primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
+    group_number = Column(Integer, nullable=False)  # 1 or 2, see GroupBalanceService
+    spent_sek = Column(Money, nullable=False, default=0)  # Paid by the group
+    owes_sek = Column(Money, nullable=False, default=0)  # Group members' shares
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("profile_id", "group_number", name="uq_group_balance_profile_group"),
+    )
+
+class ExpenseRollup(Base):
+    """Expense totals per (profile, month, category, custom name, payer), see ExpenseRollupService"""
+    __tablename__ = "expense_rollups"
+    
+    id = Column(Integer, primary_key=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
+    month = Column(Date, nullable=False)  # YYYY-MM-01
+    category = Column(Enum(ExpenseCategory), nullable=False)
+    custom_category_name = Column(String(200), nullable=False, default="", server_default="")  # "" - none
+    payer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    total_sek = Column(Money, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint(
+            "profile_id", "month", "category", "custom_category_name", "payer_id", name="uq_expense_rollup_key"
+        ),
+        Index("ix_expense_rollups_month", "month"),
+    )
 
 class DutyTask(Base):
     """Duty task definition"""
@@ -205,3 +321,11 @@ class DutySchedule(Base):
         Index("ix_user_date", "assigned_user_id", "date"),
         Index("ix_date", "date"),
     )
+
+class DbMeta(Base):
+    """Key/value metadata about the database itself (schema version etc.)"""
+    __tablename__ = "db_meta"
+    
+    key = Column(String(50), primary_key=True)
+    value = Column(String(255), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
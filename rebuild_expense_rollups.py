@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Rebuild the category x month expense rollup from expense history and verify it
+
+Usage: python rebuild_expense_rollups.py [--check]
+  --check  only compare the rollup with a full history scan, don't rewrite it
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db import init_db, get_db
+from services.expense_rollup import ExpenseRollupService
+
+def rebuild_expense_rollups(check_only: bool = False) -> bool:
+    """Rebuild (unless check_only) and verify, return True if the rollup matches history"""
+    init_db()
+    db = next(get_db())
+    
+    try:
+        if not check_only:
+            print("🔄 Пересчитываем сводку расходов по категориям...")
+            rows = ExpenseRollupService.rebuild(db)
+            db.commit()
+            print(f"  Строк сводки: {rows}")
+        
+        print("🔍 Сверяем сводку с историей расходов...")
+        mismatches = ExpenseRollupService.verify(db)
+        if mismatches:
+            for mismatch in mismatches:
+                print(f"❌ {mismatch['key']}: в сводке {mismatch['rollup']}, по истории {mismatch['history']}")
+            return False
+        
+        print("✅ Сводка по категориям совпадает с историей")
+        return True
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    ok = rebuild_expense_rollups(check_only="--check" in sys.argv[1:])
+    sys.exit(0 if ok else 1)
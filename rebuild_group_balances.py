@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Rebuild the group balance ledger from expense history and verify it
+
+Usage: python rebuild_group_balances.py [--check]
+  --check  only compare the ledger with a full history scan, don't rewrite it
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db import init_db, get_db
+from services.group_balance import GroupBalanceService
+from models import Currency
+from utils.texts import format_amount
+
+def rebuild_group_balances(check_only: bool = False) -> bool:
+    """Rebuild (unless check_only) and verify, return True if the ledger matches history"""
+    init_db()
+    db = next(get_db())
+    
+    try:
+        if not check_only:
+            print("🔄 Пересчитываем балансы групп по всей истории...")
+            ledger = GroupBalanceService.rebuild_ledger(db)
+            for profile_id, groups in ledger.items():
+                for group, (spent, owes) in groups.items():
+                    print(
+                        f"  Профиль {profile_id}, группа {group}: "
+                        f"потрачено {format_amount(spent, Currency.SEK)}, доля {format_amount(owes, Currency.SEK)}"
+                    )
+        
+        print("🔍 Сверяем балансы с историей расходов...")
+        mismatches = GroupBalanceService.verify_ledger(db)
+        if mismatches:
+            for mismatch in mismatches:
+                print(
+                    f"❌ Профиль {mismatch['profile_id']}, группа {mismatch['group']}: "
+                    f"в таблице {mismatch['ledger']}, по истории {mismatch['history']}"
+                )
+            return False
+        
+        print("✅ Балансы групп совпадают с историей")
+        return True
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    ok = rebuild_group_balances(check_only="--check" in sys.argv[1:])
+    sys.exit(0 if ok else 1)
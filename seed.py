@@ -0,0 +1,209 @@
+"""
+Seed data: hardcoded users, Home profile with member groups, default exchange rates and duty tasks
+
+Seed data is versioned by a checksum stored in db_meta. When it matches, startup skips
+seeding entirely; otherwise everything is upserted in bulk in a single transaction.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from sqlalchemy import select, delete, insert, update, func, bindparam
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from db import dialect_insert
+from models import User, Profile, ProfileMember, ExchangeRate, DutyTask, Currency
+from services.duty_service import DutyService
+from services.membership import bump_membership_version, membership_registry
+from migrations import get_meta, set_meta
+from utils.rate_cache import bump_rate_version
+
+SEED_CHECKSUM_KEY = "seed_checksum"
+
+# Bump when the seeding logic changes without the data changing
+SEED_FORMAT_VERSION = 1
+
+# Захардкоженные данные пользователей
+HARDCODED_USERS = [
+    {
+        "telegram_id": 804085588,
+        "first_name": "Сеня",
+        "last_name": "Стрельцов",
+        "username": "the_lodka"
+    },
+    {
+        "telegram_id": 252901018,
+        "first_name": "Катя",
+        "last_name": "Стрельцова",
+        "username": "katrine_streltsova"
+    },
+    {
+        "telegram_id": 350653235,
+        "first_name": "Дима",
+        "last_name": "Стрельцов",
+        "username": None
+    },
+    {
+        "telegram_id": 916228993,
+        "first_name": "Даша",
+        "last_name": "Ше",
+        "username": "dashok_she"
+    },
+    {
+        "telegram_id": 6379711500,
+        "first_name": "Миша",
+        "last_name": "Брат",
+        "username": "l_tyti"
+    }
+]
+
+HOME_PROFILE_NAME = "Home"
+
+# Группы (семьи) и имена участников Home: telegram_id -> (group_name, alias)
+HOME_MEMBERS = {
+    804085588: ("group_1", "сеня"),
+    916228993: ("group_1", "даша"),
+    252901018: ("group_2", "катя"),
+    350653235: ("group_2", "дима"),
+    6379711500: ("group_2", "миша"),
+}
+
+# Default rates to SEK (created only if missing)
+DEFAULT_EXCHANGE_RATES = [
+    {"from_currency": Currency.EUR, "to_currency": Currency.SEK, "rate": 11.30},
+    {"from_currency": Currency.RUB, "to_currency": Currency.SEK, "rate": 0.12},
+]
+
+def seed_checksum() -> str:
+    """Checksum of all seed data"""
+    payload = {
+        "format": SEED_FORMAT_VERSION,
+        "users": HARDCODED_USERS,
+        "home_profile": HOME_PROFILE_NAME,
+        "home_members": HOME_MEMBERS,
+        "exchange_rates": DEFAULT_EXCHANGE_RATES,
+        "duty_tasks": DutyService.DEFAULT_TASKS,
+    }
+    encoded = json.dumps(
+        payload, sort_keys=True, ensure_ascii=False,
+        default=lambda value: getattr(value, "value", str(value))
+    )
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def _seed_users(conn: Connection) -> None:
+    """Upsert hardcoded users by telegram_id"""
+    statement = dialect_insert(conn)(User.__table__).values(HARDCODED_USERS)
+    statement = statement.on_conflict_do_update(
+        index_elements=["telegram_id"],
+        set_={
+            "first_name": statement.excluded.first_name,
+            "last_name": statement.excluded.last_name,
+            "username": statement.excluded.username,
+            "version": User.__table__.c.version + 1,
+        }
+    )
+    conn.execute(statement)
+    bump_membership_version(conn)
+
+def _seed_home_profile(conn: Connection) -> bool:
+    """Create Home profile, add hardcoded users with weight 1 and set their groups and aliases
+
+    Returns True if membership changed.
+    """
+    profile_id = conn.execute(
+        select(Profile.id).where(Profile.name == HOME_PROFILE_NAME)
+    ).scalar()
+    if profile_id is None:
+        profile_id = conn.execute(
+            insert(Profile).values(name=HOME_PROFILE_NAME, is_default=True)
+        ).inserted_primary_key[0]
+        print(f"✅ Создан профиль {HOME_PROFILE_NAME}")
+
+    telegram_ids = [user["telegram_id"] for user in HARDCODED_USERS]
+    users = conn.execute(
+        select(User.id, User.telegram_id).where(User.telegram_id.in_(telegram_ids))
+    ).all()
+    members = {
+        user_id: (member_id, group_name, alias)
+        for member_id, user_id, group_name, alias in conn.execute(
+            select(ProfileMember.id, ProfileMember.user_id, ProfileMember.group_name, ProfileMember.alias)
+            .where(ProfileMember.profile_id == profile_id)
+        )
+    }
+
+    new_members, changed_members = [], []
+    for user_id, telegram_id in users:
+        group_name, alias = HOME_MEMBERS.get(telegram_id, ("default", None))
+        if user_id not in members:
+            new_members.append({
+                "profile_id": profile_id, "user_id": user_id,
+                "group_name": group_name, "alias": alias, "weight": 1.0
+            })
+        elif members[user_id][1:] != (group_name, alias):
+            changed_members.append({"member_id": members[user_id][0], "member_group": group_name, "member_alias": alias})
+
+    if new_members:
+        conn.execute(insert(ProfileMember), new_members)
+        print(f"✅ Добавлено в профиль {HOME_PROFILE_NAME}: {len(new_members)}")
+    if changed_members:
+        conn.execute(
+            update(ProfileMember)
+            .where(ProfileMember.id == bindparam("member_id"))
+            .values(group_name=bindparam("member_group"), alias=bindparam("member_alias")),
+            changed_members
+        )
+        print(f"✅ Обновлены группы профиля {HOME_PROFILE_NAME}: {len(changed_members)}")
+    if new_members or changed_members:
+        bump_membership_version(conn)
+        return True
+    return False
+
+def _seed_exchange_rates(conn: Connection) -> None:
+    """Create default rates if EUR or RUB rate is missing"""
+    existing = set(conn.execute(
+        select(ExchangeRate.from_currency).where(
+            ExchangeRate.to_currency == Currency.SEK,
+            ExchangeRate.from_currency.in_([rate["from_currency"] for rate in DEFAULT_EXCHANGE_RATES])
+        ).distinct()
+    ).scalars().all())
+    if len(existing) == len(DEFAULT_EXCHANGE_RATES):
+        return
+
+    print("🔄 Создаем курсы валют...")
+    conn.execute(delete(ExchangeRate))
+    valid_from = datetime.now(timezone.utc)
+    conn.execute(insert(ExchangeRate), [{**rate, "valid_from": valid_from} for rate in DEFAULT_EXCHANGE_RATES])
+    bump_rate_version(conn)
+
+def _seed_duty_tasks(conn: Connection) -> None:
+    """Create default duty tasks if there are none"""
+    if conn.execute(select(func.count(DutyTask.id))).scalar() > 0:
+        return
+
+    # Same keys in every row for executemany
+    base = {"description": None, "is_weekday_only": False, "is_weekend_only": False}
+    conn.execute(insert(DutyTask), [{**base, **task} for task in DutyService.DEFAULT_TASKS])
+
+def ensure_seed_data(engine: Engine) -> bool:
+    """Apply seed data if its checksum changed, return True if seeding ran"""
+    checksum = seed_checksum()
+
+    # Fast path: seed data already applied
+    with engine.connect() as conn:
+        if get_meta(conn, SEED_CHECKSUM_KEY) == checksum:
+            return False
+
+    print("🔄 Применяем начальные данные...")
+    with engine.begin() as conn:
+        _seed_users(conn)
+        if _seed_home_profile(conn):
+            # Ledger rows are per group; the Session joins this transaction. Checkpoint
+            # group totals were summed under the old membership, so scan the full history
+            from services.group_balance import GroupBalanceService
+            membership_registry.invalidate()
+            with Session(bind=conn) as session:
+                GroupBalanceService.rebuild_ledger(session, use_checkpoint=False)
+        _seed_exchange_rates(conn)
+        _seed_duty_tasks(conn)
+        set_meta(conn, SEED_CHECKSUM_KEY, checksum)
+    print("🎉 Начальные данные применены!")
+    return True
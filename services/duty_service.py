@@ -17,50 +17,51 @@ class DutyService:
     SAME_TASK_COOLDOWN_DAYS = 2  # нельзя давать ту же задачу этому человеку в последние 2 дня
     ALLOW_OVER_ASSIGN_WEEKDAYS = False  # по будням строго не более 1 задачи на человека
     
+    # Default duty tasks (seed data)
+    DEFAULT_TASKS = [
+        # Будни
+        {"name": "Приготовить ужин", "description": "Приготовить ужин для всей семьи",
+         "is_weekday_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
+        {"name": "Убрать со стола", "description": "Помыть посуду после ужина, убрать со стола",
+         "is_weekday_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
+        {"name": "Вынос мусора", "description": "Вынести мусор и зарядить новые пакеты",
+         "is_weekday_only": True, "frequency_days": 2, "task_type": DutyTaskType.OTHER},
+        
+        # Выходные - готовка
+        {"name": "Приготовить завтрак", "description": "Приготовить завтрак для всей семьи",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
+        {"name": "Приготовить обед", "description": "Приготовить обед для всей семьи",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
+        {"name": "Приготовить ужин", "description": "Приготовить ужин для всей семьи в выходные",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
+        
+        # Выходные - уборка посуды
+        {"name": "Убрать посуду после завтрака", "description": "Помыть посуду после завтрака",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
+        {"name": "Убрать посуду после обеда", "description": "Помыть посуду после обеда",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
+        {"name": "Убрать посуду после ужина", "description": "Помыть посуду после ужина в выходные",
+         "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
+        
+        # Выходные - домашние дела
+        {"name": "Пропылесосить полы", "description": "Пропылесосить все комнаты",
+         "is_weekend_only": True, "frequency_days": 14, "task_type": DutyTaskType.CLEANING},
+        {"name": "Помыть полы", "description": "Помыть полы во всех комнатах",
+         "is_weekend_only": True, "frequency_days": 14, "task_type": DutyTaskType.CLEANING},
+        {"name": "Убрать туалеты", "description": "Помыть туалеты, раковины, зеркала",
+         "is_weekend_only": True, "frequency_days": 7, "task_type": DutyTaskType.CLEANING},
+        {"name": "Протереть поверхности", "description": "Протереть все поверхности, окна, зеркала",
+         "is_weekend_only": True, "frequency_days": 7, "task_type": DutyTaskType.CLEANING},
+    ]
+    
     @staticmethod
     def initialize_default_tasks(db: Session) -> None:
         """Initialize default duty tasks with proper task types"""
         # Check if tasks already exist
         if db.query(DutyTask).count() > 0:
             return
-            
-        default_tasks = [
-            # Будни
-            {"name": "Приготовить ужин", "description": "Приготовить ужин для всей семьи",
-             "is_weekday_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
-            {"name": "Убрать со стола", "description": "Помыть посуду после ужина, убрать со стола",
-             "is_weekday_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
-            {"name": "Вынос мусора", "description": "Вынести мусор и зарядить новые пакеты",
-             "is_weekday_only": True, "frequency_days": 2, "task_type": DutyTaskType.OTHER},
-            
-            # Выходные - готовка
-            {"name": "Приготовить завтрак", "description": "Приготовить завтрак для всей семьи",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
-            {"name": "Приготовить обед", "description": "Приготовить обед для всей семьи",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
-            {"name": "Приготовить ужин", "description": "Приготовить ужин для всей семьи в выходные",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.COOKING},
-            
-            # Выходные - уборка посуды
-            {"name": "Убрать посуду после завтрака", "description": "Помыть посуду после завтрака",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
-            {"name": "Убрать посуду после обеда", "description": "Помыть посуду после обеда",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
-            {"name": "Убрать посуду после ужина", "description": "Помыть посуду после ужина в выходные",
-             "is_weekend_only": True, "frequency_days": 1, "task_type": DutyTaskType.CLEANING},
-            
-            # Выходные - домашние дела
-            {"name": "Пропылесосить полы", "description": "Пропылесосить все комнаты",
-             "is_weekend_only": True, "frequency_days": 14, "task_type": DutyTaskType.CLEANING},
-            {"name": "Помыть полы", "description": "Помыть полы во всех комнатах",
-             "is_weekend_only": True, "frequency_days": 14, "task_type": DutyTaskType.CLEANING},
-            {"name": "Убрать туалеты", "description": "Помыть туалеты, раковины, зеркала",
-             "is_weekend_only": True, "frequency_days": 7, "task_type": DutyTaskType.CLEANING},
-            {"name": "Протереть поверхности", "description": "Протереть все поверхности, окна, зеркала",
-             "is_weekend_only": True, "frequency_days": 7, "task_type": DutyTaskType.CLEANING},
-        ]
-        
-        for task_data in default_tasks:
+        
+        for task_data in DutyService.DEFAULT_TASKS:
             task = DutyTask(**task_data)
             db.add(task)
         
@@ -0,0 +1,297 @@
+"""
+Streaming expense import from CSV / JSONL exports
+
+Rows are read one at a time from a text stream, validated in chunks and written with
+ExpenseService.create_expenses, so memory use depends on the chunk size, not the file size.
+Bot imports run as an ExpenseImport batch: every chunk is committed on its own (no lock is
+held across Telegram round-trips) and a failed or cancelled import is undone by import_id.
+
+Columns (CSV header or JSONL keys):
+    amount       - required, "12,50" or 12.5
+    payer        - required, profile member alias (ProfileMember.alias), first name,
+                   username or telegram ID
+    currency     - SEK (default), EUR, RUB
+    category     - продукты / алкоголь / другое (default), or FOOD / ALCOHOL / OTHER
+    description  - required for "другое"
+    date         - 2025-09-14, 2025-09-14 18:30 or 14.09.2025 (default: now)
+    split        - empty: by category, "семьи": the other family, or participant names
+                   separated by commas
+    note         - optional
+"""
+import os
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+from models import Currency, Expense, ExpenseAllocation, ExpenseCategory, ExpenseImport
+from services.expense_service import ExpenseService
+from services.membership import GROUPS, MembershipIndex, membership_registry
+from utils.money import parse_minor
+
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '500'))  # rows validated and inserted together
+IMPORT_MAX_REPORTED_ERRORS = 10
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+CATEGORY_ALIASES = {
+    alias: category
+    for category in ExpenseCategory
+    for alias in (category.name.lower(), category.value.lower())
+}
+
+FAMILY_SPLIT_ALIASES = {"семьи", "семья", "families", "split_families"}
+
+DATE_FORMATS = ("%d.%m.%Y %H:%M", "%d.%m.%Y")
+
+class ImportRowError(ValueError):
+    """Row can't be imported (message is shown to the user)"""
+
+@dataclass
+class ImportProgress:
+    """Counters of a running import (only the first errors are kept)"""
+    rows: int = 0
+    imported: int = 0
+    error_count: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+def detect_format(file_name: Optional[str]) -> Optional[str]:
+    """File format by extension ("csv" or "jsonl"), None if unsupported"""
+    _, extension = os.path.splitext((file_name or "").lower())
+    return FORMATS.get(extension)
+
+def iter_csv_rows(stream: TextIO) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(line number, row) pairs of a CSV file with a header (, ; or tab separated)"""
+    header = stream.readline()
+    if not header:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(chain([header], stream), dialect=dialect)
+    reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        if any(value and value.strip() for key, value in row.items() if key is not None):
+            yield reader.line_num, row
+
+def iter_jsonl_rows(stream: TextIO) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(line number, object) pairs of a JSONL file (None for lines that aren't JSON objects)"""
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        if isinstance(row, dict):
+            row = {str(key).strip().lower(): value for key, value in row.items()}
+        else:
+            row = None
+        yield line_no, row
+
+def iter_rows(stream: TextIO, file_format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """Row generator for a file format"""
+    if file_format == "csv":
+        return iter_csv_rows(stream)
+    return iter_jsonl_rows(stream)
+
+def _text(row: dict, key: str) -> str:
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+def parse_date(value: str) -> datetime:
+    """Parse an export date to naive UTC"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for date_format in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, date_format)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ImportRowError(f"неверная дата: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+class ExpenseImporter:
+    """Import of one export file: reads, validates and writes it chunk by chunk"""
+
+    def __init__(self, stream: TextIO, file_format: str, import_id: Optional[int] = None):
+        self.rows = iter_rows(stream, file_format)
+        self.import_id = import_id  # ExpenseImport batch of the written expenses
+        self.progress = ImportProgress()
+        self._users: Optional[Dict[str, Tuple[int, int]]] = None
+        self._membership: Optional[MembershipIndex] = None
+        self._profile_id: Optional[int] = None
+
+    def _load_users(self, db: Session) -> None:
+        """Alias / name / username / telegram ID -> (user ID, telegram ID), resolved once per import"""
+        self._membership = membership_registry.get(db)
+        self._users = {
+            name: (self._membership.user_ids[telegram_id], telegram_id)
+            for name, telegram_id in self._membership.names.items()
+        }
+        self._profile_id = ExpenseService.get_or_create_home_profile(db).id
+
+    def _user(self, name: str) -> Tuple[int, int]:
+        user = self._users.get(name.strip().lower().lstrip("@"))
+        if user is None:
+            raise ImportRowError(f"неизвестный участник: {name}")
+        return user
+
+    def parse_row(self, db: Session, row: Optional[dict]) -> dict:
+        """Validate a row and build a create_expenses spec"""
+        if row is None:
+            raise ImportRowError("строка не является JSON-объектом")
+
+        amount = parse_minor(_text(row, "amount"))
+        if amount is None or amount <= 0:
+            raise ImportRowError(f"неверная сумма: {_text(row, 'amount') or '—'}")
+
+        currency_str = _text(row, "currency").upper() or Currency.SEK.value
+        try:
+            currency = Currency(currency_str)
+        except ValueError:
+            raise ImportRowError(f"неподдерживаемая валюта: {currency_str}")
+
+        category_str = _text(row, "category").lower()
+        category = CATEGORY_ALIASES.get(category_str) if category_str else ExpenseCategory.OTHER
+        if category is None:
+            raise ImportRowError(f"неверная категория: {category_str}")
+        description = _text(row, "description") or None
+        if category == ExpenseCategory.OTHER and not description:
+            raise ImportRowError("для категории 'другое' нужно описание")
+
+        payer_str = _text(row, "payer")
+        if not payer_str:
+            raise ImportRowError("не указан плательщик")
+        payer_id, payer_telegram_id = self._user(payer_str)
+
+        spec = {
+            "amount": amount,
+            "currency": currency,
+            "category": category,
+            "payer_id": payer_id,
+            "profile_id": self._profile_id,
+            "custom_category_name": description if category == ExpenseCategory.OTHER else None,
+            "note": _text(row, "note") or None,
+            "import_id": self.import_id,
+        }
+
+        date_str = _text(row, "date")
+        if date_str:
+            created_at = parse_date(date_str)
+            if created_at > datetime.utcnow():
+                raise ImportRowError(f"дата в будущем: {date_str}")
+            try:
+                ExpenseService.get_exchange_rate_at(db, currency, Currency.SEK, created_at)
+            except ValueError:
+                raise ImportRowError(f"нет курса {currency.value} на {created_at.strftime('%d.%m.%Y')}")
+            spec["created_at"] = created_at
+        else:
+            try:
+                ExpenseService.get_current_exchange_rate(db, currency, Currency.SEK)
+            except ValueError:
+                raise ImportRowError(f"нет курса {currency.value}, установите его через /set_rate")
+
+        split = row.get("split")
+        names = split if isinstance(split, list) else [name for name in _text(row, "split").split(",") if name.strip()]
+        if len(names) == 1 and str(names[0]).strip().lower() in FAMILY_SPLIT_ALIASES:
+            spec["split_type"] = "split_families"
+        elif names:
+            participants = {self._user(str(name))[1] for name in names}
+            if len(participants) < 2:
+                raise ImportRowError("нужно минимум 2 участника")
+            if len(self._membership.selected_groups(participants)) < len(GROUPS):
+                raise ImportRowError("участники должны быть из разных групп")
+            spec["split_type"] = "participants"
+            spec["selected_participants"] = participants
+        return spec
+
+    def begin(self, db: Session, file_name: Optional[str] = None, telegram_id: Optional[int] = None) -> int:
+        """DB work unit: register the ExpenseImport batch, return its ID"""
+        batch = ExpenseImport(
+            file_name=file_name,
+            created_by_id=membership_registry.get(db).user_ids.get(telegram_id),
+            status="running"
+        )
+        db.add(batch)
+        db.commit()
+        self.import_id = batch.id
+        return batch.id
+
+    def finish(self, db: Session) -> None:
+        """DB work unit: mark the batch as done"""
+        db.execute(update(ExpenseImport).where(ExpenseImport.id == self.import_id).values(status="done"))
+        db.commit()
+
+    @staticmethod
+    def undo(db: Session, import_id: int) -> int:
+        """Delete every expense of an import batch and fix derived state, return the number deleted"""
+        from services.expense_rollup import ExpenseRollupService
+        from services.group_balance import GroupBalanceService
+        from services.month_close import MonthCloseService
+        from services.settlement import SettlementService
+
+        batch = Expense.import_id == import_id
+        first_expense_ids = db.execute(
+            select(Expense.profile_id, func.min(Expense.id)).where(batch).group_by(Expense.profile_id)
+        ).all()
+        months = db.execute(select(Expense.month).where(batch).distinct()).scalars().all()
+
+        db.execute(
+            delete(ExpenseAllocation).where(ExpenseAllocation.expense_id.in_(select(Expense.id).where(batch)))
+            .execution_options(synchronize_session=False)
+        )
+        count = db.execute(delete(Expense).where(batch).execution_options(synchronize_session=False)).rowcount
+        db.execute(update(ExpenseImport).where(ExpenseImport.id == import_id).values(status="undone"))
+
+        # Derived state, as after re-splitting
+        for profile_id, first_expense_id in first_expense_ids:
+            SettlementService.invalidate_after(db, profile_id, first_expense_id)
+            GroupBalanceService.rebuild_profile_ledger(db, profile_id)
+        for month in months:
+            MonthCloseService.refresh_month(db, month)
+        ExpenseRollupService.rebuild(db, months)
+
+        db.commit()
+        return count
+
+    def import_next_chunk(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE) -> int:
+        """DB work unit: validate and write the next chunk, return rows read (0 at the end of file)"""
+        chunk = list(islice(self.rows, chunk_size))
+        if not chunk:
+            return 0
+        if self._users is None:
+            self._load_users(db)
+
+        specs = []
+        for line_no, row in chunk:
+            try:
+                specs.append(self.parse_row(db, row))
+            except ImportRowError as e:
+                self.progress.add_error(line_no, str(e))
+        if specs:
+            ExpenseService.create_expenses(db, specs)
+
+        self.progress.rows += len(chunk)
+        self.progress.imported += len(specs)
+        return len(chunk)
+
+    def run(self, db: Session, chunk_size: int = IMPORT_CHUNK_SIZE) -> ImportProgress:
+        """Import the whole stream (scripts and benchmarks)"""
+        while self.import_next_chunk(db, chunk_size):
+            pass
+        return self.progress
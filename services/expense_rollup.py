@@ -0,0 +1,188 @@
+"""
+Category x month expense rollup
+
+ExpenseRollup keeps sum and count of amount_sek per (profile, month, category, custom
+category name, payer), maintained in the same transaction as the expenses: creates and
+deletes apply deltas (one INSERT ... ON CONFLICT DO UPDATE per expense or batch),
+set-based changes of amount_sek (re-pricing) rebuild the affected months.
+Category reports and /trends read only the rollup, so they cost O(months x categories), not O(expenses).
+"""
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from db import dialect_insert
+from models import Expense, ExpenseCategory, ExpenseRollup
+
+# Columns of uq_expense_rollup_key
+ROLLUP_KEY = ("profile_id", "month", "category", "custom_category_name", "payer_id")
+
+# (profile_id, month, category, custom_category_name, payer_id, amount_sek)
+RollupRow = Tuple[int, date, ExpenseCategory, Optional[str], int, int]
+
+def _month_shift(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+class ExpenseRollupService:
+    """Service for the category x month expense rollup"""
+
+    @classmethod
+    def apply_expense(cls, db: Session, expense: Expense, sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) an expense, in the caller's transaction"""
+        cls.apply_rows(db, [(
+            expense.profile_id, expense.month, expense.category,
+            expense.custom_category_name, expense.payer_id, expense.amount_sek
+        )], sign)
+
+    @classmethod
+    def apply_rows(cls, db: Session, rows: Iterable[RollupRow], sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) many expenses, summed per rollup key first"""
+        deltas: Dict[tuple, List[int]] = {}
+        for profile_id, month, category, custom_name, payer_id, amount_sek in rows:
+            total = deltas.setdefault((profile_id, month, category, custom_name or "", payer_id), [0, 0])
+            total[0] += sign * amount_sek
+            total[1] += sign
+        if not deltas:
+            return
+
+        table = ExpenseRollup.__table__
+        statement = dialect_insert(db)(table)
+        # One upsert per batch: concurrent writers of a new key can't both INSERT it
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=list(ROLLUP_KEY),
+                set_={
+                    "total_sek": table.c.total_sek + statement.excluded.total_sek,
+                    "count": table.c.count + statement.excluded.count,
+                }
+            ),
+            [
+                {**dict(zip(ROLLUP_KEY, key)), "total_sek": total, "count": count}
+                for key, (total, count) in deltas.items()
+            ]
+        )
+        if sign < 0:
+            # Keys without expenses left (superset of the batch keys, only empty rows match)
+            db.execute(delete(table).where(
+                table.c.profile_id.in_({key[0] for key in deltas}),
+                table.c.month.in_({key[1] for key in deltas}),
+                table.c.custom_category_name.in_({key[3] for key in deltas}),
+                table.c.payer_id.in_({key[4] for key in deltas}),
+                table.c.count <= 0
+            ))
+
+    @classmethod
+    def rebuild(cls, db: Session, months: Optional[Iterable[date]] = None) -> int:
+        """Recompute the rollup (of some months) from expense history (caller commits), return row count"""
+        table = ExpenseRollup.__table__
+        custom_name = func.coalesce(Expense.custom_category_name, "")
+        history = select(
+            Expense.profile_id, Expense.month, Expense.category, custom_name, Expense.payer_id,
+            func.sum(Expense.amount_sek), func.count(Expense.id)
+        ).group_by(Expense.profile_id, Expense.month, Expense.category, custom_name, Expense.payer_id)
+
+        clear = delete(table)
+        if months is not None:
+            months = list(months)
+            if not months:
+                return 0
+            history = history.where(Expense.month.in_(months))
+            clear = clear.where(table.c.month.in_(months))
+
+        db.execute(clear)
+        result = db.execute(insert(table).from_select(
+            ["profile_id", "month", "category", "custom_category_name", "payer_id", "total_sek", "count"],
+            history
+        ))
+        return result.rowcount
+
+    @classmethod
+    def verify(cls, db: Session) -> List[Dict]:
+        """Compare the rollup with a full history scan, return mismatching keys"""
+        custom_name = func.coalesce(Expense.custom_category_name, "")
+        history = {
+            key[:5]: key[5:]
+            for key in db.execute(
+                select(
+                    Expense.profile_id, Expense.month, Expense.category, custom_name, Expense.payer_id,
+                    func.sum(Expense.amount_sek), func.count(Expense.id)
+                ).group_by(Expense.profile_id, Expense.month, Expense.category, custom_name, Expense.payer_id)
+            )
+        }
+        stored = {
+            key[:5]: key[5:]
+            for key in db.execute(
+                select(
+                    ExpenseRollup.profile_id, ExpenseRollup.month, ExpenseRollup.category,
+                    ExpenseRollup.custom_category_name, ExpenseRollup.payer_id,
+                    ExpenseRollup.total_sek, ExpenseRollup.count
+                )
+            )
+        }
+        return [
+            {"key": key, "rollup": tuple(stored.get(key, (0, 0))), "history": tuple(history.get(key, (0, 0)))}
+            for key in sorted(set(history) | set(stored), key=str)
+            if tuple(stored.get(key, (0, 0))) != tuple(history.get(key, (0, 0)))
+        ]
+
+    @classmethod
+    def get_category_totals(cls, db: Session, month: date, profile_id: Optional[int] = None) -> dict:
+        """{category value: {'total_sek', 'count'}} of a month, OTHER with per-name 'individual_expenses'"""
+        query = db.query(
+            ExpenseRollup.category, ExpenseRollup.custom_category_name,
+            func.sum(ExpenseRollup.total_sek), func.sum(ExpenseRollup.count)
+        ).filter(ExpenseRollup.month == month)
+        if profile_id is not None:
+            query = query.filter(ExpenseRollup.profile_id == profile_id)
+        rows = query.group_by(ExpenseRollup.category, ExpenseRollup.custom_category_name).order_by(
+            ExpenseRollup.category, ExpenseRollup.custom_category_name
+        ).all()
+
+        result = {}
+        for category, custom_name, total_sek, count in rows:
+            totals = result.setdefault(category.value, {'total_sek': 0, 'count': 0})
+            totals['total_sek'] += total_sek
+            totals['count'] += count
+            if category == ExpenseCategory.OTHER and custom_name:
+                totals.setdefault('individual_expenses', []).append({'name': custom_name, 'amount_sek': total_sek})
+        return result
+
+    @classmethod
+    def get_trends(cls, db: Session, end_month: date, months: int = 6, profile_id: Optional[int] = None) -> Dict:
+        """Category totals of the last `months` months up to end_month, with month-over-month deltas
+
+        {'months': [date], 'totals': [int], 'categories': {category value: {'totals': [int],
+        'counts': [int], 'deltas': [int or None], 'average': int}}} - deltas[i] compares month i
+        with month i - 1 (None for the first month).
+        """
+        month_list = [_month_shift(end_month, offset) for offset in range(1 - months, 1)]
+        positions = {month: index for index, month in enumerate(month_list)}
+
+        query = db.query(
+            ExpenseRollup.month, ExpenseRollup.category,
+            func.sum(ExpenseRollup.total_sek), func.sum(ExpenseRollup.count)
+        ).filter(ExpenseRollup.month >= month_list[0], ExpenseRollup.month <= end_month)
+        if profile_id is not None:
+            query = query.filter(ExpenseRollup.profile_id == profile_id)
+        rows = query.group_by(ExpenseRollup.month, ExpenseRollup.category).all()
+
+        categories = {}
+        totals = [0] * months
+        for month, category, total_sek, count in rows:
+            index = positions[month]
+            values = categories.setdefault(category, {'totals': [0] * months, 'counts': [0] * months})
+            values['totals'][index] = total_sek
+            values['counts'][index] = count
+            totals[index] += total_sek
+
+        result = {}
+        for category in ExpenseCategory:
+            values = categories.get(category)
+            if values is None:
+                continue
+            series = values['totals']
+            values['deltas'] = [None] + [current - previous for previous, current in zip(series, series[1:])]
+            values['average'] = round(sum(series) / months)
+            result[category.value] = values
+        return {'months': month_list, 'totals': totals, 'categories': result}
@@ -3,14 +3,23 @@ Expense management service
 """
 from typing import List, Optional, Set
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import insert, select, delete
 from models import (
     Expense, ExpenseAllocation, ExchangeRate, Currency, 
     ExpenseCategory, User, Profile
 )
 from services.split import SplitService
+from services.group_balance import GroupBalanceService
+from services.expense_rollup import ExpenseRollupService
+from services.split_engine import split_engine_cache
+from utils.db_session import after_commit
+from utils.rate_cache import exchange_rate_cache, bump_rate_version
+from utils.money import convert_minor, round_allocations
 from datetime import datetime, date
 
+# Expenses per SELECT / DELETE when re-splitting (keeps IN lists under parameter limits)
+RESPLIT_CHUNK_SIZE = 5000
+
 class ExpenseService:
     """Service for managing expenses"""
     
@@ -24,6 +33,10 @@ class ExpenseService:
         if from_currency == to_currency:
             return 1.0
         
+        cached = exchange_rate_cache.get(db, from_currency, to_currency)
+        if cached is not None:
+            return cached
+        
         # Get the most recent valid rate
         rate = db.query(ExchangeRate).filter(
             ExchangeRate.from_currency == from_currency,
@@ -34,12 +47,72 @@ class ExpenseService:
         if not rate:
             raise ValueError(f"No exchange rate found for {from_currency.value} to {to_currency.value}")
         
+        exchange_rate_cache.put(from_currency, to_currency, rate.rate, rate.valid_until)
         return rate.rate
     
+    @staticmethod
+    def get_exchange_rate_at(
+        db: Session,
+        from_currency: Currency,
+        to_currency: Currency,
+        at: datetime
+    ) -> float:
+        """Get exchange rate that was valid at a timestamp (for back-dated expenses and re-pricing)"""
+        if from_currency == to_currency:
+            return 1.0
+        
+        rate = exchange_rate_cache.get_rate_at(db, from_currency, to_currency, at)
+        if rate is None:
+            raise ValueError(
+                f"No exchange rate found for {from_currency.value} to {to_currency.value} "
+                f"at {at.strftime('%Y-%m-%d %H:%M')}"
+            )
+        return rate
+    
+    @staticmethod
+    def set_exchange_rate(db: Session, currency: Currency, rate: float) -> ExchangeRate:
+        """Close current rate for currency and start a new one (to SEK)"""
+        now = datetime.utcnow()
+        
+        # Invalidate previous rates
+        db.query(ExchangeRate).filter(
+            ExchangeRate.from_currency == currency,
+            ExchangeRate.to_currency == Currency.SEK,
+            ExchangeRate.valid_until.is_(None)
+        ).update({"valid_until": now})
+        
+        # Create new rate
+        new_rate = ExchangeRate(
+            from_currency=currency,
+            to_currency=Currency.SEK,
+            rate=rate,
+            valid_from=now
+        )
+        
+        db.add(new_rate)
+        
+        # Other workers drop their cached rates on the next version check, this one after the commit
+        bump_rate_version(db.connection())
+        after_commit(db, exchange_rate_cache.invalidate)
+        db.commit()
+        db.refresh(new_rate)
+        return new_rate
+    
+    @staticmethod
+    def get_or_create_home_profile(db: Session) -> Profile:
+        """Get default profile (Home) or create one if doesn't exist"""
+        profile = db.query(Profile).filter(Profile.name == "Home").first()
+        if not profile:
+            profile = Profile(name="Home", is_default=True)
+            db.add(profile)
+            db.commit()
+            db.refresh(profile)
+        return profile
+    
     @staticmethod
     def create_expense(
         db: Session,
-        amount: float,
+        amount: int,
         currency: Currency,
         category: ExpenseCategory,
         payer_id: int,
@@ -48,17 +121,25 @@ class ExpenseService:
         allocations: Optional[dict] = None,
         custom_category_name: Optional[str] = None,
         split_type: str = None,
-        selected_participants: Set[int] = None
+        selected_participants: Set[int] = None,
+        created_at: Optional[datetime] = None
     ) -> Expense:
-        """Create a new expense with automatic allocation"""
+        """Create a new expense with automatic allocation (created_at back-dates it)
+        
+        amount and allocations are in minor units of currency; shares are rounded so
+        they add up exactly in öre.
+        """
         
-        # Get current exchange rate to SEK
+        # Get exchange rate to SEK (current, or valid at created_at for back-dated expenses)
         if currency == Currency.SEK:
             exchange_rate = 1.0
             amount_sek = amount
+        elif created_at is not None:
+            exchange_rate = ExpenseService.get_exchange_rate_at(db, currency, Currency.SEK, created_at)
+            amount_sek = convert_minor(amount, exchange_rate)
         else:
             exchange_rate = ExpenseService.get_current_exchange_rate(db, currency, Currency.SEK)
-            amount_sek = amount * exchange_rate
+            amount_sek = convert_minor(amount, exchange_rate)
         
         # Create expense
         expense = Expense(
@@ -71,86 +152,213 @@ class ExpenseService:
             note=note,
             payer_id=payer_id,
             profile_id=profile_id,
-            month=datetime.now().replace(day=1).date()
+            month=(created_at or datetime.now()).replace(day=1).date(),
+            created_at=created_at or datetime.utcnow()
         )
         
         db.add(expense)
         db.flush()  # Get the ID
         
-        # Use provided allocations or calculate using special category rules
+        # Use provided allocations (currency units) or the compiled split rule
         if allocations:
-            # Use special splitting logic
-            for user_id, share_amount in allocations.items():
-                # Convert share_amount to SEK if needed
-                if currency == Currency.SEK:
-                    share_amount_sek = share_amount
-                else:
-                    share_amount_sek = share_amount * exchange_rate
-                
-                allocation = ExpenseAllocation(
-                    expense_id=expense.id,
-                    user_id=user_id,
-                    amount_sek=share_amount_sek,
-                    weight_used=1.0
-                )
-                db.add(allocation)
-        elif split_type == "split_families":
-            # Use family split logic
-            from services.flexible_split import FlexibleSplitService
-            # Get payer's telegram_id
-            payer_user = db.query(User).filter(User.id == payer_id).first()
-            if payer_user:
-                family_allocations = FlexibleSplitService.calculate_family_split(
-                    db, amount_sek, payer_user.telegram_id
-                )
-            else:
-                family_allocations = {}
+            shares = round_allocations({
+                user_id: share_amount * exchange_rate for user_id, share_amount in allocations.items()
+            })
+        else:
+            rule = split_engine_cache.get(db).rule_for(category, payer_id, split_type, selected_participants)
+            shares = rule.allocate(amount_sek)
+        
+        expense_allocations = []
+        for user_id, share_amount in shares.items():
+            allocation = ExpenseAllocation(
+                expense_id=expense.id,
+                user_id=user_id,
+                amount_sek=share_amount,
+                weight_used=1.0
+            )
+            db.add(allocation)
+            expense_allocations.append(allocation)
+        
+        # Running group balances and the category rollup change in the same transaction
+        GroupBalanceService.apply_expense(db, expense, expense_allocations)
+        ExpenseRollupService.apply_expense(db, expense)
+        
+        # A back-dated expense may land in an already closed month
+        if created_at is not None:
+            from services.month_close import MonthCloseService
+            MonthCloseService.refresh_month(db, expense.month)
+        
+        db.commit()
+        return expense
+    
+    @staticmethod
+    def create_expenses(db: Session, specs: List[dict]) -> List[int]:
+        """Create many expenses in one transaction, return their IDs in spec order
+        
+        Each spec has the keyword arguments of create_expense (amount, currency, category,
+        payer_id, profile_id, and optionally note, allocations, custom_category_name,
+        split_type, selected_participants, created_at) plus an optional import_id. Rates are
+        resolved once per currency, split rules come compiled from the split engine, expenses
+        and allocations are written with executemany inserts.
+        """
+        from services.month_close import MonthCloseService
+        
+        if not specs:
+            return []
+        
+        now = datetime.utcnow()
+        local_now = datetime.now()
+        current_rates = {Currency.SEK: 1.0}
+        engine = split_engine_cache.get(db)
+        
+        expense_rows = []
+        expense_shares = []
+        for spec in specs:
+            currency = spec["currency"]
+            amount = spec["amount"]
+            created_at = spec.get("created_at")
             
-            for user_id, share_amount in family_allocations.items():
-                allocation = ExpenseAllocation(
-                    expense_id=expense.id,
-                    user_id=user_id,
-                    amount_sek=share_amount,
-                    weight_used=1.0
-                )
-                db.add(allocation)
-        elif split_type == "participants" and selected_participants:
-            # Use participant selection logic
-            from services.flexible_split import FlexibleSplitService
-            # Get payer's telegram_id
-            payer_user = db.query(User).filter(User.id == payer_id).first()
-            if payer_user:
-                participant_allocations = FlexibleSplitService.calculate_participant_split(
-                    db, amount_sek, selected_participants, payer_user.telegram_id
-                )
+            if created_at is not None:
+                exchange_rate = ExpenseService.get_exchange_rate_at(db, currency, Currency.SEK, created_at)
             else:
-                participant_allocations = {}
+                if currency not in current_rates:
+                    current_rates[currency] = ExpenseService.get_current_exchange_rate(db, currency, Currency.SEK)
+                exchange_rate = current_rates[currency]
+            amount_sek = convert_minor(amount, exchange_rate)
             
-            for user_id, share_amount in participant_allocations.items():
-                allocation = ExpenseAllocation(
-                    expense_id=expense.id,
-                    user_id=user_id,
-                    amount_sek=share_amount,
-                    weight_used=1.0
+            if spec.get("allocations"):
+                shares = round_allocations({
+                    user_id: share * exchange_rate for user_id, share in spec["allocations"].items()
+                })
+            else:
+                rule = engine.rule_for(
+                    spec["category"], spec["payer_id"], spec.get("split_type"), spec.get("selected_participants")
                 )
-                db.add(allocation)
-        else:
-            # Use special category-based splitting
-            from services.special_split import calculate_special_split
-            category_allocations = calculate_special_split(db, amount_sek, category, profile_id)
+                shares = rule.allocate(amount_sek)
             
-            # Save allocations
-            for user_id, share_amount in category_allocations.items():
-                allocation = ExpenseAllocation(
-                    expense_id=expense.id,
-                    user_id=user_id,
-                    amount_sek=share_amount,
-                    weight_used=1.0
-                )
-                db.add(allocation)
+            expense_rows.append({
+                "amount": amount,
+                "currency": currency,
+                "exchange_rate": exchange_rate,
+                "amount_sek": amount_sek,
+                "category": spec["category"],
+                "custom_category_name": spec.get("custom_category_name"),
+                "note": spec.get("note"),
+                "payer_id": spec["payer_id"],
+                "profile_id": spec["profile_id"],
+                "month": (created_at or local_now).replace(day=1).date(),
+                "created_at": created_at or now,
+                "import_id": spec.get("import_id"),
+            })
+            expense_shares.append(shares)
+        
+        expense_ids = ExpenseService._insert_expense_rows(db, expense_rows)
+        
+        allocation_rows = [
+            {"expense_id": expense_id, "user_id": user_id, "amount_sek": share, "weight_used": 1.0}
+            for expense_id, shares in zip(expense_ids, expense_shares)
+            for user_id, share in shares.items()
+        ]
+        if allocation_rows:
+            db.execute(insert(ExpenseAllocation), allocation_rows)
+        
+        # Running group balances: one UPDATE per profile and group
+        GroupBalanceService.apply_expense_batch(db, [
+            (row["profile_id"], row["payer_id"], row["amount_sek"], shares)
+            for row, shares in zip(expense_rows, expense_shares)
+        ])
+        ExpenseRollupService.apply_rows(db, (
+            (row["profile_id"], row["month"], row["category"], row["custom_category_name"],
+             row["payer_id"], row["amount_sek"])
+            for row in expense_rows
+        ))
+        
+        # Back-dated expenses may land in already closed months
+        for month in {row["month"] for row, spec in zip(expense_rows, specs) if spec.get("created_at")}:
+            MonthCloseService.refresh_month(db, month)
         
         db.commit()
-        return expense
+        return expense_ids
+    
+    @staticmethod
+    def _insert_expense_rows(db: Session, rows: List[dict]) -> List[int]:
+        """executemany INSERT of expense rows, IDs come back via RETURNING where the dialect supports it"""
+        # Core table insert: ORM bulk insert drops None values, so rows with and without
+        # a note would end up in different (small) executemany batches
+        table = Expense.__table__
+        dialect = db.get_bind().dialect
+        if dialect.name == "sqlite" and dialect.insert_executemany_returning:
+            # SQLAlchemy runs ordered RETURNING row by row on SQLite; a multi-row INSERT
+            # takes rowids in VALUES order under the write lock, so sorted IDs match the rows
+            return sorted(db.execute(insert(table).returning(table.c.id), rows).scalars())
+        if getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+            return list(db.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars())
+        
+        # No RETURNING for executemany: one INSERT per expense
+        return [db.execute(insert(table).values(**row)).inserted_primary_key[0] for row in rows]
+    
+    @staticmethod
+    def resplit_expenses(
+        db: Session,
+        expense_ids: List[int],
+        split_type: str = None,
+        selected_participants: Set[int] = None
+    ) -> int:
+        """Re-split existing expenses with the current split rules in one transaction
+        
+        Without split_type every expense gets its category rule. Allocations are replaced
+        with executemany inserts; group ledger, settle-up checkpoints and closed months are
+        brought up to date. Returns the number of re-split expenses.
+        """
+        from services.month_close import MonthCloseService
+        from services.settlement import SettlementService
+        
+        engine = split_engine_cache.get(db)
+        first_expense_ids = {}
+        months = set()
+        count = 0
+        
+        for start in range(0, len(expense_ids), RESPLIT_CHUNK_SIZE):
+            chunk = expense_ids[start:start + RESPLIT_CHUNK_SIZE]
+            rows = db.execute(
+                select(Expense.id, Expense.category, Expense.payer_id, Expense.profile_id,
+                       Expense.amount_sek, Expense.month).where(Expense.id.in_(chunk))
+            ).all()
+            if not rows:
+                continue
+            
+            shares = engine.allocate_batch(
+                (engine.rule_for(category, payer_id, split_type, selected_participants), amount_sek)
+                for _, category, payer_id, _, amount_sek, _ in rows
+            )
+            db.execute(
+                delete(ExpenseAllocation).where(ExpenseAllocation.expense_id.in_([row.id for row in rows]))
+                .execution_options(synchronize_session=False)
+            )
+            allocation_rows = [
+                {"expense_id": row.id, "user_id": user_id, "amount_sek": share, "weight_used": 1.0}
+                for row, expense_shares in zip(rows, shares)
+                for user_id, share in expense_shares.items()
+            ]
+            if allocation_rows:
+                db.execute(insert(ExpenseAllocation), allocation_rows)
+            
+            for row in rows:
+                first_expense_ids[row.profile_id] = min(first_expense_ids.get(row.profile_id, row.id), row.id)
+                months.add(row.month)
+            count += len(rows)
+        
+        # Derived balance state
+        for profile_id, first_expense_id in first_expense_ids.items():
+            SettlementService.invalidate_after(db, profile_id, first_expense_id)
+            GroupBalanceService.rebuild_profile_ledger(db, profile_id)
+        for month in months:
+            MonthCloseService.refresh_month(db, month)
+        
+        db.commit()
+        return count
     
     @staticmethod
     def get_monthly_expenses(
@@ -168,47 +376,14 @@ class ExpenseService:
         db: Session, 
         month: Optional[date] = None
     ) -> dict:
-        """Get expenses grouped by category for a month"""
+        """Get expenses grouped by category for a month (from the category rollup)
+        
+        OTHER lists 'individual_expenses' per custom name, amounts of one name summed.
+        """
         if month is None:
             month = datetime.now().replace(day=1).date()
         
-        # Query expenses with category totals
-        category_totals = db.query(
-            Expense.category,
-            func.sum(Expense.amount_sek).label('total_sek'),
-            func.count(Expense.id).label('count')
-        ).filter(
-            Expense.month == month
-        ).group_by(Expense.category).all()
-        
-        result = {}
-        for category, total_sek, count in category_totals:
-            result[category.value] = {
-                'total_sek': float(total_sek),
-                'count': count
-            }
-            
-            # For "OTHER" category, get individual expenses with custom names
-            if category == ExpenseCategory.OTHER:
-                individual_expenses = db.query(
-                    Expense.custom_category_name,
-                    Expense.amount_sek
-                ).filter(
-                    Expense.category == ExpenseCategory.OTHER,
-                    Expense.month == month,
-                    Expense.custom_category_name.isnot(None)
-                ).all()
-                
-                if individual_expenses:
-                    result[category.value]['individual_expenses'] = [
-                        {
-                            'name': expense.custom_category_name,
-                            'amount_sek': float(expense.amount_sek)
-                        }
-                        for expense in individual_expenses
-                    ]
-        
-        return result
+        return ExpenseRollupService.get_category_totals(db, month)
     
     @staticmethod
     def get_user_expenses(
@@ -247,11 +422,24 @@ class ExpenseService:
         if not expense:
             return False
         
+        allocations = db.query(ExpenseAllocation).filter(ExpenseAllocation.expense_id == expense_id).all()
+        GroupBalanceService.apply_expense(db, expense, allocations, sign=-1)
+        ExpenseRollupService.apply_expense(db, expense, sign=-1)
+        
+        # Settle-up checkpoints that include this expense are no longer valid
+        from services.settlement import SettlementService
+        SettlementService.invalidate_after(db, expense.profile_id, expense.id)
+        
         # Delete allocations first (due to foreign key constraints)
         db.query(ExpenseAllocation).filter(ExpenseAllocation.expense_id == expense_id).delete()
         
         # Delete the expense
         db.delete(expense)
+        
+        # Closed month snapshots must not keep the deleted expense
+        from services.month_close import MonthCloseService
+        MonthCloseService.refresh_month(db, expense.month)
+        
         db.commit()
         
         return True
@@ -4,80 +4,51 @@ Group balance calculation service
 Calculates balances between groups of users
 """
 
+from datetime import datetime
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models import User, Expense, ExpenseAllocation, Profile, ProfileMember
-from typing import Dict, List, Tuple
+from db import dialect_insert
+from models import Expense, ExpenseAllocation, Profile, ProfileMember, GroupBalance, Currency
+from services.membership import GROUPS, MembershipIndex, membership_registry
+from utils.texts import format_amount
+from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
 
 class GroupBalanceService:
     """Service for calculating balances between user groups"""
     
-    # Определяем группы пользователей
-    GROUP_1_IDS = [804085588, 916228993]  # Сеня + Даша
-    GROUP_2_IDS = [252901018, 350653235, 6379711500]  # Катя + Дима + Миша
-    
-    @classmethod
-    def get_user_group(cls, user_id: int) -> int:
-        """Get group number for user (1 or 2)"""
-        if user_id in cls.GROUP_1_IDS:
-            return 1
-        elif user_id in cls.GROUP_2_IDS:
-            return 2
-        else:
-            return 0  # Неизвестный пользователь
+    # Группы пользователей - ProfileMember.group_name профиля по умолчанию (services.membership)
+    GROUPS = GROUPS
     
     @classmethod
     def calculate_group_balances(cls, db: Session, profile_id: int = None) -> Dict:
-        """Calculate balances between groups"""
+        """Calculate balances between groups (reads the running ledger)"""
         
-        # Получаем профиль (по умолчанию Home)
+        # Получаем строки баланса профиля (по умолчанию Home) одним запросом
+        query = db.query(GroupBalance.group_number, GroupBalance.spent_sek, GroupBalance.owes_sek)
         if profile_id is None:
-            profile = db.query(Profile).filter(Profile.is_default == True).first()
-            if not profile:
-                return {"error": "Профиль по умолчанию не найден"}
-            profile_id = profile.id
+            query = query.join(Profile, GroupBalance.profile_id == Profile.id).filter(Profile.is_default == True)
+        else:
+            query = query.filter(GroupBalance.profile_id == profile_id)
+        rows = query.all()
         
-        # Получаем все расходы для профиля
-        expenses = db.query(Expense).filter(Expense.profile_id == profile_id).all()
+        if not rows and profile_id is None:
+            if not db.query(Profile).filter(Profile.is_default == True).first():
+                return {"error": "Профиль по умолчанию не найден"}
         
-        # Инициализируем счетчики
-        group_totals = {1: 0.0, 2: 0.0}  # Сколько каждая группа потратила
-        group_shares = {1: 0.0, 2: 0.0}   # Сколько каждая группа должна
-        
-        # Проходим по всем расходам
-        for expense in expenses:
-            # Получаем аллокации для расхода
-            allocations = db.query(ExpenseAllocation).filter(
-                ExpenseAllocation.expense_id == expense.id
-            ).all()
-            
-            if not allocations:
-                continue
-            
-            # Кто внес расход (получаем пользователя по внутреннему ID)
-            payer = db.query(User).filter(User.id == expense.payer_id).first()
-            if not payer:
-                continue
-                
-            payer_group = cls.get_user_group(payer.telegram_id)
-            
-            if payer_group == 0:
-                continue
-            
-            # Добавляем к потраченному группой
-            group_totals[payer_group] += expense.amount_sek
-            
-            # Считаем доли по категории
-            category_shares = cls._calculate_category_shares(db, expense, allocations)
-            
-            # Распределяем доли по группам
-            for user_id, share in category_shares.items():
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    user_group = cls.get_user_group(user.telegram_id)
-                    if user_group > 0:
-                        group_shares[user_group] += share
+        group_totals = {group: 0 for group in cls.GROUPS}  # Сколько каждая группа потратила
+        group_shares = {group: 0 for group in cls.GROUPS}  # Сколько каждая группа должна
+        for group, spent, owes in rows:
+            if group in group_totals:
+                group_totals[group] += spent
+                group_shares[group] += owes
         
+        return cls._build_result(group_totals, group_shares, membership_registry.get(db))
+    
+    @classmethod
+    def _build_result(cls, group_totals: Dict[int, int], group_shares: Dict[int, int],
+                      membership: MembershipIndex) -> Dict:
+        """Build balance result from group totals"""
         # Вычисляем чистые балансы
         group_balances = {}
         for group in [1, 2]:
@@ -88,6 +59,9 @@ class GroupBalanceService:
                 "net_balance": net_balance
             }
         
+        group1_name = membership.group_label(1)
+        group2_name = membership.group_label(2)
+        
         # Определяем, кто кому должен
         group1_balance = group_balances[1]["net_balance"]
         group2_balance = group_balances[2]["net_balance"]
@@ -95,11 +69,11 @@ class GroupBalanceService:
         if group1_balance > 0 and group2_balance < 0:
             # Группа 1 должна группе 2 (группа 1 переплатила)
             debt_amount = min(group1_balance, abs(group2_balance))
-            debt_direction = "Дима + Катя + Миша должны Даша + Сеня"
+            debt_direction = f"{group2_name} должны {group1_name}"
         elif group2_balance > 0 and group1_balance < 0:
             # Группа 2 должна группе 1 (группа 2 переплатила)
             debt_amount = min(group2_balance, abs(group1_balance))
-            debt_direction = "Даша + Сеня должны Дима + Катя + Миша"
+            debt_direction = f"{group1_name} должны {group2_name}"
         else:
             debt_amount = 0
             debt_direction = "Баланс сведен"
@@ -110,13 +84,13 @@ class GroupBalanceService:
             "debt_direction": debt_direction,
             "summary": {
                 "group_1": {
-                    "name": "Даша + Сеня",
+                    "name": group1_name,
                     "spent": group_totals[1],
                     "owes": group_shares[1],
                     "net": group_balances[1]["net_balance"]
                 },
                 "group_2": {
-                    "name": "Дима + Катя + Миша", 
+                    "name": group2_name,
                     "spent": group_totals[2],
                     "owes": group_shares[2],
                     "net": group_balances[2]["net_balance"]
@@ -125,7 +99,192 @@ class GroupBalanceService:
         }
     
     @classmethod
-    def _calculate_category_shares(cls, db: Session, expense, allocations: List[ExpenseAllocation]) -> Dict[int, float]:
+    def _user_groups(cls, db: Session, user_ids) -> Dict[int, int]:
+        """Map internal user IDs to group numbers (membership index, no queries)"""
+        membership = membership_registry.get(db)
+        return {user_id: membership.group_of(user_id) for user_id in set(user_ids)}
+    
+    @classmethod
+    def expense_deltas(cls, db: Session, expense: Expense, allocations: List[ExpenseAllocation]) -> Dict[int, Tuple[int, int]]:
+        """Contribution of one expense to each group: {group: (spent, owes)}"""
+        # Расходы без аллокаций и с неизвестным плательщиком не учитываются
+        if not allocations:
+            return {}
+        
+        groups = cls._user_groups(db, [expense.payer_id] + [allocation.user_id for allocation in allocations])
+        payer_group = groups.get(expense.payer_id, 0)
+        if payer_group == 0:
+            return {}
+        
+        spent = {group: 0 for group in cls.GROUPS}
+        owes = {group: 0 for group in cls.GROUPS}
+        spent[payer_group] += expense.amount_sek
+        for user_id, share in cls._calculate_category_shares(db, expense, allocations).items():
+            user_group = groups.get(user_id, 0)
+            if user_group > 0:
+                owes[user_group] += share
+        
+        return {group: (spent[group], owes[group]) for group in cls.GROUPS}
+    
+    @classmethod
+    def apply_expense(cls, db: Session, expense: Expense, allocations: List[ExpenseAllocation], sign: int = 1) -> None:
+        """Add (sign=1) or remove (sign=-1) an expense from the ledger, in the caller's transaction"""
+        cls.apply_deltas(db, expense.profile_id, cls.expense_deltas(db, expense, allocations), sign)
+    
+    @classmethod
+    def apply_expense_batch(cls, db: Session, expenses: List[Tuple[int, int, int, Dict[int, int]]]) -> None:
+        """Add many new expenses to the ledger: (profile_id, payer_id, amount_sek, {user_id: share}) each
+        
+        User groups come from the membership index and deltas are summed per profile, so the
+        ledger gets one UPDATE per profile and group instead of per expense.
+        """
+        user_ids = set()
+        for _, payer_id, _, shares in expenses:
+            user_ids.add(payer_id)
+            user_ids.update(shares)
+        groups = cls._user_groups(db, user_ids)
+        
+        totals: Dict[int, Dict[int, List[int]]] = {}
+        for profile_id, payer_id, amount_sek, shares in expenses:
+            payer_group = groups.get(payer_id, 0)
+            if not shares or payer_group == 0:
+                continue
+            profile_totals = totals.setdefault(profile_id, {group: [0, 0] for group in cls.GROUPS})
+            profile_totals[payer_group][0] += amount_sek
+            for user_id, share in shares.items():
+                user_group = groups.get(user_id, 0)
+                if user_group > 0:
+                    profile_totals[user_group][1] += share
+        
+        for profile_id, profile_totals in totals.items():
+            cls.apply_deltas(db, profile_id, {group: tuple(values) for group, values in profile_totals.items()})
+    
+    @classmethod
+    def apply_deltas(cls, db: Session, profile_id: int, deltas: Dict[int, Tuple[int, int]], sign: int = 1) -> None:
+        """Add {group: (spent, owes)} to the ledger rows of a profile"""
+        rows = [
+            {
+                "profile_id": profile_id, "group_number": group,
+                "spent_sek": sign * spent, "owes_sek": sign * owes, "updated_at": datetime.utcnow()
+            }
+            for group, (spent, owes) in deltas.items()
+            if spent or owes
+        ]
+        if not rows:
+            return
+        # Upsert: the first expenses of a profile in two transactions can't both INSERT its row
+        table = GroupBalance.__table__
+        statement = dialect_insert(db)(table)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["profile_id", "group_number"],
+                set_={
+                    "spent_sek": table.c.spent_sek + statement.excluded.spent_sek,
+                    "owes_sek": table.c.owes_sek + statement.excluded.owes_sek,
+                    "updated_at": statement.excluded.updated_at,
+                }
+            ),
+            rows
+        )
+    
+    @classmethod
+    def compute_totals_from_history(
+        cls, db: Session, profile_id: int, use_checkpoint: bool = True, until_expense_id: Optional[int] = None
+    ) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Totals from expense history: (spent per group, owes per group)
+        
+        Starts from the latest settle-up checkpoint and scans only the expenses after it
+        (use_checkpoint=False scans the full history), up to until_expense_id if given.
+        """
+        from services.settlement import SettlementService
+        
+        since_expense_id = 0
+        checkpoint = {}
+        if use_checkpoint:
+            since_expense_id, checkpoint = SettlementService.get_group_checkpoint(db, profile_id)
+        
+        membership = membership_registry.get(db)
+        
+        # Только расходы с аллокациями
+        has_allocations = db.query(ExpenseAllocation.id).filter(
+            ExpenseAllocation.expense_id == Expense.id
+        ).exists()
+        expense_filter = [Expense.profile_id == profile_id, Expense.id > since_expense_id]
+        if until_expense_id is not None:
+            expense_filter.append(Expense.id <= until_expense_id)
+        spent_rows = db.query(Expense.payer_id, func.sum(Expense.amount_sek)).filter(
+            *expense_filter, has_allocations
+        ).group_by(Expense.payer_id).all()
+        
+        owes_rows = db.query(Expense.payer_id, ExpenseAllocation.user_id, func.sum(ExpenseAllocation.amount_sek)).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).filter(*expense_filter).group_by(Expense.payer_id, ExpenseAllocation.user_id).all()
+        
+        group_totals = {group: checkpoint.get(group, (0, 0))[0] for group in cls.GROUPS}
+        group_shares = {group: checkpoint.get(group, (0, 0))[1] for group in cls.GROUPS}
+        for payer_id, total in spent_rows:
+            payer_group = membership.group_of(payer_id)
+            if payer_group > 0:
+                group_totals[payer_group] += total or 0
+        for payer_id, member_id, total in owes_rows:
+            member_group = membership.group_of(member_id)
+            if membership.group_of(payer_id) > 0 and member_group > 0:
+                group_shares[member_group] += total or 0
+        return group_totals, group_shares
+    
+    @classmethod
+    def rebuild_ledger(cls, db: Session, use_checkpoint: bool = True) -> Dict[int, Dict[int, Tuple[int, int]]]:
+        """Recompute the ledger of every profile from expense history"""
+        ledger = {}
+        db.query(GroupBalance).delete(synchronize_session=False)
+        for (profile_id,) in db.query(Profile.id).all():
+            ledger[profile_id] = cls.rebuild_profile_ledger(db, profile_id, use_checkpoint)
+        db.commit()
+        return ledger
+    
+    @classmethod
+    def rebuild_profile_ledger(
+        cls, db: Session, profile_id: int, use_checkpoint: bool = True
+    ) -> Dict[int, Tuple[int, int]]:
+        """Recompute the ledger rows of one profile from expense history (caller commits)"""
+        group_totals, group_shares = cls.compute_totals_from_history(db, profile_id, use_checkpoint)
+        db.query(GroupBalance).filter(
+            GroupBalance.profile_id == profile_id
+        ).delete(synchronize_session=False)
+        for group in cls.GROUPS:
+            db.add(GroupBalance(
+                profile_id=profile_id,
+                group_number=group,
+                spent_sek=group_totals[group],
+                owes_sek=group_shares[group]
+            ))
+        return {group: (group_totals[group], group_shares[group]) for group in cls.GROUPS}
+    
+    @classmethod
+    def verify_ledger(cls, db: Session, tolerance: int = 0) -> List[Dict]:
+        """Compare the ledger with a full history scan (no checkpoints), return mismatching rows"""
+        stored = {
+            (profile_id, group): (spent, owes)
+            for profile_id, group, spent, owes in db.query(
+                GroupBalance.profile_id, GroupBalance.group_number, GroupBalance.spent_sek, GroupBalance.owes_sek
+            ).all()
+        }
+        mismatches = []
+        for (profile_id,) in db.query(Profile.id).all():
+            group_totals, group_shares = cls.compute_totals_from_history(db, profile_id, use_checkpoint=False)
+            for group in cls.GROUPS:
+                spent, owes = stored.get((profile_id, group), (0, 0))
+                if abs(spent - group_totals[group]) > tolerance or abs(owes - group_shares[group]) > tolerance:
+                    mismatches.append({
+                        "profile_id": profile_id,
+                        "group": group,
+                        "ledger": (spent, owes),
+                        "history": (group_totals[group], group_shares[group])
+                    })
+        return mismatches
+    
+    @classmethod
+    def _calculate_category_shares(cls, db: Session, expense, allocations: List[ExpenseAllocation]) -> Dict[int, int]:
         """Calculate how much each user owes for this expense based on actual allocations"""
         
         # Если есть аллокации (например, из FlexibleSplitService), используем их
@@ -135,25 +294,9 @@ class GroupBalanceService:
                 shares[allocation.user_id] = allocation.amount_sek
             return shares
         
-        # Иначе используем старую логику по категориям (для обратной совместимости)
-        from services.special_split import get_users_for_category
-        
-        # Получаем пользователей для данной категории
-        category_users = get_users_for_category(db, expense.category)
-        
-        if not category_users:
-            return {}
-        
-        # Равное разделение между участниками категории
-        user_count = len(category_users)
-        share_per_user = expense.amount_sek / user_count
-        
-        # Создаем словарь долей
-        shares = {}
-        for user in category_users:
-            shares[user.id] = share_per_user
-        
-        return shares
+        # Иначе используем правило категории (для обратной совместимости)
+        from services.split_engine import split_engine_cache
+        return split_engine_cache.get(db).category_rule(expense.category).allocate(expense.amount_sek)
     
     @classmethod
     def get_detailed_balance_report(cls, db: Session, profile_id: int = None) -> str:
@@ -169,28 +312,28 @@ class GroupBalanceService:
         
         # Группа 1
         report += f"{summary['group_1']['name']}\n"
-        report += f"💰 Потратили: {summary['group_1']['spent']:.2f} SEK\n"
+        report += f"💰 Потратили: {format_amount(summary['group_1']['spent'], Currency.SEK)}\n"
         # Показываем "Должны" только если другие платили за нас
         if summary['group_1']['owes'] > summary['group_1']['spent']:
-            report += f"💸 Должны: {summary['group_1']['owes'] - summary['group_1']['spent']:.2f} SEK\n"
+            report += f"💸 Должны: {format_amount(summary['group_1']['owes'] - summary['group_1']['spent'], Currency.SEK)}\n"
         else:
-            report += f"💸 Должны: 0.00 SEK\n"
+            report += f"💸 Должны: {format_amount(0, Currency.SEK)}\n"
         report += "\n"
         
         # Группа 2
         report += f"{summary['group_2']['name']}\n"
-        report += f"💰 Потратили: {summary['group_2']['spent']:.2f} SEK\n"
+        report += f"💰 Потратили: {format_amount(summary['group_2']['spent'], Currency.SEK)}\n"
         # Показываем "Должны" только если другие платили за нас
         if summary['group_2']['owes'] > summary['group_2']['spent']:
-            report += f"💸 Должны: {summary['group_2']['owes'] - summary['group_2']['spent']:.2f} SEK\n"
+            report += f"💸 Должны: {format_amount(summary['group_2']['owes'] - summary['group_2']['spent'], Currency.SEK)}\n"
         else:
-            report += f"💸 Должны: 0.00 SEK\n"
+            report += f"💸 Должны: {format_amount(0, Currency.SEK)}\n"
         report += "\n"
         
         # Итог
         if result["debt_amount"] > 0:
             report += f"💳 Итого:\n"
-            report += f"{result['debt_direction']} - {result['debt_amount']:.2f} SEK"
+            report += f"{result['debt_direction']} - {format_amount(result['debt_amount'], Currency.SEK)}"
         else:
             report += f"✅ {result['debt_direction']}"
         
@@ -0,0 +1,198 @@
+"""
+Group membership registry
+
+Families are the group_name of the default profile's members ("group_1", "group_2"),
+names accepted in commands and imports are their aliases. The registry loads users and
+profile members once (two queries) into a compact index - telegram_id <-> user_id <->
+group - shared by split rules, group balances, access control and the handlers.
+
+Membership changes bump a version counter in db_meta; the registry compares it at most
+once per MEMBERSHIP_REVALIDATE_INTERVAL and reloads when another worker changed it.
+Code on the event loop (access checks) reads current(): the last loaded index, refreshed
+in the background on the DB executor, never a query on the loop.
+"""
+import asyncio
+import os
+import time
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from models import User, Profile, ProfileMember
+from migrations import get_meta, set_meta
+
+MEMBERSHIP_VERSION_KEY = "membership_version"
+MEMBERSHIP_REVALIDATE_INTERVAL = float(os.getenv('MEMBERSHIP_REVALIDATE_INTERVAL', '10'))  # seconds
+
+# ProfileMember.group_name -> group number of the balance ledger
+GROUP_NUMBERS = {"group_1": 1, "group_2": 2}
+GROUPS = tuple(sorted(GROUP_NUMBERS.values()))
+
+def bump_membership_version(conn: Connection) -> None:
+    """Mark users / profile members as changed for every worker (call in the same transaction)"""
+    value = get_meta(conn, MEMBERSHIP_VERSION_KEY)
+    set_meta(conn, MEMBERSHIP_VERSION_KEY, str(int(value or 0) + 1))
+
+class MembershipIndex:
+    """Immutable membership snapshot"""
+
+    def __init__(self, users: Iterable[Tuple[int, int, Optional[str], Optional[str]]],
+                 members: Iterable[Tuple[int, int, str, Optional[str], float, bool]]):
+        self.telegram_ids: Dict[int, int] = {}  # user_id -> telegram_id (every user)
+        self.user_ids: Dict[int, int] = {}  # telegram_id -> user_id
+        self.display_names: Dict[int, str] = {}  # user_id -> first name / username
+        user_names: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        for user_id, telegram_id, first_name, username in users:
+            self.telegram_ids[user_id] = telegram_id
+            self.user_ids[telegram_id] = user_id
+            self.display_names[user_id] = first_name or username or f"User {telegram_id}"
+            user_names[user_id] = (first_name, username)
+
+        self.profile_members: Dict[int, List[Tuple[int, str, float]]] = {}  # profile_id -> [(user_id, group_name, weight)]
+        self.groups: Dict[int, int] = {}  # user_id -> group number (default profile)
+        self.aliases: Dict[str, int] = {}  # alias -> telegram_id (default profile)
+        allowed = set()
+        for profile_id, user_id, group_name, alias, weight, is_default in members:
+            self.profile_members.setdefault(profile_id, []).append((user_id, group_name, weight))
+            telegram_id = self.telegram_ids.get(user_id)
+            if telegram_id is None:
+                continue
+            allowed.add(telegram_id)
+            if is_default:
+                if group_name in GROUP_NUMBERS:
+                    self.groups.setdefault(user_id, GROUP_NUMBERS[group_name])
+                if alias:
+                    self.aliases.setdefault(alias.lower(), telegram_id)
+        # Profile members are the bot's whitelist
+        self.allowed_telegram_ids: FrozenSet[int] = frozenset(allowed)
+
+        self.group_members: Dict[int, Tuple[int, ...]] = {
+            group: tuple(user_id for user_id, user_group in self.groups.items() if user_group == group)
+            for group in GROUPS
+        }
+        # Telegram IDs per family, in GROUPS order
+        self.families: Tuple[FrozenSet[int], ...] = tuple(
+            frozenset(self.telegram_ids[user_id] for user_id in self.group_members[group]) for group in GROUPS
+        )
+
+        # Any of alias, first name, username or telegram ID of a member -> telegram_id
+        self.names: Dict[str, int] = dict(self.aliases)
+        for telegram_id in sorted(allowed):
+            for name in (*user_names[self.user_ids[telegram_id]], str(telegram_id)):
+                if name:
+                    self.names.setdefault(name.lower(), telegram_id)
+
+    @classmethod
+    def load(cls, db: Session) -> "MembershipIndex":
+        """Read users and profile members (two queries)"""
+        users = db.execute(select(User.id, User.telegram_id, User.first_name, User.username)).all()
+        members = db.execute(
+            select(
+                ProfileMember.profile_id, ProfileMember.user_id, ProfileMember.group_name,
+                ProfileMember.alias, ProfileMember.weight, Profile.is_default
+            )
+            .join(Profile, ProfileMember.profile_id == Profile.id)
+            .order_by(ProfileMember.id)
+        ).all()
+        return cls(users, members)
+
+    def group_of(self, user_id: int) -> int:
+        """Group number of an internal user ID (0 - not in a group)"""
+        return self.groups.get(user_id, 0)
+
+    def group_of_telegram(self, telegram_id: int) -> int:
+        """Group number of a telegram ID (0 - not in a group)"""
+        user_id = self.user_ids.get(telegram_id)
+        return self.groups.get(user_id, 0) if user_id is not None else 0
+
+    def selected_groups(self, telegram_ids: Iterable[int]) -> Set[int]:
+        """Groups represented among the selected telegram IDs"""
+        return {self.group_of_telegram(telegram_id) for telegram_id in telegram_ids} - {0}
+
+    def group_label(self, group: int) -> str:
+        """'Сеня + Даша' style name of a group"""
+        return " + ".join(self.display_names[user_id] for user_id in self.group_members.get(group, ()))
+
+    def name_of_telegram(self, telegram_id: int) -> Optional[str]:
+        """Display name of a telegram ID"""
+        user_id = self.user_ids.get(telegram_id)
+        return self.display_names.get(user_id) if user_id is not None else None
+
+    def participants(self) -> List[Tuple[int, str]]:
+        """(telegram_id, display name) of every group member, group by group"""
+        return [
+            (self.telegram_ids[user_id], self.display_names[user_id])
+            for group in GROUPS for user_id in self.group_members[group]
+        ]
+
+class MembershipRegistry:
+    """Process-wide MembershipIndex with db_meta version revalidation"""
+
+    def __init__(self, revalidate_interval: float = MEMBERSHIP_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self._index: Optional[MembershipIndex] = None
+        self._current: Optional[MembershipIndex] = None  # last loaded, kept across invalidate()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._validated_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def get(self, db: Session) -> MembershipIndex:
+        """Get the index (revalidates first if the interval has passed)"""
+        if self._version is None or time.monotonic() - self._validated_at >= self.revalidate_interval:
+            self.revalidate(db)
+        index = self._index
+        if index is None:
+            index = self._index = self._current = MembershipIndex.load(db)
+        return index
+
+    def current(self) -> MembershipIndex:
+        """Last loaded index without queries, for code on the event loop
+
+        Load it with get() at startup. A stale index is still served while a refresh runs
+        on the DB executor; DB paths calling get() keep it fresh as well.
+        """
+        index = self._current
+        if index is None:
+            raise RuntimeError("Membership index is not loaded (call get() at startup)")
+        if self._index is None or time.monotonic() - self._validated_at >= self.revalidate_interval:
+            self._schedule_refresh()
+        return index
+
+    def _schedule_refresh(self) -> None:
+        """Run get() on its own session in the DB executor, one refresh at a time"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no event loop: sync callers have a session and use get()
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        from utils.db_executor import run_db_detached
+        self._refresh_task = loop.create_task(run_db_detached(self.get))
+        self._refresh_task.add_done_callback(self._refresh_done)
+
+    @staticmethod
+    def _refresh_done(task: asyncio.Task) -> None:
+        # Failed refresh (e.g. executor saturated): keep serving the old index, retry next call
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Не удалось обновить участников: {task.exception()}")
+
+    def invalidate(self) -> None:
+        """Drop the index and force a version check on the next lookup"""
+        with self._lock:
+            self._index = None
+            self._version = None
+
+    def revalidate(self, db: Session) -> None:
+        """Drop the index if the membership version in db_meta changed"""
+        # Read outside the lock: other DB worker threads would queue behind this query
+        version = get_meta(db.connection(), MEMBERSHIP_VERSION_KEY) or "0"
+        with self._lock:
+            self._validated_at = time.monotonic()
+            if version != self._version:
+                self._index = None
+                self._version = version
+
+# Shared by all handlers in this process
+membership_registry = MembershipRegistry()
@@ -0,0 +1,192 @@
+"""
+Month close: per-user MonthSnapshot rows for finished months
+
+Closed months are served from snapshots, only the open (current) month is computed
+live. The last closed month is stored in db_meta.
+"""
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from models import Expense, ExpenseAllocation, MonthSnapshot
+from migrations import get_meta, set_meta
+
+LAST_CLOSED_MONTH_KEY = "last_closed_month"
+
+def _month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+class MonthCloseService:
+    """Service for closing months into MonthSnapshot rows"""
+
+    @staticmethod
+    def get_open_month() -> date:
+        """First day of the current (open) month"""
+        return _month_start(datetime.now())
+
+    @staticmethod
+    def get_last_closed_month(db: Session) -> Optional[date]:
+        value = get_meta(db.connection(), LAST_CLOSED_MONTH_KEY)
+        return date.fromisoformat(value) if value else None
+
+    @staticmethod
+    def compute_monthly_balances(
+        db: Session,
+        start: date,
+        end: date
+    ) -> Dict[date, Dict[int, Dict[str, int]]]:
+        """Per-user paid/owed/net of every month in [start, end) in one pass (two GROUP BY queries)"""
+        paid_rows = db.query(
+            Expense.month, Expense.payer_id, func.sum(Expense.amount_sek)
+        ).filter(
+            Expense.month >= start, Expense.month < end
+        ).group_by(Expense.month, Expense.payer_id).all()
+
+        owed_rows = db.query(
+            Expense.month, ExpenseAllocation.user_id, func.sum(ExpenseAllocation.amount_sek)
+        ).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).filter(
+            Expense.month >= start, Expense.month < end
+        ).group_by(Expense.month, ExpenseAllocation.user_id).all()
+
+        months: Dict[date, Dict[int, Dict[str, int]]] = {}
+        for month, user_id, paid in paid_rows:
+            balance = months.setdefault(month, {}).setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balance['paid'] += paid or 0
+        for month, user_id, owed in owed_rows:
+            balance = months.setdefault(month, {}).setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balance['owed'] += owed or 0
+
+        for balances in months.values():
+            for balance in balances.values():
+                balance['net'] = balance['owed'] - balance['paid']
+        return months
+
+    @staticmethod
+    def close_months(db: Session, start: date, end: date) -> int:
+        """Replace snapshots of months in [start, end) with freshly computed ones (caller commits)"""
+        months = MonthCloseService.compute_monthly_balances(db, start, end)
+
+        db.query(MonthSnapshot).filter(
+            MonthSnapshot.settlement_id.is_(None),
+            MonthSnapshot.month >= start,
+            MonthSnapshot.month < end
+        ).delete(synchronize_session=False)
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                "month": month,
+                "user_id": user_id,
+                "total_paid_sek": balance['paid'],
+                "total_owed_sek": balance['owed'],
+                "net_balance_sek": balance['net'],
+                "settlement_id": None,
+                "created_at": now,
+            }
+            for month, balances in months.items()
+            for user_id, balance in balances.items()
+        ]
+        if rows:
+            db.execute(insert(MonthSnapshot), rows)
+        return len(rows)
+
+    @staticmethod
+    def close_pending_months(db: Session) -> List[date]:
+        """Close every finished month that isn't closed yet (used by the scheduled job and backfill)"""
+        open_month = MonthCloseService.get_open_month()
+        last_closed = MonthCloseService.get_last_closed_month(db)
+
+        if last_closed:
+            start = _next_month(last_closed)
+        else:
+            first_month = db.query(func.min(Expense.month)).scalar()
+            start = _month_start(first_month) if first_month else open_month
+
+        if start >= open_month:
+            return []
+
+        MonthCloseService.close_months(db, start, open_month)
+
+        closed = []
+        month = start
+        while month < open_month:
+            closed.append(month)
+            month = _next_month(month)
+
+        set_meta(db.connection(), LAST_CLOSED_MONTH_KEY, closed[-1].isoformat())
+        db.commit()
+        return closed
+
+    @staticmethod
+    def refresh_month(db: Session, month: date) -> None:
+        """Recompute snapshots of a closed month after its expenses changed (caller commits)"""
+        month = _month_start(month)
+        last_closed = MonthCloseService.get_last_closed_month(db)
+        if last_closed is None or month > last_closed:
+            return
+        db.flush()
+        MonthCloseService.close_months(db, month, _next_month(month))
+
+    @staticmethod
+    def get_user_balances(db: Session, month: date) -> Dict[int, Dict[str, int]]:
+        """User balances of a month: snapshots for closed months, live for the open one"""
+        from services.split import SplitService
+
+        month = _month_start(month)
+        last_closed = MonthCloseService.get_last_closed_month(db)
+        if last_closed is None or month > last_closed:
+            return SplitService.calculate_user_balances(db, datetime(month.year, month.month, 1))
+
+        rows = db.query(
+            MonthSnapshot.user_id, MonthSnapshot.total_paid_sek,
+            MonthSnapshot.total_owed_sek, MonthSnapshot.net_balance_sek
+        ).filter(
+            MonthSnapshot.settlement_id.is_(None),
+            MonthSnapshot.month == month
+        ).all()
+        return {
+            user_id: {'paid': paid, 'owed': owed, 'net': net}
+            for user_id, paid, owed, net in rows
+        }
+
+    @staticmethod
+    def verify_snapshots(db: Session, tolerance: int = 0) -> List[Dict]:
+        """Compare snapshots of closed months with live computation, return mismatches"""
+        last_closed = MonthCloseService.get_last_closed_month(db)
+        if last_closed is None:
+            return []
+
+        end = _next_month(last_closed)
+        expected = MonthCloseService.compute_monthly_balances(db, date(1970, 1, 1), end)
+
+        stored: Dict[date, Dict[int, Dict[str, int]]] = {}
+        for month, user_id, paid, owed, net in db.query(
+            MonthSnapshot.month, MonthSnapshot.user_id, MonthSnapshot.total_paid_sek,
+            MonthSnapshot.total_owed_sek, MonthSnapshot.net_balance_sek
+        ).filter(
+            MonthSnapshot.settlement_id.is_(None),
+            MonthSnapshot.month < end
+        ).all():
+            stored.setdefault(month, {})[user_id] = {'paid': paid, 'owed': owed, 'net': net}
+
+        empty = {'paid': 0, 'owed': 0, 'net': 0}
+        mismatches = []
+        for month in sorted(set(expected) | set(stored)):
+            expected_month = expected.get(month, {})
+            stored_month = stored.get(month, {})
+            for user_id in set(expected_month) | set(stored_month):
+                live = expected_month.get(user_id, empty)
+                snapshot = stored_month.get(user_id, empty)
+                if any(abs(live[key] - snapshot[key]) > tolerance for key in ('paid', 'owed', 'net')):
+                    mismatches.append({
+                        "month": month,
+                        "user_id": user_id,
+                        "snapshot": snapshot,
+                        "live": live
+                    })
+        return mismatches
@@ -0,0 +1,136 @@
+"""
+Bulk re-pricing after an exchange rate correction
+
+Expenses created while a rate was valid get the new rate and amount_sek (converted half up,
+like new expenses) in one executemany UPDATE; allocations are scaled by each expense's new / old amount and re-rounded together
+(largest remainder), so they still add up to the expense. Derived state (group ledger,
+settle-up checkpoints, closed month snapshots, category rollup) is brought up to date in
+the same transaction.
+"""
+from itertools import groupby
+from typing import Dict, Optional
+from sqlalchemy import bindparam, select, update, func
+from sqlalchemy.orm import Session
+from models import Expense, ExpenseAllocation, ExchangeRate, Currency
+from utils.money import convert_minor, round_allocations
+from utils.db_session import after_commit
+from utils.rate_cache import bump_rate_version, exchange_rate_cache
+
+class RepricingService:
+    """Service for correcting exchange rates and re-pricing affected expenses"""
+
+    @staticmethod
+    def get_latest_rate(db: Session, currency: Currency) -> Optional[ExchangeRate]:
+        """Get the newest rate of a currency to SEK"""
+        return db.query(ExchangeRate).filter(
+            ExchangeRate.from_currency == currency,
+            ExchangeRate.to_currency == Currency.SEK
+        ).order_by(ExchangeRate.valid_from.desc(), ExchangeRate.id.desc()).first()
+
+    @staticmethod
+    def window_filter(rate: ExchangeRate):
+        """Expenses in the rate's currency created while it was valid"""
+        conditions = [
+            Expense.currency == rate.from_currency,
+            Expense.created_at >= rate.valid_from,
+        ]
+        if rate.valid_until is not None:
+            conditions.append(Expense.created_at < rate.valid_until)
+        return conditions
+
+    @staticmethod
+    def correct_rate(db: Session, currency: Currency, new_rate: float, rate_id: int = None) -> Optional[Dict]:
+        """Replace a wrong rate (latest one by default) and re-price its expenses in one transaction"""
+        from services.expense_rollup import ExpenseRollupService
+        from services.group_balance import GroupBalanceService
+        from services.month_close import MonthCloseService
+        from services.settlement import SettlementService
+
+        if rate_id is None:
+            rate = RepricingService.get_latest_rate(db, currency)
+        else:
+            rate = db.query(ExchangeRate).filter(
+                ExchangeRate.id == rate_id,
+                ExchangeRate.from_currency == currency,
+                ExchangeRate.to_currency == Currency.SEK
+            ).first()
+        if rate is None:
+            return None
+
+        old_rate = rate.rate
+        window = RepricingService.window_filter(rate)
+
+        # Per profile: first affected expense (for checkpoints) and number of expenses
+        affected = db.execute(
+            select(
+                Expense.profile_id, func.min(Expense.id), func.count(Expense.id)
+            ).where(*window).group_by(Expense.profile_id)
+        ).all()
+        months = db.execute(select(Expense.month).where(*window).distinct()).scalars().all()
+
+        # Allocations with their expense's current amount, read before re-pricing
+        allocations = db.execute(
+            select(ExpenseAllocation.id, ExpenseAllocation.expense_id, ExpenseAllocation.amount_sek, Expense.amount_sek)
+            .join(Expense, ExpenseAllocation.expense_id == Expense.id).where(*window)
+            .order_by(ExpenseAllocation.expense_id, ExpenseAllocation.id)
+        ).all()
+        # Decimal half up (utils.money.convert_minor): SQL round() of a float product breaks
+        # ties differently per backend
+        new_amounts = {
+            expense_id: convert_minor(amount, new_rate)
+            for expense_id, amount in db.execute(select(Expense.id, Expense.amount).where(*window)).all()
+        }
+        if new_amounts:
+            table = Expense.__table__
+            db.execute(
+                update(table).where(table.c.id == bindparam("expense_id")).values(
+                    exchange_rate=new_rate, amount_sek=bindparam("new_amount")
+                ),
+                [{"expense_id": expense_id, "new_amount": amount} for expense_id, amount in new_amounts.items()]
+            )
+
+        # Shares of an expense are scaled by its new / old amount and rounded together,
+        # so allocations that added up to the expense still do
+        allocation_rows = []
+        for expense_id, rows in groupby(allocations, key=lambda row: row[1]):
+            rows = list(rows)
+            old_amount = rows[0][3]
+            scale = new_amounts[expense_id] / old_amount if old_amount else new_rate / old_rate
+            shares = round_allocations({allocation_id: share * scale for allocation_id, _, share, _ in rows})
+            allocation_rows.extend(
+                {"allocation_id": allocation_id, "share": share} for allocation_id, share in shares.items()
+            )
+        if allocation_rows:
+            table = ExpenseAllocation.__table__
+            db.execute(
+                update(table).where(table.c.id == bindparam("allocation_id")).values(amount_sek=bindparam("share")),
+                allocation_rows
+            )
+        db.execute(
+            update(ExchangeRate).where(ExchangeRate.id == rate.id).values(
+                rate=new_rate
+            ).execution_options(synchronize_session=False)
+        )
+
+        # Derived balance state
+        for profile_id, first_expense_id, _ in affected:
+            SettlementService.invalidate_after(db, profile_id, first_expense_id)
+            GroupBalanceService.rebuild_profile_ledger(db, profile_id)
+        for month in months:
+            MonthCloseService.refresh_month(db, month)
+        ExpenseRollupService.rebuild(db, months)
+
+        summary = {
+            "rate_id": rate.id,
+            "old_rate": old_rate,
+            "new_rate": new_rate,
+            "valid_from": rate.valid_from,
+            "valid_until": rate.valid_until,
+            "expenses": sum(count for _, _, count in affected),
+            "allocations": len(allocation_rows),
+        }
+
+        bump_rate_version(db.connection())
+        after_commit(db, exchange_rate_cache.invalidate)
+        db.commit()
+        return summary
@@ -0,0 +1,145 @@
+"""
+Settle-up checkpoints
+
+A settlement records cumulative per-user (month_snapshots rows) and per-group balances
+of a profile including every expense up to last_expense_id. Balance math then only scans
+expenses after the latest checkpoint.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from models import Expense, MonthSnapshot, Profile, Settlement, SettlementGroupBalance
+
+class SettlementService:
+    """Service for settle-up checkpoints"""
+
+    @staticmethod
+    def get_default_profile_id(db: Session) -> Optional[int]:
+        """Get ID of the default profile (Home)"""
+        return db.query(Profile.id).filter(Profile.is_default == True).scalar()
+
+    @staticmethod
+    def get_latest_settlement(db: Session, profile_id: int) -> Optional[Settlement]:
+        """Get the newest checkpoint of a profile"""
+        return db.query(Settlement).filter(
+            Settlement.profile_id == profile_id
+        ).order_by(Settlement.last_expense_id.desc(), Settlement.id.desc()).first()
+
+    @staticmethod
+    def get_user_checkpoint(db: Session, profile_id: int) -> Tuple[int, Dict[int, Dict[str, int]]]:
+        """Latest checkpoint user balances: (last_expense_id, {user_id: {'paid', 'owed', 'net'}})"""
+        settlement = SettlementService.get_latest_settlement(db, profile_id)
+        if settlement is None:
+            return 0, {}
+
+        rows = db.query(
+            MonthSnapshot.user_id, MonthSnapshot.total_paid_sek, MonthSnapshot.total_owed_sek
+        ).filter(MonthSnapshot.settlement_id == settlement.id).all()
+        balances = {
+            user_id: {'paid': paid, 'owed': owed, 'net': owed - paid}
+            for user_id, paid, owed in rows
+        }
+        return settlement.last_expense_id, balances
+
+    @staticmethod
+    def get_group_checkpoint(db: Session, profile_id: int) -> Tuple[int, Dict[int, Tuple[int, int]]]:
+        """Latest checkpoint group totals: (last_expense_id, {group: (spent, owes)})"""
+        settlement = SettlementService.get_latest_settlement(db, profile_id)
+        if settlement is None:
+            return 0, {}
+
+        rows = db.query(
+            SettlementGroupBalance.group_number, SettlementGroupBalance.spent_sek, SettlementGroupBalance.owes_sek
+        ).filter(SettlementGroupBalance.settlement_id == settlement.id).all()
+        return settlement.last_expense_id, {group: (spent, owes) for group, spent, owes in rows}
+
+    @staticmethod
+    def _lock_expenses(db: Session, profile_id: int) -> None:
+        """Block expense writes until the transaction ends, so the reads that follow agree"""
+        if db.get_bind().dialect.name == "postgresql":
+            # Waits for in-flight expense writes to commit, then holds new ones off
+            db.execute(text("LOCK TABLE expenses, expense_allocations IN SHARE MODE"))
+        else:
+            # SQLite: a write takes the single writer lock and opens the transaction the reads run in
+            db.execute(text("UPDATE profiles SET id = id WHERE id = :profile_id"), {"profile_id": profile_id})
+
+    @staticmethod
+    def settle_up(db: Session, profile_id: int = None, created_by_id: int = None) -> Optional[Settlement]:
+        """Record a checkpoint of the current user and group balances"""
+        from services.split import SplitService
+        from services.group_balance import GroupBalanceService
+
+        if profile_id is None:
+            profile_id = SettlementService.get_default_profile_id(db)
+            if profile_id is None:
+                return None
+
+        # max(id) and the sums below must see the same expenses
+        SettlementService._lock_expenses(db, profile_id)
+        last_expense_id = db.query(func.max(Expense.id)).filter(
+            Expense.profile_id == profile_id
+        ).scalar() or 0
+
+        # Checkpoint + expenses since the previous settlement, bounded by the new one
+        user_balances = SplitService.calculate_total_user_balances(
+            db, profile_id, until_expense_id=last_expense_id
+        )
+        group_totals, group_shares = GroupBalanceService.compute_totals_from_history(
+            db, profile_id, until_expense_id=last_expense_id
+        )
+
+        settlement = Settlement(
+            profile_id=profile_id,
+            last_expense_id=last_expense_id,
+            created_by_id=created_by_id
+        )
+        db.add(settlement)
+        db.flush()
+
+        month = datetime.now().replace(day=1).date()
+        db.add_all([
+            MonthSnapshot(
+                month=month,
+                user_id=user_id,
+                total_paid_sek=balance['paid'],
+                total_owed_sek=balance['owed'],
+                net_balance_sek=balance['net'],
+                settlement_id=settlement.id
+            )
+            for user_id, balance in user_balances.items()
+        ])
+        db.add_all([
+            SettlementGroupBalance(
+                settlement_id=settlement.id,
+                group_number=group,
+                spent_sek=group_totals[group],
+                owes_sek=group_shares[group]
+            )
+            for group in GroupBalanceService.GROUPS
+        ])
+        db.commit()
+        return settlement
+
+    @staticmethod
+    def invalidate_after(db: Session, profile_id: int, expense_id: int) -> int:
+        """Drop checkpoints that include a changed expense (caller commits)"""
+        settlement_ids = [
+            settlement_id for (settlement_id,) in db.query(Settlement.id).filter(
+                Settlement.profile_id == profile_id,
+                Settlement.last_expense_id >= expense_id
+            ).all()
+        ]
+        if not settlement_ids:
+            return 0
+
+        db.query(MonthSnapshot).filter(
+            MonthSnapshot.settlement_id.in_(settlement_ids)
+        ).delete(synchronize_session=False)
+        db.query(SettlementGroupBalance).filter(
+            SettlementGroupBalance.settlement_id.in_(settlement_ids)
+        ).delete(synchronize_session=False)
+        db.query(Settlement).filter(
+            Settlement.id.in_(settlement_ids)
+        ).delete(synchronize_session=False)
+        return len(settlement_ids)
@@ -31,6 +31,24 @@ class ShoppingService:
         db.commit()
         return item
     
+    @staticmethod
+    def add_items(
+        db: Session,
+        titles: List[str],
+        category: ExpenseCategory,
+        created_by: int
+    ) -> List[str]:
+        """Add several items to shopping list in one commit"""
+        for title in titles:
+            db.add(ShoppingItem(
+                title=title,
+                category=category,
+                created_by=created_by
+            ))
+        
+        db.commit()
+        return titles
+    
     @staticmethod
     def get_items(
         db: Session, 
@@ -57,6 +75,27 @@ class ShoppingService:
         db.commit()
         return True
     
+    @staticmethod
+    def toggle_item(db: Session, item_id: int, user_id: int) -> Optional[ShoppingItem]:
+        """Toggle checked status of shopping item"""
+        item = db.query(ShoppingItem).filter(ShoppingItem.id == item_id).first()
+        if not item:
+            return None
+        
+        if item.is_checked:
+            # Uncheck item
+            item.is_checked = False
+            item.checked_at = None
+            item.checked_by = None
+        else:
+            # Check item
+            item.is_checked = True
+            item.checked_at = datetime.utcnow()
+            item.checked_by = user_id
+        
+        db.commit()
+        return item
+    
     @staticmethod
     def check_items(
         db: Session,
@@ -80,7 +119,7 @@ class ShoppingService:
     def create_shopping_expense(
         db: Session,
         item_ids: List[int],
-        total_amount: float,
+        total_amount: int,  # Minor units of currency
         currency: Currency,
         payer_id: int,
         profile_id: int,
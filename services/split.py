@@ -1,127 +1,129 @@
 """
 Expense splitting service
 """
-from typing import List, Dict, Tuple
+import os
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from models import Profile, ProfileMember, Expense, ExpenseAllocation, Currency
+from models import Expense, ExpenseAllocation, Currency
 from datetime import datetime
 
+# Above this many non-zero balances the settlement plan falls back to greedy matching
+# (the exact solver is O(2^n * n))
+SETTLEMENT_EXACT_MAX_PARTICIPANTS = int(os.getenv('SETTLEMENT_EXACT_MAX_PARTICIPANTS', '12'))
+
 class SplitService:
     """Service for calculating expense splits"""
     
     @staticmethod
-    def calculate_expense_split(
+    def calculate_user_balances(
         db: Session, 
-        expense: Expense, 
-        profile: Profile
-    ) -> List[ExpenseAllocation]:
+        month: datetime = None
+    ) -> Dict[int, Dict[str, int]]:
         """
-        Calculate how expense should be split among profile members
+        Calculate net balances for all users in a given month
         
         Args:
             db: Database session
-            expense: Expense record
-            profile: Split profile
+            month: Month to calculate for (defaults to current month)
             
         Returns:
-            List of allocations for each user
+            Dict mapping user_id to balance info
         """
-        # Get profile members with their groups and weights
-        members = db.query(ProfileMember).filter(
-            ProfileMember.profile_id == profile.id
-        ).all()
-        
-        if not members:
-            raise ValueError(f"Profile {profile.name} has no members")
-        
-        # Group members by group_name
-        groups: Dict[str, List[ProfileMember]] = {}
-        for member in members:
-            if member.group_name not in groups:
-                groups[member.group_name] = []
-            groups[member.group_name].append(member)
-        
-        # Calculate total weight across all groups
-        total_weight = sum(
-            sum(member.weight for member in group_members)
-            for group_members in groups.values()
-        )
-        
-        allocations = []
-        amount_sek = expense.amount_sek
-        
-        for group_name, group_members in groups.items():
-            # Calculate group's share
-            group_weight = sum(member.weight for member in group_members)
-            group_share = amount_sek * group_weight / total_weight
-            
-            # Split group share equally among group members
-            member_count = len(group_members)
-            member_share = group_share / member_count
-            
-            for member in group_members:
-                allocation = ExpenseAllocation(
-                    expense_id=expense.id,
-                    user_id=member.user_id,
-                    amount_sek=member_share,
-                    weight_used=member.weight
-                )
-                allocations.append(allocation)
-        
-        return allocations
+        if month is None:
+            month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        month_date = month.date()
+        
+        # Paid per payer
+        paid_rows = db.query(
+            Expense.payer_id, func.sum(Expense.amount_sek)
+        ).filter(
+            Expense.month == month_date
+        ).group_by(Expense.payer_id).all()
+        
+        # Owed per user (allocations of this month's expenses)
+        owed_rows = db.query(
+            ExpenseAllocation.user_id, func.sum(ExpenseAllocation.amount_sek)
+        ).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).filter(
+            Expense.month == month_date
+        ).group_by(ExpenseAllocation.user_id).all()
+        
+        balances = {}
+        
+        for user_id, paid in paid_rows:
+            balances.setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balances[user_id]['paid'] += paid or 0
+        
+        for user_id, owed in owed_rows:
+            balances.setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balances[user_id]['owed'] += owed or 0
+        
+        # Calculate net balances
+        for user_id, balance in balances.items():
+            balance['net'] = balance['owed'] - balance['paid']
+        
+        return balances
     
     @staticmethod
-    def calculate_user_balances(
-        db: Session, 
-        month: datetime = None
-    ) -> Dict[int, Dict[str, float]]:
+    def calculate_total_user_balances(
+        db: Session,
+        profile_id: int = None,
+        use_checkpoint: bool = True,
+        until_expense_id: Optional[int] = None
+    ) -> Dict[int, Dict[str, int]]:
         """
-        Calculate net balances for all users in a given month
+        Calculate all-time net balances for all users of a profile
+        
+        Starts from the latest settle-up checkpoint and adds only the expenses after it
+        (use_checkpoint=False scans the full history).
         
         Args:
             db: Database session
-            month: Month to calculate for (defaults to current month)
+            profile_id: Profile to calculate for (defaults to Home)
+            use_checkpoint: Start from the latest settlement checkpoint
+            until_expense_id: Include only expenses up to this ID
             
         Returns:
             Dict mapping user_id to balance info
         """
-        if month is None:
-            month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        from services.settlement import SettlementService
         
-        # Get all expenses for the month
-        expenses = db.query(Expense).filter(
-            Expense.month == month.date()
-        ).all()
+        if profile_id is None:
+            profile_id = SettlementService.get_default_profile_id(db)
+            if profile_id is None:
+                return {}
         
+        since_expense_id = 0
         balances = {}
+        if use_checkpoint:
+            since_expense_id, balances = SettlementService.get_user_checkpoint(db, profile_id)
         
-        for expense in expenses:
-            # Get allocations for this expense
-            allocations = db.query(ExpenseAllocation).filter(
-                ExpenseAllocation.expense_id == expense.id
-            ).all()
-            
-            # Add to payer's paid amount
-            if expense.payer_id not in balances:
-                balances[expense.payer_id] = {
-                    'paid': 0.0,
-                    'owed': 0.0,
-                    'net': 0.0
-                }
-            balances[expense.payer_id]['paid'] += expense.amount_sek
-            
-            # Add to each user's owed amount
-            for allocation in allocations:
-                if allocation.user_id not in balances:
-                    balances[allocation.user_id] = {
-                        'paid': 0.0,
-                        'owed': 0.0,
-                        'net': 0.0
-                    }
-                balances[allocation.user_id]['owed'] += allocation.amount_sek
+        expense_filter = [Expense.profile_id == profile_id, Expense.id > since_expense_id]
+        if until_expense_id is not None:
+            expense_filter.append(Expense.id <= until_expense_id)
         
-        # Calculate net balances
-        for user_id, balance in balances.items():
+        paid_rows = db.query(
+            Expense.payer_id, func.sum(Expense.amount_sek)
+        ).filter(*expense_filter).group_by(Expense.payer_id).all()
+        
+        owed_rows = db.query(
+            ExpenseAllocation.user_id, func.sum(ExpenseAllocation.amount_sek)
+        ).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).filter(*expense_filter).group_by(ExpenseAllocation.user_id).all()
+        
+        for user_id, paid in paid_rows:
+            balances.setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balances[user_id]['paid'] += paid or 0
+        
+        for user_id, owed in owed_rows:
+            balances.setdefault(user_id, {'paid': 0, 'owed': 0, 'net': 0})
+            balances[user_id]['owed'] += owed or 0
+        
+        for balance in balances.values():
             balance['net'] = balance['owed'] - balance['paid']
         
         return balances
@@ -129,27 +131,102 @@ class SplitService:
     @staticmethod
     def calculate_settlement_plan(
         db: Session, 
-        balances: Dict[int, Dict[str, float]]
+        balances: Dict[int, Dict[str, int]],
+        max_exact_participants: int = None
     ) -> List[Dict[str, any]]:
         """
-        Calculate optimal settlement plan (who owes whom how much)
+        Calculate settlement plan with the minimum number of transfers (who owes whom how much)
+        
+        Participants are partitioned into as many zero-sum groups as possible, each group
+        settles internally with (size - 1) transfers. Falls back to greedy matching above
+        max_exact_participants non-zero balances (SETTLEMENT_EXACT_MAX_PARTICIPANTS by default).
+        
+        Nets that don't add up to zero (participant splits leave the payer family's share
+        unallocated) are balanced by a pseudo-participant; its transfers are the residual
+        nobody owes and are left out of the plan.
         
         Args:
             db: Database session
             balances: User balances from calculate_user_balances
+            max_exact_participants: Override of SETTLEMENT_EXACT_MAX_PARTICIPANTS
             
         Returns:
             List of settlement transactions
         """
+        if max_exact_participants is None:
+            max_exact_participants = SETTLEMENT_EXACT_MAX_PARTICIPANTS
+        
+        nets = [(user_id, balance['net']) for user_id, balance in balances.items() if balance['net'] != 0]
+        residual = sum(net for _, net in nets)
+        if residual:
+            nets.append((None, -residual))
+        
+        if len(nets) > max_exact_participants:
+            settlements = SplitService.greedy_settlement_plan(nets)
+        else:
+            settlements = []
+            for group in SplitService.zero_sum_groups([net for _, net in nets]):
+                settlements.extend(SplitService.greedy_settlement_plan([nets[i] for i in group]))
+        return [
+            settlement for settlement in settlements
+            if settlement['from_user_id'] is not None and settlement['to_user_id'] is not None
+        ]
+    
+    @staticmethod
+    def zero_sum_groups(amounts: List[int]) -> List[List[int]]:
+        """Partition amounts (summing to zero) into the largest number of zero-sum groups
+        
+        Bitmask DP: groups[mask] is the most zero-sum groups a chain of removals from mask
+        passes through, memoized for every subset. Returns groups as lists of indexes.
+        """
+        n = len(amounts)
+        if n == 0:
+            return []
+        size = 1 << n
+        
+        sums = [0] * size
+        for mask in range(1, size):
+            low = mask & -mask
+            sums[mask] = sums[mask ^ low] + amounts[low.bit_length() - 1]
+        
+        groups = [0] * size
+        removed = [0] * size
+        for mask in range(1, size):
+            best, best_bit = -1, 0
+            rest = mask
+            while rest:
+                bit = rest & -rest
+                if groups[mask ^ bit] > best:
+                    best, best_bit = groups[mask ^ bit], bit
+                rest ^= bit
+            groups[mask] = best + (sums[mask] == 0)
+            removed[mask] = best_bit
+        
+        # Walk the optimal chain: members removed between two zero-sum subsets form a group
+        result = []
+        current = []
+        mask = size - 1
+        while mask:
+            bit = removed[mask]
+            current.append(bit.bit_length() - 1)
+            mask ^= bit
+            if sums[mask] == 0:
+                result.append(current)
+                current = []
+        return result
+    
+    @staticmethod
+    def greedy_settlement_plan(nets: List[Tuple[int, int]]) -> List[Dict[str, any]]:
+        """Match largest debts with largest credits for (user_id, net) pairs"""
         # Separate debtors and creditors
         debtors = []
         creditors = []
         
-        for user_id, balance in balances.items():
-            if balance['net'] < 0:  # Owe money
-                debtors.append((user_id, abs(balance['net'])))
-            elif balance['net'] > 0:  # Are owed money
-                creditors.append((user_id, balance['net']))
+        for user_id, net in nets:
+            if net < 0:  # Owe money
+                debtors.append((user_id, abs(net)))
+            elif net > 0:  # Are owed money
+                creditors.append((user_id, net))
         
         # Sort by amount (largest first)
         debtors.sort(key=lambda x: x[1], reverse=True)
@@ -178,12 +255,12 @@ class SplitService:
             debtor_amount -= settlement_amount
             creditor_amount -= settlement_amount
             
-            if debtor_amount <= 0.01:  # Small threshold for floating point
+            if debtor_amount == 0:  # Amounts are whole öre, no rounding threshold
                 debtor_idx += 1
             else:
                 debtors[debtor_idx] = (debtor_id, debtor_amount)
             
-            if creditor_amount <= 0.01:
+            if creditor_amount == 0:
                 creditor_idx += 1
             else:
                 creditors[creditor_idx] = (creditor_id, creditor_amount)
@@ -0,0 +1,159 @@
+"""
+Compiled split rules
+
+Every way of splitting an expense compiles into a SplitRule: user IDs with weights and
+the total they are divided by. Rules are compiled from the membership registry's index
+and memoized on it, so allocations are pure integer arithmetic with no queries - one
+expense or a whole batch.
+
+    category      FOOD / OTHER: every user, ALCOHOL: everyone except Миша
+    participants  selected participants from the payer's opposite family, each owes
+                  amount / number of selected participants
+    families      the whole amount on the payer's opposite family
+    profile       weighted profile: group share by group weight, equal inside a group
+
+Compiled rules are dropped together with the index when membership changes.
+"""
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from models import ExpenseCategory
+from services.membership import MembershipIndex, membership_registry
+from utils.money import round_allocations
+
+# Алкоголь - все кроме Миши (брата)
+ALCOHOL_EXCLUDED_TELEGRAM_IDS = frozenset({6379711500})
+
+class SplitRule(NamedTuple):
+    """Compiled rule: each user owes amount * weight / total"""
+    user_ids: Tuple[int, ...]
+    weights: Tuple[float, ...]
+    total: float
+
+    def allocate(self, amount: int) -> Dict[int, int]:
+        """Whole öre shares of amount_sek"""
+        if not self.user_ids:
+            return {}
+        return round_allocations({
+            user_id: amount * weight / self.total
+            for user_id, weight in zip(self.user_ids, self.weights)
+        })
+
+EMPTY_RULE = SplitRule((), (), 1.0)
+
+def equal_rule(user_ids: Iterable[int], total: Optional[int] = None) -> SplitRule:
+    """Equal shares (divided by total people, default: the users themselves)"""
+    user_ids = tuple(sorted(user_ids))
+    if not user_ids:
+        return EMPTY_RULE
+    return SplitRule(user_ids, (1.0,) * len(user_ids), float(total or len(user_ids)))
+
+class SplitEngine:
+    """Compiled rules memoized on one membership index"""
+
+    def __init__(self, membership: MembershipIndex):
+        self.membership = membership
+        self.users = membership.telegram_ids  # user_id -> telegram_id
+        self.user_ids = membership.user_ids  # telegram_id -> user_id
+        self.profile_members = membership.profile_members  # profile_id -> [(user_id, group_name, weight)]
+        self._rules: Dict[tuple, SplitRule] = {}
+
+    def _opposite_family(self, payer_id: int) -> FrozenSet[int]:
+        """Telegram IDs of the family the payer doesn't belong to"""
+        first, second = self.membership.families
+        return second if self.membership.group_of(payer_id) == 1 else first
+
+    def category_rule(self, category: ExpenseCategory) -> SplitRule:
+        key = ("category", category)
+        rule = self._rules.get(key)
+        if rule is None:
+            excluded = ALCOHOL_EXCLUDED_TELEGRAM_IDS if category == ExpenseCategory.ALCOHOL else frozenset()
+            rule = self._rules[key] = equal_rule(
+                user_id for user_id, telegram_id in self.users.items() if telegram_id not in excluded
+            )
+        return rule
+
+    def participants_rule(self, payer_id: int, selected_participants: Set[int]) -> SplitRule:
+        """Only the opposite family owes, everyone's share is amount / selected participants"""
+        selected = frozenset(selected_participants or ())
+        key = ("participants", payer_id, selected)
+        rule = self._rules.get(key)
+        if rule is None:
+            if payer_id not in self.users or not selected:
+                rule = EMPTY_RULE
+            else:
+                opposite = self._opposite_family(payer_id)
+                rule = equal_rule(
+                    (self.user_ids[telegram_id] for telegram_id in selected
+                     if telegram_id in opposite and telegram_id in self.user_ids),
+                    total=len(selected)
+                )
+            self._rules[key] = rule
+        return rule
+
+    def families_rule(self, payer_id: int) -> SplitRule:
+        """'За другую семью' - the whole amount on the opposite family"""
+        key = ("families", payer_id)
+        rule = self._rules.get(key)
+        if rule is None:
+            if payer_id not in self.users:
+                rule = EMPTY_RULE
+            else:
+                opposite = self._opposite_family(payer_id)
+                rule = equal_rule(self.user_ids[telegram_id] for telegram_id in opposite if telegram_id in self.user_ids)
+            self._rules[key] = rule
+        return rule
+
+    def profile_rule(self, profile_id: int) -> SplitRule:
+        """Weighted profile: groups share by total weight, members equally inside a group"""
+        key = ("profile", profile_id)
+        rule = self._rules.get(key)
+        if rule is None:
+            members = self.profile_members.get(profile_id)
+            if not members:
+                raise ValueError(f"Profile {profile_id} has no members")
+            groups: Dict[str, List[Tuple[int, float]]] = {}
+            for user_id, group_name, weight in members:
+                groups.setdefault(group_name, []).append((user_id, weight))
+            user_ids, weights = [], []
+            for group_members in groups.values():
+                group_weight = sum(weight for _, weight in group_members)
+                for user_id, _ in group_members:
+                    user_ids.append(user_id)
+                    weights.append(group_weight / len(group_members))
+            rule = self._rules[key] = SplitRule(tuple(user_ids), tuple(weights), float(sum(weights)))
+        return rule
+
+    def rule_for(self, category: ExpenseCategory, payer_id: int, split_type: Optional[str] = None,
+                 selected_participants: Optional[Set[int]] = None) -> SplitRule:
+        """Rule of an expense, same arguments as ExpenseService.create_expense"""
+        if split_type == "split_families":
+            return self.families_rule(payer_id)
+        if split_type == "participants" and selected_participants:
+            return self.participants_rule(payer_id, selected_participants)
+        return self.category_rule(category)
+
+    def allocate_batch(self, items: Iterable[Tuple[SplitRule, int]]) -> List[Dict[int, int]]:
+        """Shares for many (rule, amount_sek) pairs at once"""
+        return [rule.allocate(amount) for rule, amount in items]
+
+class SplitEngineCache:
+    """Process-wide SplitEngine, rebuilt whenever the membership index is reloaded"""
+
+    def __init__(self):
+        self._engine: Optional[SplitEngine] = None
+
+    def get(self, db: Session) -> SplitEngine:
+        """Get the compiled engine for the current membership index"""
+        membership = membership_registry.get(db)
+        engine = self._engine
+        if engine is None or engine.membership is not membership:
+            engine = self._engine = SplitEngine(membership)
+        return engine
+
+    def invalidate(self) -> None:
+        """Drop compiled rules and the membership index"""
+        self._engine = None
+        membership_registry.invalidate()
+
+# Shared by all handlers in this process
+split_engine_cache = SplitEngineCache()
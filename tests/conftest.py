@@ -0,0 +1,11 @@
+"""
+Test setup: repository root on sys.path, in-memory SQLite instead of DATABASE_URL
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Before db is imported anywhere: never touch env.production / a real database
+os.environ["DATABASE_URL"] = "sqlite:///:memory:"
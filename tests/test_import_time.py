@@ -0,0 +1,65 @@
+"""
+Regression check: cold import time of `bot`
+
+Runs `python -X importtime -c "import bot"` in fresh interpreters and reads the
+cumulative time of the `bot` module. Fails when it is over budget or when handler
+modules, services, models or db are imported eagerly again.
+"""
+import os
+import subprocess
+import sys
+from typing import Dict
+
+from conftest import ROOT_DIR
+
+# Cumulative import time of `bot` (best of IMPORT_TIME_REPEAT runs)
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', '600'))
+IMPORT_TIME_REPEAT = int(os.getenv('IMPORT_TIME_REPEAT', '3'))
+
+# Must stay lazy: loaded by handlers/registry.py or main() on first use
+LAZY_MODULES = ("db", "models", "seed", "migrations", "utils.db_session", "utils.db_executor")
+LAZY_PACKAGES = ("services.",)
+EAGER_HANDLER_MODULES = ("handlers.registry", "handlers.router")
+
+def import_times() -> Dict[str, int]:
+    """Import bot in a fresh interpreter, return cumulative microseconds per module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        cwd=ROOT_DIR, env=dict(os.environ), capture_output=True, text=True
+    )
+    assert result.returncode == 0, f"import bot failed:\n{result.stderr[-2000:]}"
+
+    # Format: "import time: self [us] | cumulative | imported package"
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def eager_imports(times: Dict[str, int]) -> list:
+    """Modules that should have been imported lazily"""
+    eager = []
+    for name in times:
+        if name in LAZY_MODULES or name.startswith(LAZY_PACKAGES):
+            eager.append(name)
+        elif name.startswith("handlers.") and name not in EAGER_HANDLER_MODULES:
+            eager.append(name)
+    return sorted(eager)
+
+def heaviest(times: Dict[str, int], count: int = 8) -> str:
+    top_level = {name: us for name, us in times.items() if "." not in name and name != "bot"}
+    return ", ".join(
+        f"{name} {us / 1000:.0f} ms" for name, us in sorted(top_level.items(), key=lambda item: -item[1])[:count]
+    )
+
+def test_bot_import_stays_lazy():
+    assert eager_imports(import_times()) == []
+
+def test_bot_import_within_budget():
+    best = min((import_times() for _ in range(IMPORT_TIME_REPEAT)), key=lambda times: times["bot"])
+    bot_ms = best["bot"] / 1000
+    assert bot_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"import bot took {bot_ms:.0f} ms > {IMPORT_TIME_BUDGET_MS} ms; heaviest: {heaviest(best)}"
+    )
@@ -0,0 +1,119 @@
+"""
+Settlement plan: minimum-transfer solver on real and random balances
+
+A month with participant splits is not zero-sum (the payer family's share of the
+selected people isn't allocated to anyone); the exact solver must still run on it and
+leave only that residual unsettled.
+"""
+import random
+from functools import lru_cache
+
+import pytest
+
+from db import init_db, SessionLocal
+from models import Currency, ExpenseCategory
+from services.expense_service import ExpenseService
+from services.membership import membership_registry
+from services.split import SplitService
+
+@pytest.fixture(scope="module")
+def db():
+    init_db()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def remaining_nets(balances: dict, plan: list) -> dict:
+    """Nets after every transfer of the plan (transfers move money from negative nets)"""
+    nets = {user_id: balance['net'] for user_id, balance in balances.items()}
+    for transfer in plan:
+        assert transfer['amount_sek'] > 0
+        nets[transfer['from_user_id']] += transfer['amount_sek']
+        nets[transfer['to_user_id']] -= transfer['amount_sek']
+    return nets
+
+def brute_force_transfers(amounts: list) -> int:
+    """Minimum transfers by trying every way to split off a zero-sum group"""
+    @lru_cache(maxsize=None)
+    def best(remaining: tuple) -> int:
+        if not remaining:
+            return 0
+        first, rest = remaining[0], remaining[1:]
+        result = len(remaining) - 1
+        for mask in range(1, 1 << len(rest)):
+            group = [rest[i] for i in range(len(rest)) if mask >> i & 1]
+            if first + sum(group) == 0:
+                others = tuple(rest[i] for i in range(len(rest)) if not mask >> i & 1)
+                result = min(result, len(group) + best(others))
+        return result
+
+    return best(tuple(amount for amount in amounts if amount))
+
+def random_balances(rng: random.Random, participants: int, residual: int = 0) -> dict:
+    """Öre balances from random zero-sum groups of 2-4 people, off by residual"""
+    nets = []
+    while len(nets) < participants:
+        size = min(rng.randint(2, 4), participants - len(nets))
+        if size == 1:
+            extra = rng.randint(1, 500_000)
+            nets[-1] -= extra
+            nets.append(extra)
+            continue
+        group = [rng.randint(-500_000, 500_000) for _ in range(size - 1)]
+        group.append(-sum(group))
+        nets.extend(group)
+    nets[0] += residual
+    rng.shuffle(nets)
+    return {user_id: {'paid': 0, 'owed': 0, 'net': net} for user_id, net in enumerate(nets, 1)}
+
+def test_participants_split_month(db):
+    membership = membership_registry.get(db)
+    profile = ExpenseService.get_or_create_home_profile(db)
+    everyone = set(membership.allowed_telegram_ids)
+    for amount, (payer_telegram_id, _) in zip((10_000, 24_950, 7_300, 18_001), membership.participants()):
+        ExpenseService.create_expense(
+            db=db, amount=amount, currency=Currency.SEK, category=ExpenseCategory.OTHER,
+            payer_id=membership.user_ids[payer_telegram_id], profile_id=profile.id,
+            custom_category_name="ужин", split_type="participants", selected_participants=everyone
+        )
+
+    balances = SplitService.calculate_user_balances(db)
+    residual = sum(balance['net'] for balance in balances.values())
+    assert residual != 0
+
+    plan = SplitService.calculate_settlement_plan(db, balances)
+    # Only the residual stays, on the people the pseudo-participant was matched with
+    nets = remaining_nets(balances, plan)
+    assert sum(nets.values()) == residual
+    assert sum(abs(net) for net in nets.values()) == abs(residual)
+    # Exact solver: at least one of the minimum transfers involves the pseudo-participant
+    amounts = [balance['net'] for balance in balances.values()] + [-residual]
+    assert len(plan) <= brute_force_transfers(amounts) - 1
+
+@pytest.mark.parametrize("participants", range(2, 13))
+def test_exact_plan_is_minimal(participants):
+    rng = random.Random(participants)
+    for _ in range(30):
+        balances = random_balances(rng, participants)
+        plan = SplitService.calculate_settlement_plan(None, balances, max_exact_participants=participants)
+        greedy = SplitService.calculate_settlement_plan(None, balances, max_exact_participants=0)
+        assert not any(remaining_nets(balances, plan).values())
+        assert not any(remaining_nets(balances, greedy).values())
+        assert len(plan) <= len(greedy)
+        if participants <= 8:
+            assert len(plan) == brute_force_transfers([balance['net'] for balance in balances.values()])
+
+@pytest.mark.parametrize("participants", range(2, 13))
+def test_residual_is_carried_separately(participants):
+    rng = random.Random(1000 + participants)
+    for _ in range(30):
+        residual = rng.choice((-1, 1)) * rng.randint(1, 50_000)
+        balances = random_balances(rng, participants, residual)
+        plan = SplitService.calculate_settlement_plan(None, balances, max_exact_participants=participants + 1)
+        nets = remaining_nets(balances, plan)
+        assert sum(abs(net) for net in nets.values()) == abs(residual)
+        if participants <= 8:
+            amounts = [balance['net'] for balance in balances.values()] + [-residual]
+            assert len(plan) <= brute_force_transfers(amounts) - 1
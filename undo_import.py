@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Undo an /import batch (e.g. one left "running" when the bot stopped mid-import)
+
+Usage: python undo_import.py [import_id ...]
+  without IDs lists import batches and undoes nothing
+"""
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db import init_db, get_db
+from models import ExpenseImport
+from services.expense_import import ExpenseImporter
+
+def undo_imports(import_ids) -> None:
+    init_db()
+    db = next(get_db())
+    
+    try:
+        if not import_ids:
+            print("📥 Импорты:")
+            for batch in db.query(ExpenseImport).order_by(ExpenseImport.id).all():
+                print(f"  {batch.id}: {batch.file_name or '—'}, {batch.status}, {batch.created_at:%d.%m.%Y %H:%M}")
+            return
+        
+        for import_id in import_ids:
+            count = ExpenseImporter.undo(db, import_id)
+            print(f"🗑 Импорт {import_id}: удалено расходов {count}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    undo_imports([int(value) for value in sys.argv[1:]])
@@ -3,24 +3,21 @@ Access control utilities for the bot
 """
 from telegram import Update
 from telegram.ext import ContextTypes
-from services.flexible_split import FlexibleSplitService
-from typing import List, Set
+from services.membership import membership_registry
+from typing import List
 
 class AccessControl:
     """Access control for the bot"""
     
-    # Whitelist of allowed Telegram user IDs
-    ALLOWED_USER_IDS: Set[int] = set(FlexibleSplitService.GROUP_1_IDS + FlexibleSplitService.GROUP_2_IDS)
-    
     @classmethod
     def is_user_allowed(cls, telegram_id: int) -> bool:
-        """Check if user is allowed to use the bot"""
-        return telegram_id in cls.ALLOWED_USER_IDS
+        """Check if user is allowed to use the bot (profile members are the whitelist)"""
+        return telegram_id in membership_registry.current().allowed_telegram_ids
     
     @classmethod
     def get_allowed_users(cls) -> List[int]:
         """Get list of all allowed user IDs"""
-        return list(cls.ALLOWED_USER_IDS)
+        return list(membership_registry.current().allowed_telegram_ids)
     
     @classmethod
     def check_access(cls, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
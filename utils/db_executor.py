@@ -0,0 +1,168 @@
+"""
+Bounded executor for blocking database work
+
+Handlers submit sync service calls here instead of running them on the event loop.
+The thread pool is sized to the connection pool, so a worker never waits for a connection.
+"""
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any
+from db import SessionLocal, DB_POOL_CAPACITY
+from utils.db_session import current_update_session, UpdateSession, _get_connection_slots
+
+# Backpressure configuration (read from environment)
+DB_EXECUTOR_QUEUE_SIZE = int(os.getenv('DB_EXECUTOR_QUEUE_SIZE', '100'))  # work units waiting for a worker
+DB_EXECUTOR_POLICY = os.getenv('DB_EXECUTOR_POLICY', 'queue').strip().lower()  # 'queue' or 'reject'
+
+class DBExecutorSaturated(RuntimeError):
+    """Raised when the executor queue is full and the policy is 'reject'"""
+
+class DBExecutor:
+    """Thread pool for blocking DB work units with backpressure and metrics"""
+
+    POLICIES = ('queue', 'reject')
+
+    def __init__(self, max_workers: int, max_queue: int, policy: str = 'queue'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown DB executor policy: {policy}")
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.policy = policy
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self._capacity = max_workers + max_queue
+        self._slots = None  # asyncio.Semaphore, created lazily inside the running loop
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        """Get semaphore limiting in-flight work units (running + queued)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._capacity)
+        return self._slots
+
+    async def submit(self, func: Callable, *args, **kwargs) -> Any:
+        """Run blocking func in the pool, applying backpressure when saturated"""
+        slots = self._get_slots()
+
+        if slots.locked() and self.policy == 'reject':
+            with self._lock:
+                self._rejected += 1
+            raise DBExecutorSaturated("База данных перегружена, попробуйте еще раз")
+
+        # Queue depth and wait time include time spent blocked on backpressure
+        submitted_at = time.perf_counter()
+        state = {"started": False}
+        with self._lock:
+            self._queued += 1
+
+        def work():
+            started_at = time.perf_counter()
+            with self._lock:
+                state["started"] = True
+                self._queued -= 1
+                self._running += 1
+                waited = started_at - submitted_at
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._run_total += elapsed
+                    self._run_max = max(self._run_max, elapsed)
+
+        try:
+            async with slots:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, work)
+        finally:
+            # Cancelled before a worker picked it up
+            with self._lock:
+                if not state["started"]:
+                    self._queued -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Get executor metrics snapshot"""
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.max_workers,
+                "policy": self.policy,
+                "queue_depth": self._queued,
+                "running": self._running,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": (self._wait_total / completed * 1000) if completed else 0.0,
+                "max_wait_ms": self._wait_max * 1000,
+                "avg_run_ms": (self._run_total / completed * 1000) if completed else 0.0,
+                "max_run_ms": self._run_max * 1000,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop worker threads"""
+        self._executor.shutdown(wait=wait)
+
+# Shared executor sized to the connection pool
+db_executor = DBExecutor(
+    max_workers=DB_POOL_CAPACITY,
+    max_queue=DB_EXECUTOR_QUEUE_SIZE,
+    policy=DB_EXECUTOR_POLICY
+)
+
+def _run_with_session(func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Worker side: open a session, run the work unit, close the session"""
+    db = SessionLocal()
+    try:
+        return func(db, *args, **kwargs)
+    finally:
+        db.close()
+
+def _run_in_update_session(scope: UpdateSession, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Worker side: run the work unit on the session of the current update and commit it"""
+    try:
+        result = func(scope.session, *args, **kwargs)
+    except BaseException:
+        scope.rollback()
+        raise
+    # Before the handler replies: the user is only told about committed data, and
+    # row locks / the SQLite writer lock aren't held across Telegram round trips
+    scope.commit()
+    return result
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """Run func(db, *args, **kwargs) on the shared DB executor
+
+    Inside a handler the update's connection is reused and the unit is committed when it
+    returns, otherwise a fresh session is opened.
+    """
+    # Worker threads don't inherit context vars - pass the update session explicitly
+    scope = current_update_session.get()
+    if scope is not None:
+        await scope.reserve()
+        return await db_executor.submit(_run_in_update_session, scope, func, args, kwargs)
+    return await db_executor.submit(_run_with_session, func, args, kwargs)
+
+async def run_db_detached(func: Callable, *args, **kwargs) -> Any:
+    """Run func(db, *args, **kwargs) on a fresh session of its own, also inside a handler
+
+    For long jobs (imports) whose work units commit on their own instead of holding the
+    update transaction across awaits. Takes a connection slot while it runs.
+    """
+    async with _get_connection_slots():
+        return await db_executor.submit(_run_with_session, func, args, kwargs)
@@ -0,0 +1,188 @@
+"""
+Session-per-update middleware
+
+Every handler callback runs inside one UpdateSession: a single connection checkout for
+the whole update. Each run_db work unit is one transaction on it, committed when the unit
+returns (rolled back if it raises) - before the handler replies, so a confirmation is
+only sent for saved data and no lock is held across Telegram round trips. Services keep
+calling db.commit() - inside a unit that only flushes. Process-cache updates that must
+wait for the real commit are registered with after_commit().
+"""
+import asyncio
+import functools
+from contextvars import ContextVar
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from telegram import Update
+from telegram.ext import Application, CallbackContext, ExtBot
+from db import engine, DB_POOL_CAPACITY
+
+# Connections held by in-flight updates; created lazily inside the running loop
+_connection_slots: Optional[asyncio.Semaphore] = None
+
+def _get_connection_slots() -> asyncio.Semaphore:
+    global _connection_slots
+    if _connection_slots is None:
+        _connection_slots = asyncio.Semaphore(DB_POOL_CAPACITY)
+    return _connection_slots
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run callback once the current transaction of db is really committed
+
+    Inside an update that is the end of the work unit, not the service's commit() (a flush).
+    Dropped if the transaction rolls back; runs at once when db has no open transaction.
+    """
+    if "update_session" not in db.info and not db.in_transaction():
+        callback()
+        return
+    db.info.setdefault("after_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session: Session) -> None:
+    # Update sessions run the callbacks in UpdateSession, after the outer commit
+    if "update_session" not in session.info:
+        for callback in session.info.pop("after_commit", []):
+            callback()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session: Session) -> None:
+    session.info.pop("after_commit", None)
+
+class UpdateSession:
+    """Lazily opened session bound to one connection and one outer transaction"""
+
+    def __init__(self):
+        self._connection = None
+        self._session = None
+        self._has_slot = False
+
+    async def reserve(self) -> None:
+        """Wait (without blocking a DB worker) until the pool has a connection for this update"""
+        # Update sessions hold their connection across awaits - a worker blocked on pool
+        # checkout could wait forever for updates that need a worker to finish
+        if not self._has_slot:
+            await _get_connection_slots().acquire()
+            self._has_slot = True
+
+    def release(self) -> None:
+        """Give the connection slot back to waiting updates"""
+        if self._has_slot:
+            _get_connection_slots().release()
+            self._has_slot = False
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> Session:
+        """Get session, checking out a connection on first use and beginning a transaction"""
+        if self._session is None:
+            self._connection = engine.connect()
+            # rollback_only: service commit() calls don't end the work unit's transaction
+            self._session = Session(
+                bind=self._connection,
+                join_transaction_mode="rollback_only",
+                autoflush=False,
+                expire_on_commit=False,
+                info={"update_session": True}
+            )
+        if not self._connection.in_transaction():
+            self._connection.begin()
+        return self._session
+
+    def _end_transaction(self, commit: bool) -> None:
+        """Commit or roll back the current transaction, the connection stays checked out"""
+        if not self._connection.in_transaction():
+            return
+        callbacks = []
+        try:
+            if commit:
+                # Flushes pending changes (or commits if a service rollback restarted the transaction)
+                self._session.commit()
+                if self._connection.in_transaction():
+                    self._connection.commit()
+                callbacks = self._session.info.pop("after_commit", [])
+            else:
+                self._session.rollback()
+                if self._connection.in_transaction():
+                    self._connection.rollback()
+        except Exception:
+            self._session.info.pop("after_commit", None)
+            if self._connection.in_transaction():
+                self._connection.rollback()
+            raise
+
+        for callback in callbacks:
+            callback()
+
+    def commit(self) -> None:
+        """Commit the work done so far (end of a work unit), keep the connection"""
+        if self._session is not None:
+            self._end_transaction(True)
+
+    def rollback(self) -> None:
+        """Roll back the work since the last commit, keep the connection"""
+        if self._session is not None:
+            self._end_transaction(False)
+
+    def close(self, commit: bool = True) -> None:
+        """Commit or roll back what is left of the update and return the connection"""
+        if self._session is None:
+            return
+
+        try:
+            self._end_transaction(commit)
+        finally:
+            self._session.close()
+            self._connection.close()
+            self._session = None
+            self._connection = None
+
+# Session of the update being processed in the current task
+current_update_session: ContextVar[Optional[UpdateSession]] = ContextVar("current_update_session", default=None)
+
+class BotContext(CallbackContext[ExtBot, dict, dict, dict]):
+    """Callback context with the per-update DB session as context.db"""
+
+    @property
+    def db(self) -> Session:
+        # Blocking: prefer run_db(), which reuses this session off the event loop
+        scope = current_update_session.get()
+        if scope is None:
+            raise RuntimeError("context.db used outside of a DB session scope")
+        return scope.session
+
+def with_db_session(func):
+    """Decorator to run a handler on one DB connection (a transaction per run_db work unit)"""
+    @functools.wraps(func)
+    async def wrapper(update: Update, context: CallbackContext):
+        # Nested handler call (e.g. re-rendering a menu) - reuse the outer session
+        if current_update_session.get() is not None:
+            return await func(update, context)
+
+        scope = UpdateSession()
+        token = current_update_session.set(scope)
+        try:
+            result = await func(update, context)
+        except BaseException:
+            if scope.opened:
+                await asyncio.to_thread(scope.close, False)
+            raise
+        else:
+            # Not via db_executor: the commit must not be rejected or queued behind waiting writers
+            if scope.opened:
+                await asyncio.to_thread(scope.close, True)
+            return result
+        finally:
+            scope.release()
+            current_update_session.reset(token)
+
+    return wrapper
+
+def install_db_session_middleware(application: Application) -> None:
+    """Wrap every registered handler callback with with_db_session"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = with_db_session(handler.callback)
@@ -3,6 +3,7 @@ Telegram inline keyboard utilities
 """
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from models import ExpenseCategory, Currency
+from services.membership import MembershipIndex
 
 def main_menu_keyboard() -> InlineKeyboardMarkup:
     """Main menu keyboard"""
@@ -89,42 +90,26 @@ def back_keyboard(callback_data: str = "main_menu") -> InlineKeyboardMarkup:
     keyboard = [[InlineKeyboardButton("🔙 Назад", callback_data=callback_data)]]
     return InlineKeyboardMarkup(keyboard)
 
-def split_choice_keyboard(selected_participants: set = None) -> InlineKeyboardMarkup:
+def participant_buttons(membership: MembershipIndex, selected_participants: set = frozenset()) -> list:
+    """Participant toggle buttons, two per row, from the membership index"""
+    buttons = [
+        InlineKeyboardButton(
+            f"✅ {name}" if telegram_id in selected_participants else f"👤 {name}",
+            callback_data=f"participant_{telegram_id}"
+        )
+        for telegram_id, name in membership.participants()
+    ]
+    return [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
+
+def split_choice_keyboard(membership: MembershipIndex, selected_participants: set = None) -> InlineKeyboardMarkup:
     """Split choice keyboard for OTHER category expenses - shows all participants directly"""
     if selected_participants is None:
         selected_participants = set()
     
-    # Map participant names to telegram_ids
-    participant_map = {
-        "senya": 804085588,
-        "dasha": 916228993,
-        "dima": 350653235,
-        "katya": 252901018,
-        "misha": 6379711500
-    }
-    
-    # Проверяем, выбраны ли участники из РАЗНЫХ групп
-    from services.flexible_split import FlexibleSplitService
-    group_1_selected = any(telegram_id in FlexibleSplitService.GROUP_1_IDS for telegram_id in selected_participants)
-    group_2_selected = any(telegram_id in FlexibleSplitService.GROUP_2_IDS for telegram_id in selected_participants)
-    
     # Можно подтвердить только если есть участники из ОБЕИХ групп (не только из одной)
-    only_group_1 = group_1_selected and not group_2_selected
-    only_group_2 = group_2_selected and not group_1_selected
-    can_confirm = len(selected_participants) >= 2 and not (only_group_1 or only_group_2)
+    can_confirm = len(selected_participants) >= 2 and len(membership.selected_groups(selected_participants)) != 1
     
-    keyboard = [
-        [
-            InlineKeyboardButton("✅ Арсентий" if 804085588 in selected_participants else "👤 Арсентий", callback_data="participant_senya"),
-            InlineKeyboardButton("✅ Даша" if 916228993 in selected_participants else "👤 Даша", callback_data="participant_dasha")
-        ],
-        [
-            InlineKeyboardButton("✅ Катя" if 252901018 in selected_participants else "👤 Катя", callback_data="participant_katya"),
-            InlineKeyboardButton("✅ Дима" if 350653235 in selected_participants else "👤 Дима", callback_data="participant_dima")
-        ],
-        [
-            InlineKeyboardButton("✅ Миша" if 6379711500 in selected_participants else "👤 Миша", callback_data="participant_misha")
-        ],
+    keyboard = participant_buttons(membership, selected_participants) + [
         [
             InlineKeyboardButton("❌ Без разделения", callback_data="no_split")
         ],
@@ -168,20 +153,9 @@ def pagination_keyboard(
     keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="main_menu")])
     return InlineKeyboardMarkup(keyboard)
 
-def participants_selection_keyboard() -> InlineKeyboardMarkup:
+def participants_selection_keyboard(membership: MembershipIndex) -> InlineKeyboardMarkup:
     """Keyboard for selecting participants for OTHER category expenses"""
-    keyboard = [
-        [
-            InlineKeyboardButton("👤 Сеня", callback_data="participant_senya"),
-            InlineKeyboardButton("👤 Даша", callback_data="participant_dasha")
-        ],
-        [
-            InlineKeyboardButton("👤 Дима", callback_data="participant_dima"),
-            InlineKeyboardButton("👤 Катя", callback_data="participant_katya")
-        ],
-        [
-            InlineKeyboardButton("👤 Миша", callback_data="participant_misha")
-        ],
+    keyboard = participant_buttons(membership) + [
         [
             InlineKeyboardButton("✅ Подтвердить выбор", callback_data="confirm_participants")
         ],
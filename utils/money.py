@@ -0,0 +1,48 @@
+"""
+Money in integer minor units (öre, cents, kopecks)
+
+Amounts are stored and summed as integers, so aggregates are exact and reproducible.
+Decimal amounts only appear at the boundaries: parsing user input and formatting
+(utils/texts.format_amount).
+"""
+from decimal import Decimal, InvalidOperation, ROUND_FLOOR, ROUND_HALF_UP
+from typing import Dict, Hashable, Optional
+
+MINOR_UNITS = 100
+
+def to_minor(amount) -> int:
+    """Decimal amount (float, str or Decimal) to minor units, rounded half up"""
+    value = Decimal(str(amount)) * MINOR_UNITS
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def parse_minor(text: str) -> Optional[int]:
+    """Parse user input like "12,50" to minor units (None if it's not a number)"""
+    try:
+        return to_minor(Decimal(text.strip().replace(',', '.')))
+    except (InvalidOperation, ValueError):
+        return None
+
+def from_minor(minor: int) -> float:
+    """Minor units to a decimal amount (for display and external formats only)"""
+    return minor / MINOR_UNITS
+
+def convert_minor(minor: int, rate: float) -> int:
+    """Convert minor units with an exchange rate, rounded half up"""
+    value = Decimal(minor) * Decimal(str(rate))
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def round_allocations(shares: Dict[Hashable, float]) -> Dict[Hashable, int]:
+    """Round fractional minor-unit shares to integers that add up to the rounded total
+
+    Largest remainder method: every share is floored, the leftover units go to the
+    shares with the largest fractional parts (ties by key order).
+    """
+    if not shares:
+        return {}
+    total = int(Decimal(str(sum(shares.values()))).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    floors = {key: int(Decimal(str(share)).to_integral_value(rounding=ROUND_FLOOR)) for key, share in shares.items()}
+    leftover = total - sum(floors.values())
+    order = sorted(shares, key=lambda key: shares[key] - floors[key], reverse=True)
+    for key in order[:leftover]:
+        floors[key] += 1
+    return floors
@@ -0,0 +1,130 @@
+"""
+Process-local exchange rate cache
+
+Keyed by (from_currency, to_currency), holds the active rate, so expenses in foreign
+currency don't query exchange_rates. For lookups at a past timestamp the full rate
+history of a pair is loaded once into a sorted interval index and searched with bisect.
+Rate changes bump a version counter in db_meta; the cache compares it (one primary key
+read) at most once per RATE_CACHE_REVALIDATE_INTERVAL and drops everything when another
+worker changed rates.
+"""
+import os
+import time
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from models import Currency, ExchangeRate
+from migrations import get_meta, set_meta
+
+RATE_VERSION_KEY = "exchange_rate_version"
+RATE_CACHE_REVALIDATE_INTERVAL = float(os.getenv('RATE_CACHE_REVALIDATE_INTERVAL', '10'))  # seconds
+
+def bump_rate_version(conn: Connection) -> None:
+    """Mark exchange rates as changed for every worker (call in the same transaction as the change)"""
+    value = get_meta(conn, RATE_VERSION_KEY)
+    set_meta(conn, RATE_VERSION_KEY, str(int(value or 0) + 1))
+
+def _naive(value: datetime) -> datetime:
+    """Compare timestamps as naive UTC (seeded rates may come back timezone-aware)"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class CachedRate(NamedTuple):
+    """Active rate of a currency pair"""
+    rate: float
+    valid_until: Optional[datetime]
+
+class RateIntervals(NamedTuple):
+    """Validity intervals of a currency pair sorted by valid_from"""
+    starts: List[datetime]
+    ends: List[Optional[datetime]]
+    rates: List[float]
+
+    def rate_at(self, at: datetime) -> Optional[float]:
+        """Rate of the newest interval that started at or before at (None if at falls in no interval)"""
+        index = bisect_right(self.starts, at) - 1
+        if index < 0:
+            return None
+        end = self.ends[index]
+        if end is not None and at >= end:
+            return None
+        return self.rates[index]
+
+class ExchangeRateCache:
+    """(from_currency, to_currency) -> active rate with db_meta version revalidation"""
+
+    def __init__(self, revalidate_interval: float = RATE_CACHE_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self._rates: Dict[Tuple[Currency, Currency], CachedRate] = {}
+        self._intervals: Dict[Tuple[Currency, Currency], RateIntervals] = {}
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._validated_at = 0.0
+
+    def get(self, db: Session, from_currency: Currency, to_currency: Currency) -> Optional[float]:
+        """Get cached rate (revalidates the cache first if the interval has passed)"""
+        if self._version is None or time.monotonic() - self._validated_at >= self.revalidate_interval:
+            self.revalidate(db)
+        cached = self._rates.get((from_currency, to_currency))
+        if cached is None:
+            return None
+        if cached.valid_until is not None and cached.valid_until <= datetime.utcnow():
+            return None
+        return cached.rate
+
+    def get_rate_at(self, db: Session, from_currency: Currency, to_currency: Currency, at: datetime) -> Optional[float]:
+        """Rate valid at a timestamp from the interval index (loads the pair history on first use)"""
+        if self._version is None or time.monotonic() - self._validated_at >= self.revalidate_interval:
+            self.revalidate(db)
+        intervals = self._intervals.get((from_currency, to_currency))
+        if intervals is None:
+            intervals = self.load_intervals(db, from_currency, to_currency)
+        return intervals.rate_at(_naive(at))
+
+    def load_intervals(self, db: Session, from_currency: Currency, to_currency: Currency) -> RateIntervals:
+        """Read the rate history of a pair (one query) into the interval index"""
+        rows = db.execute(
+            select(ExchangeRate.valid_from, ExchangeRate.valid_until, ExchangeRate.rate).where(
+                ExchangeRate.from_currency == from_currency,
+                ExchangeRate.to_currency == to_currency
+            ).order_by(ExchangeRate.valid_from, ExchangeRate.id)
+        ).all()
+        intervals = RateIntervals(
+            starts=[_naive(valid_from) for valid_from, _, _ in rows],
+            ends=[_naive(valid_until) if valid_until else None for _, valid_until, _ in rows],
+            rates=[rate for _, _, rate in rows]
+        )
+        self._intervals[(from_currency, to_currency)] = intervals
+        return intervals
+
+    def put(self, from_currency: Currency, to_currency: Currency, rate: float, valid_until: Optional[datetime] = None) -> None:
+        self._rates[(from_currency, to_currency)] = CachedRate(rate, valid_until)
+
+    def invalidate(self) -> None:
+        """Drop every cached rate and force a version check on the next lookup"""
+        with self._lock:
+            self._rates.clear()
+            self._intervals.clear()
+            self._version = None
+
+    def revalidate(self, db: Session) -> None:
+        """Drop cached rates and intervals if the rate version in db_meta changed"""
+        # Read outside the lock: other DB worker threads would queue behind this query
+        version = get_meta(db.connection(), RATE_VERSION_KEY) or "0"
+        with self._lock:
+            self._validated_at = time.monotonic()
+            if version != self._version:
+                self._rates.clear()
+                self._intervals.clear()
+                self._version = version
+
+    def __len__(self) -> int:
+        return len(self._rates)
+
+# Shared by all handlers in this process
+exchange_rate_cache = ExchangeRateCache()
@@ -2,6 +2,7 @@
 Text utilities for bot messages in Russian
 """
 from models import ExpenseCategory, Currency
+from utils.money import MINOR_UNITS
 from typing import Dict, List
 from datetime import datetime
 
@@ -23,15 +24,17 @@ def get_currency_name(currency: Currency) -> str:
     }
     return names.get(currency, currency.value)
 
-def format_amount(amount: float, currency: Currency) -> str:
-    """Format amount with currency symbol"""
+def format_amount(amount: int, currency: Currency) -> str:
+    """Format amount in minor units (öre, cents, kopecks) with currency symbol"""
     symbols = {
         Currency.SEK: "kr",
         Currency.EUR: "€",
         Currency.RUB: "₽"
     }
     symbol = symbols.get(currency, currency.value)
-    return f"{amount:.2f} {symbol}"
+    units, minor = divmod(abs(amount), MINOR_UNITS)
+    sign = "-" if amount < 0 else ""
+    return f"{sign}{units}.{minor:02d} {symbol}"
 
 def format_expense_report(expenses_by_category: Dict, current_month: datetime) -> str:
     """Format monthly expense report"""
@@ -69,6 +72,29 @@ def format_expense_report(expenses_by_category: Dict, current_month: datetime) -
     text += f"\n💰 Общий итог: {format_amount(total_sek, Currency.SEK)}\n\n"
     return text
 
+def format_trends_report(trends: Dict) -> str:
+    """Format category trends (ExpenseRollupService.get_trends)"""
+    months = trends['months']
+    text = f"📈 Динамика трат за {len(months)} мес. ({months[0].strftime('%m.%Y')} – {months[-1].strftime('%m.%Y')})\n"
+    
+    if not trends['categories']:
+        return text + "\nНет расходов за этот период"
+    
+    for category_value, data in trends['categories'].items():
+        text += f"\n📂 {get_category_name(ExpenseCategory(category_value))}:\n"
+        for month, total, delta in zip(months, data['totals'], data['deltas']):
+            line = f"  {month.strftime('%m.%Y')}: {format_amount(total, Currency.SEK)}"
+            if delta:
+                sign = "+" if delta > 0 else "-"
+                line += f" ({sign}{format_amount(abs(delta), Currency.SEK)})"
+            text += line + "\n"
+        text += f"  В среднем: {format_amount(data['average'], Currency.SEK)}\n"
+    
+    text += "\n💰 Итого по месяцам:\n"
+    for month, total in zip(months, trends['totals']):
+        text += f"  {month.strftime('%m.%Y')}: {format_amount(total, Currency.SEK)}\n"
+    return text
+
 def format_balance_report(balances: Dict, users: Dict, settlements: List) -> str:
     """Format balance report"""
     text = "💳 Балансы участников:\n\n"
@@ -136,6 +162,12 @@ def get_help_message() -> str:
 
 /start - Главное меню
 /set_rate EUR 11.30 - Установить курс валюты
+/fix_rate EUR 11.25 - Исправить последний курс и пересчитать расходы (админ)
+/settle_up - Сохранить контрольную точку балансов
+/import - Импорт расходов из CSV/JSONL файла (подпись к файлу)
+/report 2025-09 - Балансы участников за месяц
+/report 2025-01 2025-06 - Траты, балансы и план погашения за период
+/trends 6 - Динамика трат по категориям за последние месяцы
 
 🛒 Список покупок:
 • Добавляйте товары в общий список
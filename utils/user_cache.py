@@ -0,0 +1,95 @@
+"""
+Process-local user identity cache
+
+Keyed by telegram_id, holds the user id and profile fields, so known users cost no
+queries on the hot path. Entries carry users.version: writes are conditional on the
+cached version, and the whole cache is revalidated against the database (one query)
+at most once per USER_CACHE_REVALIDATE_INTERVAL to pick up changes from other workers.
+"""
+import os
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import User
+
+USER_CACHE_REVALIDATE_INTERVAL = float(os.getenv('USER_CACHE_REVALIDATE_INTERVAL', '60'))  # seconds
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Snapshot of a User row (same attribute names as the model)"""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_admin: bool
+    version: int
+
+    @classmethod
+    def from_model(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_admin=bool(user.is_admin),
+            version=user.version
+        )
+
+    def same_names(self, telegram_user) -> bool:
+        """Check that Telegram name fields match the cached ones"""
+        return (
+            self.username == telegram_user.username
+            and self.first_name == telegram_user.first_name
+            and self.last_name == telegram_user.last_name
+        )
+
+class UserIdentityCache:
+    """telegram_id -> CachedUser with version-based revalidation"""
+
+    def __init__(self, revalidate_interval: float = USER_CACHE_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self._users: Dict[int, CachedUser] = {}
+        self._lock = threading.Lock()
+        self._validated_at = time.monotonic()
+
+    def get(self, db: Session, telegram_id: int) -> Optional[CachedUser]:
+        """Get cached user (revalidates the cache first if the interval has passed)"""
+        if self._users and time.monotonic() - self._validated_at >= self.revalidate_interval:
+            self.revalidate(db)
+        return self._users.get(telegram_id)
+
+    def put(self, user: CachedUser) -> None:
+        self._users[user.telegram_id] = user
+
+    def invalidate(self, telegram_id: Optional[int] = None) -> None:
+        """Drop one user (or everything) from the cache"""
+        with self._lock:
+            if telegram_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(telegram_id, None)
+
+    def revalidate(self, db: Session) -> None:
+        """Drop entries whose version changed in the database (one query for all users)"""
+        self._validated_at = time.monotonic()
+        if not self._users:
+            return
+        # Query outside the lock: other DB worker threads would queue behind it
+        versions = dict(db.execute(
+            select(User.telegram_id, User.version).where(User.telegram_id.in_(list(self._users)))
+        ).all())
+        with self._lock:
+            for telegram_id, cached in list(self._users.items()):
+                if versions.get(telegram_id) != cached.version:
+                    self._users.pop(telegram_id, None)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+# Shared by all handlers in this process
+user_cache = UserIdentityCache()